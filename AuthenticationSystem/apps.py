@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class AuthenticationsystemConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'AuthenticationSystem'
+
+    def ready(self):
+        # revoke tokens when users are deactivated or deleted
+        from . import denylist  # noqa: F401
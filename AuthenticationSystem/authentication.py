@@ -0,0 +1,196 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .denylist import denylist, jwt_settings
+from .models import CustomUser
+
+# ------------------------------
+# JWT authentication with a user cache
+#
+# DRF runs the authentication class once per request and keeps the result
+# on request.user, so views read request.user instead of authenticating
+# again. On top of that, users resolved from tokens are kept in a small
+# in-process LRU cache for a few seconds, so busy API clients don't cost a
+# user-table lookup per call. Entries are dropped whenever the user is
+# saved (active_mode, password, ...) or deleted in this process; other
+# worker processes see the change once the TTL runs out.
+#
+# Tokens issued by get_tokens_for_user carry the user's name, type and
+# names as claims (USER_CLAIMS). For those no user is loaded at all: the
+# user is built from the claims, after the token is checked against the
+# in-process denylist (denylist.py), which also keeps deactivated users
+# out. Other columns are loaded if a view reads them.
+# ------------------------------
+
+# Columns copied into the token, enough for the views and the login dashboard
+USER_CLAIMS = ["user_name", "user_type", "first_name", "last_name"]
+
+
+def user_cache_settings():
+    defaults = {
+        "ENABLED": True,
+        "TTL": 30,  # seconds
+        "MAX_SIZE": 1024,  # users
+    }
+    defaults.update(getattr(settings, "AUTH_USER_CACHE", {}))
+    return defaults
+
+
+class UserCache:
+    def __init__(self, ttl, max_size):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._users = OrderedDict()  # user id -> (expires_at, user)
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is None:
+                return None
+            expires_at, user = entry
+            if expires_at < time.monotonic():
+                del self._users[user_id]
+                return None
+            self._users.move_to_end(user_id)
+        # every request gets its own instance
+        return copy.copy(user)
+
+    def set(self, user_id, user):
+        with self._lock:
+            self._users[user_id] = (time.monotonic() + self.ttl, copy.copy(user))
+            self._users.move_to_end(user_id)
+            while len(self._users) > self.max_size:
+                self._users.popitem(last=False)
+
+    def evict(self, user_id):
+        with self._lock:
+            self._users.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._users.clear()
+
+
+_conf = user_cache_settings()
+user_cache = UserCache(ttl=_conf["TTL"], max_size=_conf["MAX_SIZE"])
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def evict_cached_user(sender, instance, **kwargs):
+    user_cache.evict(str(instance.pk))
+
+
+# CustomUser built from the token's claims; columns that aren't in the
+# token are deferred, loaded from the database only when read
+def user_from_claims(validated_token):
+    if not jwt_settings()["STATELESS"] or not all(
+        claim in validated_token for claim in USER_CLAIMS
+    ):
+        return None
+    values = {
+        "id": int(validated_token[api_settings.USER_ID_CLAIM]),
+        "active_mode": True,  # deactivation revokes the user's tokens
+        **{claim: validated_token[claim] for claim in USER_CLAIMS},
+    }
+    # from_db wants the values in the model's column order
+    fields = [
+        field.attname
+        for field in CustomUser._meta.concrete_fields
+        if field.attname in values
+    ]
+    return CustomUser.from_db("default", fields, [values[name] for name in fields])
+
+
+def _revoked():
+    return AuthenticationFailed("Token has been revoked", code="token_revoked")
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        if api_settings.USER_ID_CLAIM not in validated_token:
+            return super().get_user(validated_token)
+        if denylist.is_revoked(validated_token):
+            raise _revoked()
+        user = user_from_claims(validated_token)
+        if user is not None:
+            return user
+
+        # the claim may be a string or a number depending on how it was issued
+        user_id = str(validated_token[api_settings.USER_ID_CLAIM])
+
+        enabled = user_cache_settings()["ENABLED"]
+        user = user_cache.get(user_id) if enabled else None
+        if user is None:
+            user = super().get_user(validated_token)
+            if enabled:
+                user_cache.set(user_id, user)
+
+        if not user.active_mode:
+            raise AuthenticationFailed("User is inactive", code="user_inactive")
+        return user
+
+    # ------------------------------
+    # Async path (Document/async_views.py): the same checks, with the user
+    # read through the async ORM so no worker thread is held for it
+    # ------------------------------
+
+    async def aauthenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        # decoding and checking the signature is CPU only, no await needed
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        try:
+            user_id = str(validated_token[api_settings.USER_ID_CLAIM])
+        except KeyError:
+            raise InvalidToken("Token contained no recognizable user identification")
+
+        # no query unless the table is due for a reload or a jti may match
+        if await sync_to_async(denylist.is_revoked)(validated_token):
+            raise _revoked()
+        user = user_from_claims(validated_token)
+        if user is not None:
+            return user
+
+        enabled = user_cache_settings()["ENABLED"]
+        user = user_cache.get(user_id) if enabled else None
+        if user is None:
+            try:
+                user = await self.user_model.objects.aget(
+                    **{api_settings.USER_ID_FIELD: user_id}
+                )
+            except self.user_model.DoesNotExist:
+                raise AuthenticationFailed("User not found", code="user_not_found")
+            if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+                raise AuthenticationFailed("User is inactive", code="user_inactive")
+            if api_settings.CHECK_REVOKE_TOKEN and validated_token.get(
+                api_settings.REVOKE_TOKEN_CLAIM
+            ) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(
+                    "The user's password has been changed.", code="password_changed"
+                )
+            if enabled:
+                user_cache.set(user_id, user)
+
+        if not user.active_mode:
+            raise AuthenticationFailed("User is inactive", code="user_inactive")
+        return user
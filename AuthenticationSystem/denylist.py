@@ -0,0 +1,212 @@
+import hashlib
+import math
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import CustomUser, RevokedToken
+
+# ------------------------------
+# Revoked JWTs, checked without a query per request
+#
+# Revocations are rows of RevokedToken: one token by its jti (logout), or
+# every token of a user issued up to a moment (deactivation, deletion).
+# Each process keeps the unexpired rows in memory: jtis in a bloom filter
+# and users in a dict of cut-off times. A token is looked up there; only
+# when the bloom filter says "maybe" is the jti confirmed with one query,
+# which only revoked tokens (and ~0.1% false positives) ever pay.
+#
+# The copy is reloaded from the table every SYNC_INTERVAL seconds, and
+# sooner when another worker revoked something: revoking bumps a version
+# number in the cache named by ALIAS, which is checked on every request
+# (a cache get, no query). Revocations made in this process apply at once.
+# Settings: AUTH_JWT.
+# ------------------------------
+
+
+def jwt_settings():
+    defaults = {
+        "STATELESS": True,  # trust the user claims of tokens, see authentication.py
+        "ALIAS": "default",
+        "SYNC_INTERVAL": 300,  # seconds between reloads of the table
+        "FALSE_POSITIVE_RATE": 0.001,  # of the bloom filter
+    }
+    defaults.update(getattr(settings, "AUTH_JWT", {}))
+    return defaults
+
+
+VERSION_KEY = "auth:denylist:version"
+
+
+# Sized for `capacity` entries at `error_rate` false positives; entries
+# added past that raise the rate until the next sync rebuilds it
+class BloomFilter:
+    def __init__(self, capacity, error_rate):
+        bits = -max(capacity, 1) * math.log(error_rate) / math.log(2) ** 2
+        self.size = max(int(bits), 8192)
+        self.hashes = max(round(-math.log2(error_rate)), 1)
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, value):
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "big")
+        h2 = int.from_bytes(digest[8:], "big") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, value):
+        for pos in self._positions(value):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, value):
+        return all(
+            self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(value)
+        )
+
+
+class Denylist:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._jtis = BloomFilter(0, jwt_settings()["FALSE_POSITIVE_RATE"])
+        self._users = {}  # user id -> tokens issued at or before this are revoked
+        self._version = None
+        self._synced_at = None
+
+    def _cache(self):
+        return caches[jwt_settings()["ALIAS"]]
+
+    def _due(self):
+        conf = jwt_settings()
+        if self._synced_at is None:
+            return True
+        if time.monotonic() - self._synced_at >= conf["SYNC_INTERVAL"]:
+            return True
+        # a missing version (cache restarted) waits for the interval
+        version = self._cache().get(VERSION_KEY)
+        return version is not None and version != self._version
+
+    def sync(self):
+        conf = jwt_settings()
+        version = self._cache().get(VERSION_KEY)
+        rows = list(
+            RevokedToken.objects.filter(expires_at__gt=timezone.now()).values_list(
+                "jti", "user_id", "issued_before"
+            )
+        )
+        jtis = BloomFilter(2 * len(rows), conf["FALSE_POSITIVE_RATE"])
+        users = {}
+        for jti, user_id, issued_before in rows:
+            if jti:
+                jtis.add(jti)
+            else:
+                cut_off = issued_before.timestamp()
+                users[user_id] = max(users.get(user_id, cut_off), cut_off)
+        with self._lock:
+            self._jtis, self._users = jtis, users
+            self._version = version
+            self._synced_at = time.monotonic()
+
+    def is_revoked(self, token):
+        if self._due():
+            self.sync()
+
+        user_id = token.get(api_settings.USER_ID_CLAIM)
+        cut_off = self._users.get(int(user_id)) if user_id is not None else None
+        if cut_off is not None and token.get("iat", 0) <= cut_off:
+            return True
+
+        jti = token.get(api_settings.JTI_CLAIM)
+        if jti and jti in self._jtis:
+            # maybe: the bloom filter has no false negatives, only positives
+            return RevokedToken.objects.filter(jti=jti).exists()
+        return False
+
+    def _changed(self):
+        cache = self._cache()
+        try:
+            version = cache.incr(VERSION_KEY)
+        except ValueError:
+            version = 1
+            if not cache.add(VERSION_KEY, version, timeout=None):
+                version = cache.incr(VERSION_KEY)
+        # this process already has the change, only other workers reload
+        with self._lock:
+            self._version = version
+
+    def revoke_token(self, token):
+        jti = token[api_settings.JTI_CLAIM]
+        expires_at = datetime.fromtimestamp(token["exp"], tz=dt_timezone.utc)
+        RevokedToken.objects.filter(expires_at__lte=timezone.now()).delete()
+        RevokedToken.objects.get_or_create(
+            jti=jti,
+            defaults={
+                "user_id": int(token[api_settings.USER_ID_CLAIM]),
+                "expires_at": expires_at,
+            },
+        )
+        with self._lock:
+            self._jtis.add(jti)
+        self._changed()
+
+    def revoke_user(self, user_id):
+        now = timezone.now()
+        lifetime = max(
+            api_settings.ACCESS_TOKEN_LIFETIME, api_settings.REFRESH_TOKEN_LIFETIME
+        )
+        RevokedToken.objects.filter(expires_at__lte=now).delete()
+        RevokedToken.objects.create(
+            user_id=user_id, issued_before=now, expires_at=now + lifetime
+        )
+        with self._lock:
+            self._users[user_id] = now.timestamp()
+        self._changed()
+
+    def clear(self):
+        with self._lock:
+            self._jtis = BloomFilter(0, jwt_settings()["FALSE_POSITIVE_RATE"])
+            self._users = {}
+            self._synced_at = None
+
+
+denylist = Denylist()
+
+
+# Deactivating or deleting a user, or changing their user_type (a claim of
+# their tokens), revokes every token issued to them so far.
+# QuerySet.update() sends no signals: save the users one by one instead
+@receiver(pre_save, sender=CustomUser)
+def remember_deactivation(sender, instance, update_fields=None, **kwargs):
+    instance._revoke_tokens = False
+    if instance._state.adding:
+        return
+    if update_fields is not None and not {"active_mode", "user_type"} & set(
+        update_fields
+    ):
+        return  # e.g. the password rehash on login
+    stored = (
+        CustomUser.objects.filter(pk=instance.pk)
+        .values("active_mode", "user_type")
+        .first()
+    )
+    if stored is None:
+        return
+    instance._revoke_tokens = (
+        stored["active_mode"] and not instance.active_mode
+    ) or stored["user_type"] != instance.user_type
+
+
+@receiver(post_save, sender=CustomUser)
+def revoke_deactivated(sender, instance, created, **kwargs):
+    if getattr(instance, "_revoke_tokens", False):
+        denylist.revoke_user(instance.pk)
+
+
+@receiver(post_delete, sender=CustomUser)
+def revoke_deleted(sender, instance, **kwargs):
+    denylist.revoke_user(instance.pk)
@@ -0,0 +1,178 @@
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+# ------------------------------
+# Password hashing off the request thread
+#
+# PBKDF2 with Django's default iteration count is the most CPU-expensive
+# thing the API does: tens of milliseconds per sign-up or login, holding
+# the GIL the whole time, so every other thread of the worker stalls with
+# it. With BACKEND "process" hashing and checking run in a small pool of
+# processes, which use every core while the request thread just waits on
+# the result. The pool is bounded: past WORKERS + MAX_QUEUE hashes in
+# flight new ones fail fast with HashingBusy instead of piling up.
+#
+# check_password also reports whether the stored hash was made with an
+# older hasher or iteration count, so the caller can store a fresh one
+# (CustomUser.check_password does, on login).
+# ------------------------------
+
+
+class HashingBusy(Exception):
+    pass
+
+
+def password_hashing_settings():
+    defaults = {
+        "BACKEND": "process",  # or "inline", on the calling thread
+        "WORKERS": None,  # processes, None = one per CPU
+        "MAX_QUEUE": 64,  # hashes waiting for a free process
+        "TIMEOUT": 10,  # seconds to wait for a result
+    }
+    defaults.update(getattr(settings, "AUTH_PASSWORD_HASHING", {}))
+    return defaults
+
+
+# Run in the pool processes: spawned fresh, they only need the hashers
+def _init_worker(password_hashers):
+    if not settings.configured:
+        settings.configure(PASSWORD_HASHERS=password_hashers)
+
+
+def _make(raw_password):
+    return hashers.make_password(raw_password)
+
+
+def _check(raw_password, encoded):
+    outdated = []
+    valid = hashers.check_password(
+        raw_password, encoded, setter=lambda raw: outdated.append(True)
+    )
+    return valid, bool(outdated)
+
+
+class HashingPool:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._executor = None
+        self.reset_stats()
+
+    def reset_stats(self):
+        with self._lock:
+            self.in_flight = 0
+            self.peak = 0
+            self.submitted = 0
+            self.rejected = 0
+            self.seconds = 0.0
+
+    def _get_executor(self, workers):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=workers,
+                # not fork: the parent has threads and open connections
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(settings.PASSWORD_HASHERS,),
+            )
+        return self._executor
+
+    def run(self, fn, *args):
+        conf = password_hashing_settings()
+        if conf["BACKEND"] == "inline":
+            return self._measure(fn, *args)
+
+        workers = conf["WORKERS"] or os.cpu_count() or 1
+        with self._lock:
+            if self.in_flight >= workers + conf["MAX_QUEUE"]:
+                self.rejected += 1
+                raise HashingBusy("too many logins in progress, try again")
+            self.in_flight += 1
+            self.submitted += 1
+            self.peak = max(self.peak, self.in_flight)
+            executor = self._get_executor(workers)
+
+        started = time.perf_counter()
+        try:
+            return executor.submit(fn, *args).result(timeout=conf["TIMEOUT"])
+        except FutureTimeout:
+            raise HashingBusy("password hashing timed out, try again")
+        except BrokenProcessPool:
+            # a worker died (OOM killer, ...): start a new pool next time
+            self.shutdown(wait=False)
+            return fn(*args)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+                self.seconds += time.perf_counter() - started
+
+    def _measure(self, fn, *args):
+        started = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self.submitted += 1
+                self.seconds += time.perf_counter() - started
+
+    def stats(self):
+        conf = password_hashing_settings()
+        workers = conf["WORKERS"] or os.cpu_count() or 1
+        with self._lock:
+            return {
+                "backend": conf["BACKEND"],
+                "workers": workers,
+                "in_flight": self.in_flight,
+                "queued": max(self.in_flight - workers, 0),
+                "peak_in_flight": self.peak,
+                "submitted": self.submitted,
+                "rejected": self.rejected,
+                "avg_ms": (
+                    round(self.seconds / self.submitted * 1000, 2)
+                    if self.submitted
+                    else None
+                ),
+            }
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+
+pool = HashingPool()
+
+
+@receiver(setting_changed)
+def reset_pool(setting, **kwargs):
+    # the pool processes copied the hashers when they started
+    if setting in ("PASSWORD_HASHERS", "AUTH_PASSWORD_HASHING"):
+        pool.shutdown(wait=False)
+
+
+def make_password(raw_password):
+    if raw_password is None:
+        # unusable password, nothing to hash
+        return hashers.make_password(None)
+    return pool.run(_make, raw_password)
+
+
+# -> (valid, needs_rehash)
+def check_password(raw_password, encoded):
+    if raw_password is None or not hashers.is_password_usable(encoded):
+        return False, False
+    return pool.run(_check, raw_password, encoded)
+
+
+def stats():
+    return pool.stats()
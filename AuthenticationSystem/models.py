@@ -7,6 +7,8 @@ from django.contrib.auth.models import (
     Permission,
 )
 
+from . import hashing
+
 
 class CustomUserManager(BaseUserManager):
     def create_normal(
@@ -97,3 +99,28 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
 
     def __str__(self):
         return f"{self.user_name}"
+
+    # Hashing runs in the pool of AuthenticationSystem/hashing.py
+    def set_password(self, raw_password):
+        self.password = hashing.make_password(raw_password)
+        self._password = raw_password
+
+    def check_password(self, raw_password):
+        valid, needs_rehash = hashing.check_password(raw_password, self.password)
+        if valid and needs_rehash:
+            # hashed with an older hasher or iteration count, store a fresh one
+            self.set_password(raw_password)
+            self._password = None
+            self.save(update_fields=["password"])
+        return valid
+
+
+class RevokedToken(models.Model):
+    # a revoked JWT (jti set) or every token of a user issued up to
+    # issued_before (jti empty); see AuthenticationSystem/denylist.py.
+    # user_id is a plain column: the row must outlive a deleted user
+    jti = models.CharField(max_length=255, unique=True, null=True, blank=True)
+    user_id = models.BigIntegerField(null=False, blank=False)
+    issued_before = models.DateTimeField(null=True, blank=True)
+    expires_at = models.DateTimeField(db_index=True)  # safe to forget after
+    created_at = models.DateTimeField(auto_now_add=True)
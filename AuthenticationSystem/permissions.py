@@ -0,0 +1,12 @@
+from rest_framework.permissions import BasePermission
+
+
+# Users created with create_admin (user_type "admin")
+class IsAdminUserType(BasePermission):
+    message = "admins only"
+
+    def has_permission(self, request, view):
+        user = request.user
+        return bool(
+            user and user.is_authenticated and getattr(user, "user_type", None) == "admin"
+        )
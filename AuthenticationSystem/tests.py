@@ -1,3 +1,234 @@
-from django.test import TestCase
+from datetime import timedelta
 
-# Create your tests here.
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from . import hashing, throttling
+from .authentication import user_cache
+from .denylist import VERSION_KEY, BloomFilter, denylist
+from .models import CustomUser, RevokedToken
+from .views import get_tokens_for_user
+
+
+class CachedJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        user_cache.clear()
+        cache.clear()
+        denylist.sync()
+        self.user = CustomUser.objects.create_normal(
+            first_name="test",
+            last_name="user",
+            user_name="reader",
+            password="secret-pass",
+        )
+        # a token without user claims (issued before they were added) is
+        # resolved through the user table and the cache
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.user).access_token}"
+        )
+
+    def login(self):
+        return self.client.post("/auth/login/")
+
+    def test_user_lookup_is_cached(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.login().status_code, 200)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.login().status_code, 200)
+
+    def test_deactivation_invalidates_cache(self):
+        self.login()
+        self.user.active_mode = False
+        self.user.save()
+        self.assertEqual(self.login().status_code, 401)
+
+
+class StatelessJWTTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        denylist.sync()
+        self.user = CustomUser.objects.create_normal(
+            first_name="test",
+            last_name="user",
+            user_name="reader",
+            password="secret-pass",
+        )
+        self.tokens = get_tokens_for_user(self.user)
+        self.client = self.client_for(self.tokens["access"])
+
+    def client_for(self, access):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {access}")
+        return client
+
+    def test_no_user_query(self):
+        with self.assertNumQueries(0):
+            response = self.client.post("/auth/login/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["user"]["user_name"], "reader")
+
+    def test_logout_revokes_token(self):
+        other = self.client_for(get_tokens_for_user(self.user)["access"])
+        response = self.client.post(
+            "/auth/logout/", {"refresh": self.tokens["refresh"]}, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.post("/auth/login/").status_code, 401)
+        self.assertEqual(other.post("/auth/login/").status_code, 200)
+        self.assertTrue(
+            RevokedToken.objects.filter(
+                jti=RefreshToken(self.tokens["refresh"])["jti"]
+            ).exists()
+        )
+
+    def test_deactivation_revokes_tokens(self):
+        self.user.active_mode = False
+        self.user.save()
+        self.assertEqual(self.client.post("/auth/login/").status_code, 401)
+
+    def test_deactivated_user_cannot_log_in_again(self):
+        self.user.active_mode = False
+        self.user.save()
+        response = APIClient().post(
+            "/auth/manual-login/",
+            {"user_name": "reader", "password": "secret-pass", "remember": True},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 403)
+        self.assertNotIn("tokens", response.data)
+        with self.assertRaises(ValueError):
+            get_tokens_for_user(self.user)
+
+    def test_demotion_revokes_tokens(self):
+        admin = CustomUser.objects.create_admin(
+            first_name="test",
+            last_name="admin",
+            user_name="editor",
+            password="secret-pass",
+        )
+        client = self.client_for(get_tokens_for_user(admin)["access"])
+        self.assertEqual(client.get("/doc/export/").status_code, 200)
+        admin.user_type = "normal"
+        admin.save()
+        self.assertIn(client.get("/doc/export/").status_code, (401, 403))
+
+    def test_revocation_by_another_worker(self):
+        token = AccessToken(self.tokens["access"])
+        RevokedToken.objects.create(
+            jti=token["jti"],
+            user_id=self.user.id,
+            expires_at=timezone.now() + timedelta(days=1),
+        )
+        self.assertEqual(self.client.post("/auth/login/").status_code, 200)
+        cache.set(VERSION_KEY, 99, timeout=None)  # what revoking there does
+        self.assertEqual(self.client.post("/auth/login/").status_code, 401)
+
+    def test_bloom_filter(self):
+        bloom = BloomFilter(1000, 0.001)
+        for i in range(1000):
+            bloom.add(f"jti-{i}")
+        self.assertTrue(all(f"jti-{i}" in bloom for i in range(1000)))
+        false_positives = sum(f"other-{i}" in bloom for i in range(10000))
+        self.assertLess(false_positives, 50)
+
+
+class PasswordHashingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_normal(
+            first_name="test",
+            last_name="user",
+            user_name="reader",
+            password="secret-pass",
+        )
+        self.client = APIClient()
+
+    def login(self, password="secret-pass"):
+        return self.client.post(
+            "/auth/manual-login/",
+            {"user_name": "reader", "password": password},
+            format="json",
+        )
+
+    def test_hashed_in_pool(self):
+        before = hashing.stats()["submitted"]
+        self.assertEqual(self.login().status_code, 200)
+        self.assertEqual(self.login("wrong").status_code, 401)
+        self.assertEqual(hashing.stats()["submitted"], before + 2)
+        self.assertEqual(hashing.stats()["in_flight"], 0)
+
+    @override_settings(
+        PASSWORD_HASHERS=[
+            "django.contrib.auth.hashers.PBKDF2PasswordHasher",
+            "django.contrib.auth.hashers.MD5PasswordHasher",
+        ]
+    )
+    def test_outdated_hash_is_replaced_on_login(self):
+        CustomUser.objects.filter(id=self.user.id).update(
+            password=make_password("secret-pass", hasher="md5")
+        )
+        self.assertEqual(self.login().status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith("pbkdf2_sha256$"))
+        self.assertEqual(self.login().status_code, 200)
+
+    @override_settings(AUTH_PASSWORD_HASHING={"WORKERS": 1, "MAX_QUEUE": 0})
+    def test_busy_when_pool_is_full(self):
+        hashing.pool.in_flight += 1
+        try:
+            self.assertEqual(self.login().status_code, 503)
+        finally:
+            hashing.pool.in_flight -= 1
+
+
+@override_settings(
+    AUTH_THROTTLE={
+        "IP": {"CAPACITY": 10, "PER_MINUTE": 10},
+        "USER_NAME": {"CAPACITY": 3, "PER_MINUTE": 3},
+    }
+)
+class ThrottlingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def login(self, user_name, **extra):
+        return self.client.post(
+            "/auth/manual-login/",
+            {"user_name": user_name, "password": "guess"},
+            format="json",
+            **extra,
+        )
+
+    def test_user_name_bucket(self):
+        for _ in range(3):
+            self.assertEqual(self.login("victim").status_code, 404)
+        # rejected before the user lookup or any hash
+        with self.assertNumQueries(0):
+            response = self.login("Victim")
+        self.assertEqual(response.status_code, 429)
+        self.assertGreaterEqual(int(response["Retry-After"]), 1)
+        # other names still have their own tokens
+        self.assertEqual(self.login("someone").status_code, 404)
+
+    def test_ip_bucket(self):
+        for i in range(10):
+            self.assertEqual(self.login(f"user{i}").status_code, 404)
+        self.assertEqual(self.login("another").status_code, 429)
+        other_ip = self.login("another", REMOTE_ADDR="10.0.0.2")
+        self.assertEqual(other_ip.status_code, 404)
+
+        self.assertEqual(throttling.stats()["ip"], {"allowed": 11, "rejected": 1})
+
+    def test_tokens_refill(self):
+        bucket = "auth:throttle:test"
+        self.assertEqual(throttling.take(bucket, 1, 60), 0)
+        self.assertGreater(throttling.take(bucket, 1, 60), 0)
+        tokens, stamp = cache.get(bucket)
+        cache.set(bucket, (tokens, stamp - 1))  # a second later
+        self.assertEqual(throttling.take(bucket, 1, 60), 0)
@@ -0,0 +1,149 @@
+import functools
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import JsonResponse
+
+# ------------------------------
+# Token-bucket throttling for the sign-up and login endpoints
+#
+# Every client IP and every user_name tried gets a bucket of CAPACITY
+# tokens refilled at PER_MINUTE tokens a minute; a request takes one token
+# from each of its buckets or is answered 429 with Retry-After. Buckets
+# live in the cache named by AUTH_THROTTLE["ALIAS"], so with Redis /
+# Memcached every worker draws from the same ones (locmem: per process).
+#
+# @throttle wraps the DRF view from the outside: it runs on the plain
+# Django request, before authentication, any query or any password hash,
+# so a credential-stuffing burst costs a cache round trip per request.
+# ------------------------------
+
+SCOPES = ("IP", "USER_NAME")
+
+
+def throttle_settings():
+    defaults = {
+        "ENABLED": True,
+        "ALIAS": "default",
+        "IP": {"CAPACITY": 30, "PER_MINUTE": 30},
+        "USER_NAME": {"CAPACITY": 5, "PER_MINUTE": 5},
+        # request header holding the client IP behind a proxy, e.g.
+        # "HTTP_X_FORWARDED_FOR" (first address is used); None = REMOTE_ADDR
+        "IP_HEADER": None,
+        "LOCK_WAIT": 0.05,  # seconds to wait for a bucket another request holds
+    }
+    defaults.update(getattr(settings, "AUTH_THROTTLE", {}))
+    return defaults
+
+
+def _cache():
+    return caches[throttle_settings()["ALIAS"]]
+
+
+def _count(scope, outcome):
+    cache = _cache()
+    key = f"auth:throttle:count:{scope}:{outcome}"
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+# Take one token from the bucket `key` -> seconds to wait, 0 when allowed
+def take(key, capacity, per_minute):
+    conf = throttle_settings()
+    cache = _cache()
+    lock_key = f"{key}:lock"
+    rate = per_minute / 60  # tokens a second
+
+    # read-modify-write of the bucket, one request at a time
+    deadline = time.monotonic() + conf["LOCK_WAIT"]
+    while not cache.add(lock_key, 1, timeout=1):
+        if time.monotonic() > deadline:
+            # the bucket is hammered right now, that is what we are limiting
+            return 1
+        time.sleep(0.005)
+
+    try:
+        now = time.time()
+        tokens, stamp = cache.get(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - stamp) * rate)
+        if tokens >= 1:
+            tokens -= 1
+            wait = 0
+        else:
+            wait = (1 - tokens) / rate
+        # forgotten once it would have refilled anyway
+        cache.set(key, (tokens, now), timeout=int(capacity / rate) + 60)
+        return wait
+    finally:
+        cache.delete(lock_key)
+
+
+def client_ip(request):
+    header = throttle_settings()["IP_HEADER"]
+    if header and request.META.get(header):
+        return request.META[header].split(",")[0].strip()
+    return request.META.get("REMOTE_ADDR", "")
+
+
+def _user_name(request):
+    # the raw Django request: DRF hasn't parsed the body yet
+    if request.content_type == "application/json":
+        try:
+            data = json.loads(request.body or b"{}")
+        except ValueError:
+            return None
+        if not isinstance(data, dict):
+            return None
+        value = data.get("user_name") or data.get("id_code")
+    else:
+        value = request.POST.get("user_name") or request.POST.get("id_code")
+    return str(value).strip().lower() if value else None
+
+
+def throttle(*scopes):
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            conf = throttle_settings()
+            if not conf["ENABLED"]:
+                return view(request, *args, **kwargs)
+
+            for scope in scopes:
+                ident = client_ip(request) if scope == "IP" else _user_name(request)
+                if not ident:
+                    continue
+                wait = take(
+                    f"auth:throttle:{scope}:{view.__name__}:{ident}",
+                    conf[scope]["CAPACITY"],
+                    conf[scope]["PER_MINUTE"],
+                )
+                if wait:
+                    _count(scope, "rejected")
+                    response = JsonResponse(
+                        {"msg": "too many attempts, try again later"}, status=429
+                    )
+                    response["Retry-After"] = str(max(int(wait + 0.999), 1))
+                    return response
+                _count(scope, "allowed")
+
+            return view(request, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def stats():
+    cache = _cache()
+    return {
+        scope.lower(): {
+            outcome: cache.get(f"auth:throttle:count:{scope}:{outcome}", 0)
+            for outcome in ("allowed", "rejected")
+        }
+        for scope in SCOPES
+    }
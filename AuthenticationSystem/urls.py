@@ -1,5 +1,12 @@
 from django.urls import path
-from .views import singin, manual_login, login
+from .views import (
+    singin,
+    manual_login,
+    login,
+    logout,
+    hashing_stats,
+    throttle_stats,
+)
 
 # ------------------------------
 # Authentication API Endpoints
@@ -19,7 +26,8 @@ urlpatterns = [
     # MANUAL LOGIN (Without JWT)
     # Endpoint: POST /auth/manual-login/
     # Description:
-    #   - Logs in the user using id_code and password.
+    #   - Logs in the user using user_name and password.
+    #   - Passwords are checked in the hashing pool and rehashed if outdated.
     #   - If 'remember' = True → returns JWT tokens (access & refresh).
     #   - If 'remember' = False → returns user data only (no tokens).
     # ------------------------------
@@ -34,4 +42,33 @@ urlpatterns = [
     #   - If invalid/missing → returns error (client should fallback to manual login).
     # ------------------------------
     path("login/", login, name="login"),
+
+    # ------------------------------
+    # LOGOUT
+    # Endpoint: POST /auth/logout/
+    # Description:
+    #   - Revokes the access token sent in the Authorization header.
+    #   - Optional field: refresh, the refresh token to revoke with it
+    #   - Requires JWT authentication
+    # ------------------------------
+    path("logout/", logout, name="logout"),
+
+    # ------------------------------
+    # PASSWORD HASHING STATS
+    # Endpoint: GET /auth/hashing-stats/
+    # Description:
+    #   - Backend, workers, hashes in flight / queued, peak, rejected, avg_ms.
+    #   - Admin users only
+    # ------------------------------
+    path("hashing-stats/", hashing_stats, name="hashing_stats"),
+
+    # ------------------------------
+    # THROTTLE STATS
+    # Endpoint: GET /auth/throttle-stats/
+    # Description:
+    #   - Allowed / rejected counts of the ip and user_name buckets.
+    #   - singin, manual-login and login answer 429 when a bucket is empty
+    #   - Admin users only
+    # ------------------------------
+    path("throttle-stats/", throttle_stats, name="throttle_stats"),
 ]
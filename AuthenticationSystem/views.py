@@ -1,14 +1,18 @@
 from rest_framework.decorators import permission_classes, api_view
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
-from rest_framework.exceptions import AuthenticationFailed
 from rest_framework import status
-from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
 from rest_framework_simplejwt.tokens import RefreshToken
 
 # ---------------------
 
+from . import hashing, throttling
+from .authentication import USER_CLAIMS
+from .denylist import denylist
 from .models import CustomUser
+from .permissions import IsAdminUserType
 from .serializers import (
     ListCustomUserSerializer,
     FullCustomUserSerializer,
@@ -19,7 +23,13 @@ from .serializers import (
 
 # Generate JWT access and refresh tokens for a user
 def get_tokens_for_user(user):
+    # the claims are trusted as they are: an inactive user gets no tokens
+    if not user.active_mode:
+        raise ValueError("user is inactive")
     refresh = RefreshToken.for_user(user=user)
+    # copied into the access token, requests are authenticated from them
+    for claim in USER_CLAIMS:
+        refresh[claim] = getattr(user, claim)
     return {
         "access": str(refresh.access_token),
         "refresh": str(refresh),
@@ -59,6 +69,7 @@ def choose_dashboard(user, tokens, msg="Login successful", remember=False):
     #     )
 
 
+@throttling.throttle("IP")
 @api_view(["POST"])
 @permission_classes([AllowAny])
 def singin(request):
@@ -97,25 +108,36 @@ def singin(request):
                 {"msg": f"{e}"},
                 status=status.HTTP_403_FORBIDDEN,
             )
+        except hashing.HashingBusy as e:
+            return Response(
+                {"msg": f"{e}"},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            )
 
 
 # Manual login if JWT not present
+@throttling.throttle("IP", "USER_NAME")
 @api_view(["POST"])
 @permission_classes([AllowAny])
 def manual_login(request):
     remember = request.data.get("remember")
-    user_id_code = request.data.get("id_code")
+    # id_code is the old name of the field, still accepted
+    user_name = request.data.get("user_name") or request.data.get("id_code")
     user_password = request.data.get("password")
 
-    if not user_id_code or not user_password:
+    if not user_name or not user_password:
         return Response(
-            {"msg": "id_code and password are required"},
+            {"msg": "user_name and password are required"},
             status=status.HTTP_400_BAD_REQUEST,
         )
 
     try:
-        user = CustomUser.objects.get(id_code=user_id_code)
+        user = CustomUser.objects.get(user_name=user_name)
         if user.check_password(user_password):
+            if not user.active_mode:
+                return Response(
+                    {"msg": "User is inactive"}, status=status.HTTP_403_FORBIDDEN
+                )
             if str(remember).strip().capitalize() == "True":
                 return choose_dashboard(user, tokens=get_tokens_for_user(user))
             else:
@@ -129,9 +151,14 @@ def manual_login(request):
             )
     except CustomUser.DoesNotExist:
         return Response({"msg": "User not found"}, status=status.HTTP_404_NOT_FOUND)
+    except hashing.HashingBusy as e:
+        return Response(
+            {"msg": f"{e}"}, status=status.HTTP_503_SERVICE_UNAVAILABLE
+        )
 
 
 # Login view: prefer JWT, fallback to manual login
+@throttling.throttle("IP")
 @api_view(["POST"])
 # @permission_classes([IsAuthenticated])
 def login(request):
@@ -139,21 +166,45 @@ def login(request):
     # if not remember:
     #     remember = False
 
-    try:
+    # request.user was resolved once by DEFAULT_AUTHENTICATION_CLASSES
+    if not request.user.is_authenticated:
+        return Response(
+            {"msg": "your JWT isn't fine"}, status=status.HTTP_400_BAD_REQUEST
+        )
+        # return manual_login(request, remember=remember)
+
+    return choose_dashboard(request.user, tokens=None)
 
-        user_auth = JWTAuthentication().authenticate(request)
-        if not user_auth:
+
+# Revoke the access token of the request, and the refresh token if sent
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def logout(request):
+    refresh = request.data.get("refresh")
+    if refresh:
+        try:
+            refresh = RefreshToken(refresh)
+        except TokenError as e:
+            return Response({"msg": f"{e}"}, status=status.HTTP_400_BAD_REQUEST)
+        if str(refresh[api_settings.USER_ID_CLAIM]) != str(request.user.id):
             return Response(
-                {"msg": "your JWT isn't fine"}, status=status.HTTP_400_BAD_REQUEST
+                {"msg": "not your refresh token"}, status=status.HTTP_403_FORBIDDEN
             )
-            # return manual_login(request, remember=remember)
+        denylist.revoke_token(refresh)
 
-        else:
-            user, _ = user_auth
-            return choose_dashboard(user, tokens=None)
+    denylist.revoke_token(request.auth)
+    return Response({"msg": "logged out"}, status=status.HTTP_200_OK)
 
-    except AuthenticationFailed:
-        return Response(
-            {"msg": "your JWT isn't fine"}, status=status.HTTP_400_BAD_REQUEST
-        )
-        # return manual_login(request, remember=remember)
+
+# Password hashing pool metrics (see hashing.py)
+@api_view(["GET"])
+@permission_classes([IsAdminUserType])
+def hashing_stats(request):
+    return Response(hashing.stats(), status=status.HTTP_200_OK)
+
+
+# Throttled / allowed counts per scope (see throttling.py)
+@api_view(["GET"])
+@permission_classes([IsAdminUserType])
+def throttle_stats(request):
+    return Response(throttling.stats(), status=status.HTTP_200_OK)
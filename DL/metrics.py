@@ -0,0 +1,279 @@
+import contextvars
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse, HttpResponseForbidden
+
+# ------------------------------
+# Request metrics, served in Prometheus text format at /metrics
+#
+# RequestMetricsMiddleware (middleware.py) opens a RequestRecord for every
+# request; while it is open, the database wrapper below adds each query
+# (count, time, SQL) to it and the patched Serializer.data adds the time
+# spent serializing. When the response is out, the record goes into the
+# histograms here, labelled by URL name ("blog_list", "manual_login"), and
+# requests slower than SLOW_REQUEST_MS are logged with their slowest
+# queries.
+#
+# The record lives in a context variable, so it follows the request into
+# sync_to_async threads of the async views. Metrics are per process: with
+# several workers, Prometheus should scrape each one (or use one worker
+# per metrics port).
+# ------------------------------
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+def metrics_settings():
+    defaults = {
+        "ENABLED": True,
+        "SLOW_REQUEST_MS": 500,  # requests logged with their queries
+        "SLOW_QUERIES_LOGGED": 5,  # slowest queries shown per slow request
+        "TOKEN": None,  # when set, /metrics wants Authorization: Bearer <TOKEN>
+    }
+    defaults.update(getattr(settings, "REQUEST_METRICS", {}))
+    return defaults
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.series = {}  # labels -> [counts per bucket + +Inf, sum]
+
+    def observe(self, labels, value):
+        counts = self.series.get(labels)
+        if counts is None:
+            counts = self.series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        counts[bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    def render(self, label_names):
+        lines = [
+            f"# HELP {self.name} {self.help_text}",
+            f"# TYPE {self.name} histogram",
+        ]
+        for labels, counts in sorted(self.series.items()):
+            base = _labels(label_names, labels)
+            total = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                total += count
+                le = _labels((*label_names, "le"), (*labels, bound))
+                lines.append(f"{self.name}_bucket{le} {total}")
+            lines.append(f"{self.name}_sum{base} {counts[-1]:.6f}")
+            lines.append(f"{self.name}_count{base} {total}")
+        return lines
+
+
+def _labels(names, values):
+    escaped = (
+        str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        for value in values
+    )
+    return "{" + ",".join(f'{n}="{v}"' for n, v in zip(names, escaped)) + "}"
+
+
+class Registry:
+    LABELS = ("view", "method")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = {}  # (view, method, status) -> count
+            self.latency = Histogram(
+                "http_request_duration_seconds",
+                "Time from the first middleware to the response.",
+                LATENCY_BUCKETS,
+            )
+            self.queries = Histogram(
+                "http_request_db_queries", "SQL queries per request.", QUERY_BUCKETS
+            )
+            self.query_time = Histogram(
+                "http_request_db_seconds",
+                "Time spent in SQL queries per request.",
+                LATENCY_BUCKETS,
+            )
+            self.serializer_time = Histogram(
+                "http_request_serializer_seconds",
+                "Time spent in DRF serializers per request.",
+                LATENCY_BUCKETS,
+            )
+            self.size = Histogram(
+                "http_response_size_bytes",
+                "Response body size (streamed responses only with Content-Length).",
+                SIZE_BUCKETS,
+            )
+
+    def record(self, view, method, status, record, size):
+        labels = (view, method)
+        with self._lock:
+            key = (view, method, str(status))
+            self.requests[key] = self.requests.get(key, 0) + 1
+            self.latency.observe(labels, record.duration)
+            self.queries.observe(labels, record.query_count)
+            self.query_time.observe(labels, record.query_seconds)
+            self.serializer_time.observe(labels, record.serializer_seconds)
+            if size is not None:
+                self.size.observe(labels, size)
+
+    def render(self):
+        with self._lock:
+            lines = [
+                "# HELP http_requests_total Requests by URL name, method and status.",
+                "# TYPE http_requests_total counter",
+            ]
+            for labels, count in sorted(self.requests.items()):
+                lines.append(
+                    f"http_requests_total{_labels((*self.LABELS, 'status'), labels)} "
+                    f"{count}"
+                )
+            for histogram in (
+                self.latency,
+                self.queries,
+                self.query_time,
+                self.serializer_time,
+                self.size,
+            ):
+                lines += histogram.render(self.LABELS)
+        return lines
+
+
+registry = Registry()
+
+
+# ------------------------------
+# Per-request record
+# ------------------------------
+
+
+class RequestRecord:
+    MAX_QUERIES_KEPT = 200  # for the slow-request log
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.duration = 0.0
+        self.query_count = 0
+        self.query_seconds = 0.0
+        self.serializer_seconds = 0.0
+        self.queries = []  # (seconds, sql)
+
+    def add_query(self, sql, seconds):
+        self.query_count += 1
+        self.query_seconds += seconds
+        if len(self.queries) < self.MAX_QUERIES_KEPT:
+            self.queries.append((seconds, sql))
+
+    def slowest_queries(self, count):
+        return sorted(self.queries, key=lambda query: query[0], reverse=True)[:count]
+
+
+_current = contextvars.ContextVar("request_metrics", default=None)
+
+
+def start_request():
+    record = RequestRecord()
+    return record, _current.set(record)
+
+
+def finish_request(token):
+    _current.reset(token)
+
+
+def _time_query(execute, sql, params, many, context):
+    record = _current.get()
+    if record is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        record.add_query(sql, time.perf_counter() - started)
+
+
+def _instrument(connection):
+    if _time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_time_query)
+
+
+def instrument_connection(sender, connection, **kwargs):
+    _instrument(connection)
+
+
+def _timed_data(data):
+    def wrapper(serializer):
+        record = _current.get()
+        if record is None:
+            return data.fget(serializer)
+        started = time.perf_counter()
+        try:
+            return data.fget(serializer)
+        finally:
+            record.serializer_seconds += time.perf_counter() - started
+
+    return property(wrapper)
+
+
+_installed = False
+_install_lock = threading.Lock()
+
+
+# Called by the middleware: times queries on every connection and the .data
+# of every top-level serializer (nested ones don't go through .data)
+def install():
+    global _installed
+    from rest_framework import serializers
+
+    with _install_lock:
+        if _installed:
+            return
+        for cls in (serializers.Serializer, serializers.ListSerializer):
+            cls.data = _timed_data(cls.data)
+        connection_created.connect(instrument_connection)
+        for connection in connections.all(initialized_only=True):
+            _instrument(connection)
+        _installed = True
+
+
+# ------------------------------
+# GET /metrics
+# ------------------------------
+
+
+def metrics_view(request):
+    token = metrics_settings()["TOKEN"]
+    if token and request.headers.get("Authorization") != f"Bearer {token}":
+        return HttpResponseForbidden()
+
+    lines = registry.render()
+
+    # queue depth of the password hashing pool and the login throttle
+    # counters (AuthenticationSystem/hashing.py, throttling.py)
+    from AuthenticationSystem import hashing, throttling
+
+    pool = hashing.stats()
+    for name in ("workers", "in_flight", "queued", "peak_in_flight"):
+        lines.append(f"# TYPE password_hashing_{name} gauge")
+        lines.append(f"password_hashing_{name} {pool[name]}")
+    for name in ("submitted", "rejected"):
+        lines.append(f"# TYPE password_hashing_{name}_total counter")
+        lines.append(f"password_hashing_{name}_total {pool[name]}")
+
+    lines.append("# TYPE auth_throttle_total counter")
+    for scope, outcomes in throttling.stats().items():
+        for outcome, count in outcomes.items():
+            labels = _labels(("scope", "outcome"), (scope, outcome))
+            lines.append(f"auth_throttle_total{labels} {count}")
+
+    return HttpResponse(
+        "\n".join(lines) + "\n", content_type="text/plain; version=0.0.4"
+    )
@@ -0,0 +1,238 @@
+import contextvars
+import logging
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import OperationalError, connections
+from django.db.backends.signals import connection_created
+from django.http import JsonResponse
+
+from . import metrics
+
+# ------------------------------
+# In-process write queue for SQLite
+#
+# SQLite allows one writer at a time. Threads of one process that all try
+# to write spin on the database lock (busy_timeout retries with growing
+# sleeps), which wastes time and ends in "database is locked" when one of
+# them waits too long. Writes of a request take a process-wide lock first,
+# so they reach the database one after the other and reads keep running
+# next to them (WAL). Other processes are still sorted out by busy_timeout.
+#
+# The lock is only held while the database is being written: an execute
+# wrapper takes it at the first write statement (or the BEGIN of a
+# transaction) and gives it back as soon as the connection is out of its
+# transaction, so streaming an upload or hashing a password happens
+# outside it. A transaction that rolls back keeps it until its request's
+# next query or the end of the request.
+# ------------------------------
+
+WRITE_STATEMENTS = (
+    "INSERT",
+    "UPDATE",
+    "DELETE",
+    "REPLACE",
+    "BEGIN",
+    "CREATE",
+    "DROP",
+    "ALTER",
+)
+
+# one per process, shared by every handler (and test client) in it
+_write_lock = threading.Lock()
+
+
+class WriteQueueBusy(OperationalError):
+    pass
+
+
+def write_queue_settings():
+    defaults = {
+        "ENABLED": False,
+        "TIMEOUT": 30,  # seconds a write waits for its turn
+    }
+    defaults.update(getattr(settings, "DB_WRITE_QUEUE", {}))
+    return defaults
+
+
+# The current request's hold on the lock
+class _Turn:
+    def __init__(self, timeout):
+        self.timeout = timeout
+        self.held = False
+        self.on_commit = False  # give_back registered with the transaction
+
+    def take(self):
+        if self.held:
+            return
+        if not _write_lock.acquire(timeout=self.timeout):
+            raise WriteQueueBusy("server busy, try again")
+        self.held = True
+        self.on_commit = False
+
+    def give_back(self):
+        if self.held:
+            self.held = False
+            _write_lock.release()
+
+
+_turn = contextvars.ContextVar("write_queue_turn", default=None)
+
+
+def _queue_writes(execute, sql, params, many, context):
+    turn = _turn.get()
+    if turn is None:
+        return execute(sql, params, many, context)
+
+    if sql.lstrip()[:7].upper().startswith(WRITE_STATEMENTS):
+        turn.take()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        connection = context["connection"]
+        if turn.held:
+            if not connection.connection.in_transaction:
+                turn.give_back()
+            elif connection.in_atomic_block and not turn.on_commit:
+                connection.on_commit(turn.give_back)
+                turn.on_commit = True
+
+
+def _install_queue(connection):
+    if connection.vendor != "sqlite":
+        return
+    if _queue_writes not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_queue_writes)
+
+
+def queue_connection(sender, connection, **kwargs):
+    _install_queue(connection)
+
+
+class SQLiteWriteQueueMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        conf = write_queue_settings()
+        if not conf["ENABLED"]:
+            raise MiddlewareNotUsed
+        connection_created.connect(queue_connection)
+        for connection in connections.all(initialized_only=True):
+            _install_queue(connection)
+        self.get_response = get_response
+        self.timeout = conf["TIMEOUT"]
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        turn = _Turn(self.timeout)
+        token = _turn.set(turn)
+        try:
+            return self.get_response(request)
+        finally:
+            _turn.reset(token)
+            turn.give_back()
+
+    async def __acall__(self, request):
+        # the writes happen in sync_to_async threads, which see this turn
+        turn = _Turn(self.timeout)
+        token = _turn.set(turn)
+        try:
+            return await self.get_response(request)
+        finally:
+            _turn.reset(token)
+            turn.give_back()
+
+    def process_exception(self, request, exception):
+        if isinstance(exception, WriteQueueBusy):
+            return JsonResponse({"error": "server busy, try again"}, status=503)
+        return None
+
+
+# ------------------------------
+# Request metrics (see metrics.py)
+#
+# First in MIDDLEWARE, so the time covers the whole stack. Each request is
+# recorded under its URL name with its latency, SQL queries, serializer
+# time and response size; slow ones are logged to "DL.slow_requests" with
+# their slowest queries.
+# ------------------------------
+
+slow_log = logging.getLogger("DL.slow_requests")
+
+
+class RequestMetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not metrics.metrics_settings()["ENABLED"]:
+            raise MiddlewareNotUsed
+        metrics.install()
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        record, token = metrics.start_request()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.finish_request(token)
+        self.finish(request, response, record)
+        return response
+
+    async def __acall__(self, request):
+        record, token = metrics.start_request()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.finish_request(token)
+        self.finish(request, response, record)
+        return response
+
+    def finish(self, request, response, record):
+        record.duration = time.perf_counter() - record.started
+        match = request.resolver_match
+        view = match.view_name if match else "unmatched"
+
+        if response.has_header("Content-Length"):
+            size = int(response["Content-Length"])
+        elif not response.streaming:
+            size = len(response.content)
+        else:
+            size = None  # streamed without a length, sent after this point
+
+        metrics.registry.record(
+            view, request.method, response.status_code, record, size
+        )
+
+        conf = metrics.metrics_settings()
+        if record.duration * 1000 >= conf["SLOW_REQUEST_MS"]:
+            queries = "".join(
+                f"\n  {seconds * 1000:.1f} ms  {sql}"
+                for seconds, sql in record.slowest_queries(
+                    conf["SLOW_QUERIES_LOGGED"]
+                )
+            )
+            slow_log.warning(
+                "%s %s (%s) %d in %.0f ms: %d queries in %.0f ms, "
+                "serializers %.0f ms%s",
+                request.method,
+                request.get_full_path(),
+                view,
+                response.status_code,
+                record.duration * 1000,
+                record.query_count,
+                record.query_seconds * 1000,
+                record.serializer_seconds * 1000,
+                queries,
+            )
@@ -1,6 +1,9 @@
+import os
 from pathlib import Path
 from datetime import timedelta
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -29,10 +32,11 @@ INSTALLED_APPS = [
     "rest_framework",
     "rest_framework_simplejwt",
     "AuthenticationSystem.apps.AuthenticationsystemConfig",
-    # "Document",
+    "Document.apps.DocumentConfig",
 ]
 
 MIDDLEWARE = [
+    "DL.middleware.RequestMetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -40,6 +44,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "DL.middleware.SQLiteWriteQueueMiddleware",
 ]
 
 ROOT_URLCONF = "DL.urls"
@@ -68,7 +73,7 @@ WSGI_APPLICATION = "DL.wsgi.application"
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "AuthenticationSystem.authentication.CachedJWTAuthentication",
     ],
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticated",
@@ -81,14 +86,184 @@ SIMPLE_JWT = {
     "REFRESH_TOKEN_LIFETIME": timedelta(days=30),
 }
 
-# Database
-# https://docs.djangoproject.com/en/5.2/ref/settings/#databases
+# Like / dislike counters (see Document/counters.py)
+# BUFFERED = True keeps hot counters in memory and flushes them in batches
+# from a background thread every FLUSH_INTERVAL seconds (sooner past MAX_PENDING rows);
+# votes re-rank their blog and refresh its cached detail once flushed
+DOCUMENT_COUNTERS = {
+    "BUFFERED": False,
+    "FLUSH_INTERVAL": 1.0,
+    "MAX_PENDING": 1000,
+}
+
+# Blog content uploads (see Document/uploads.py)
+DOCUMENT_UPLOADS = {
+    "MAX_SIZE": 50 * 1024 * 1024,  # bytes
+    "CHUNK_SIZE": 64 * 1024,  # bytes read / hashed / written at a time
+}
+
+# Serving blog content files (see Document/serving.py)
+# MODE None streams from Django, "x-accel-redirect" (nginx) or "x-sendfile"
+# (Apache / lighttpd) lets the fronting server send the file
+DOCUMENT_SENDFILE = {
+    "MODE": None,
+    "PREFIX": "/protected/",
+}
+
+# Users resolved from JWTs are cached in-process for TTL seconds
+# (see AuthenticationSystem/authentication.py)
+AUTH_USER_CACHE = {
+    "ENABLED": True,
+    "TTL": 30,
+    "MAX_SIZE": 1024,
+}
+
+# Requests are authenticated from the user claims of the JWT, revoked tokens
+# are kept in memory and reloaded from the RevokedToken table every
+# SYNC_INTERVAL seconds (see AuthenticationSystem/denylist.py)
+AUTH_JWT = {
+    "STATELESS": True,
+    "ALIAS": "default",
+    "SYNC_INTERVAL": 300,
+    "FALSE_POSITIVE_RATE": 0.001,
+}
+
+# Password hashing / checking in a pool of processes, so it doesn't hold the
+# GIL of the request worker (see AuthenticationSystem/hashing.py)
+AUTH_PASSWORD_HASHING = {
+    "BACKEND": "process",  # or "inline"
+    "WORKERS": None,  # one per CPU
+    "MAX_QUEUE": 64,
+    "TIMEOUT": 10,
+}
+
+# Token buckets for singin / manual-login / login, per client IP and per
+# user_name tried (see AuthenticationSystem/throttling.py)
+AUTH_THROTTLE = {
+    "ENABLED": True,
+    "ALIAS": "default",
+    "IP": {"CAPACITY": 30, "PER_MINUTE": 30},
+    "USER_NAME": {"CAPACITY": 5, "PER_MINUTE": 5},
+    "IP_HEADER": None,  # e.g. "HTTP_X_FORWARDED_FOR" behind a proxy
+}
 
-DATABASES = {
+# Batch endpoints /doc/bulk/... (see Document/bulk.py)
+DOCUMENT_BULK = {
+    "MAX_ITEMS": 500,
+}
+
+# Archive of long-deactivated blogs (see Document/archive.py)
+DOCUMENT_ARCHIVE = {
+    "AFTER_DAYS": 90,
+    "BATCH_SIZE": 500,
+}
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# locmem is per process; point "default" at Redis or Memcached in production
+# so every worker shares the cached blog pages
+
+CACHES = {
     "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "dl-default",
+    }
+}
+
+# Cached blog details and feed pages (see Document/caching.py)
+DOCUMENT_CACHE = {
+    "ALIAS": "default",
+    "BLOG_TIMEOUT": 300,
+    "FEED_TIMEOUT": 60,
+    "STALE_TIMEOUT": 60,
+}
+
+# Database
+# https://docs.djangoproject.com/en/5.2/ref/settings/#databases
+#
+# SQLite unless DB_ENGINE=postgresql. PostgreSQL reads DB_NAME, DB_USER,
+# DB_PASSWORD, DB_HOST and DB_PORT. Each worker keeps its connection for
+# DB_CONN_MAX_AGE seconds and checks it before reuse. DB_POOL=1 switches
+# to psycopg's connection pool (pip install "psycopg[binary,pool]"),
+# sized by DB_POOL_MIN_SIZE / DB_POOL_MAX_SIZE. DB_SQLITE_TUNED=1 is the
+# profile for small deployments that stay on SQLite.
+
+
+def _env_bool(name, default=False):
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+DB_ENGINE = os.environ.get("DB_ENGINE", "sqlite")
+
+if DB_ENGINE == "sqlite":
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": os.environ.get("DB_NAME", BASE_DIR / "db.sqlite3"),
+            # a file-backed test database lets concurrent tests open one connection per thread
+            "TEST": {"NAME": BASE_DIR / "test_db.sqlite3"},
+        }
     }
+    if _env_bool("DB_SQLITE_TUNED"):
+        # WAL lets readers run next to the writer, IMMEDIATE takes the write
+        # lock when a transaction starts instead of failing on the upgrade
+        # from a read, timeout (seconds) is how long a writer waits its turn
+        DATABASES["default"]["OPTIONS"] = {
+            "init_command": (
+                "PRAGMA journal_mode=WAL;"
+                "PRAGMA synchronous=NORMAL;"
+                "PRAGMA mmap_size=268435456;"  # 256 MB
+                "PRAGMA cache_size=-32000;"  # 32 MB
+                "PRAGMA temp_store=MEMORY;"
+            ),
+            "transaction_mode": "IMMEDIATE",
+            "timeout": 20,
+        }
+elif DB_ENGINE == "postgresql":
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": os.environ.get("DB_NAME", "article_website"),
+            "USER": os.environ.get("DB_USER", "postgres"),
+            "PASSWORD": os.environ.get("DB_PASSWORD", ""),
+            "HOST": os.environ.get("DB_HOST", "localhost"),
+            "PORT": os.environ.get("DB_PORT", "5432"),
+            "CONN_MAX_AGE": int(os.environ.get("DB_CONN_MAX_AGE", 60)),
+            "CONN_HEALTH_CHECKS": True,
+            "OPTIONS": {},
+        }
+    }
+    if _env_bool("DB_POOL"):
+        # pooled connections are returned after every request, Django
+        # refuses persistent connections on top of a pool
+        DATABASES["default"]["CONN_MAX_AGE"] = 0
+        DATABASES["default"]["OPTIONS"]["pool"] = {
+            "min_size": int(os.environ.get("DB_POOL_MIN_SIZE", 2)),
+            "max_size": int(os.environ.get("DB_POOL_MAX_SIZE", 10)),
+            "timeout": int(os.environ.get("DB_POOL_TIMEOUT", 10)),
+        }
+else:
+    raise ImproperlyConfigured("DB_ENGINE must be sqlite or postgresql")
+
+# Requests that write wait their turn in-process on SQLite instead of
+# fighting over the database lock (see DL/middleware.py). On with
+# DB_SQLITE_TUNED; TIMEOUT is how long a write waits before a 503
+DB_WRITE_QUEUE = {
+    "ENABLED": DB_ENGINE == "sqlite" and _env_bool("DB_SQLITE_TUNED"),
+    "TIMEOUT": 30,
+}
+
+# Per-view latency, SQL and serializer time, response size: GET /metrics
+# (Prometheus text format) and a log of slow requests
+# (see DL/metrics.py, DL/middleware.py)
+REQUEST_METRICS = {
+    "ENABLED": True,
+    "SLOW_REQUEST_MS": 500,
+    "SLOW_QUERIES_LOGGED": 5,
+    "TOKEN": os.environ.get("METRICS_TOKEN") or None,
 }
 
 
@@ -128,6 +303,10 @@ USE_TZ = True
 
 STATIC_URL = "static/"
 
+# Uploaded blog content
+MEDIA_URL = "media/"
+MEDIA_ROOT = BASE_DIR / "media"
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
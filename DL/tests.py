@@ -0,0 +1,184 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection, transaction
+from django.http import HttpResponse
+from django.test import (
+    RequestFactory,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from rest_framework.test import APIClient
+
+from AuthenticationSystem.models import CustomUser
+from Document.models import Blog
+from . import metrics
+from .middleware import SQLiteWriteQueueMiddleware, _write_lock
+
+
+class SQLiteWriteQueueTests(TransactionTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.running = 0
+        self.most = 0
+        self.lock = threading.Lock()
+
+    def count(self):
+        with self.lock:
+            self.running += 1
+            self.most = max(self.most, self.running)
+        time.sleep(0.02)
+        with self.lock:
+            self.running -= 1
+
+    def slow_view(self, request):
+        # e.g. streaming an upload: no writes yet
+        self.count()
+        return HttpResponse()
+
+    def write(self):
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("CREATE TEMP TABLE IF NOT EXISTS queued (n integer)")
+            with transaction.atomic():
+                with connection.cursor() as cursor:
+                    cursor.execute("INSERT INTO queued VALUES (1)")
+                self.count()
+        finally:
+            connection.close()  # opened by this thread
+
+    def write_view(self, request):
+        self.write()
+        return HttpResponse()
+
+    def fire(self, middleware, method):
+        request = getattr(self.factory, method)("/")
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            list(pool.map(lambda _: middleware(request), range(8)))
+
+    @override_settings(DB_WRITE_QUEUE={"ENABLED": True})
+    def test_writes_run_one_at_a_time(self):
+        middleware = SQLiteWriteQueueMiddleware(self.write_view)
+        self.fire(middleware, "post")
+        self.assertEqual(self.most, 1)
+
+    @override_settings(DB_WRITE_QUEUE={"ENABLED": True})
+    def test_requests_are_not_queued_before_they_write(self):
+        middleware = SQLiteWriteQueueMiddleware(self.slow_view)
+        self.fire(middleware, "post")
+        self.assertGreater(self.most, 1)
+
+    @override_settings(DB_WRITE_QUEUE={"ENABLED": True})
+    def test_lock_is_held_only_while_writing(self):
+        held = []
+
+        def view(request):
+            held.append(_write_lock.locked())
+            with connection.cursor() as cursor:
+                cursor.execute("CREATE TEMP TABLE IF NOT EXISTS queued (n integer)")
+            held.append(_write_lock.locked())  # autocommit: given back
+            with transaction.atomic():
+                with connection.cursor() as cursor:
+                    cursor.execute("INSERT INTO queued VALUES (1)")
+                held.append(_write_lock.locked())
+            held.append(_write_lock.locked())  # committed
+            try:
+                with transaction.atomic():
+                    with connection.cursor() as cursor:
+                        cursor.execute("INSERT INTO queued VALUES (2)")
+                    raise ValueError
+            except ValueError:
+                pass
+            return HttpResponse()
+
+        SQLiteWriteQueueMiddleware(view)(self.factory.post("/"))
+        self.assertEqual(held, [False, False, True, False])
+        self.assertFalse(_write_lock.locked())  # the rollback's, at the end
+
+    @override_settings(DB_WRITE_QUEUE={"ENABLED": True, "TIMEOUT": 0.01})
+    def test_busy_after_timeout(self):
+        client = APIClient()
+        with _write_lock:
+            response = client.post(
+                "/auth/singin/",
+                {
+                    "first_name": "test",
+                    "last_name": "user",
+                    "user_name": "queued",
+                    "user_type": "normal",
+                    "password": "secret-pass",
+                },
+                format="json",
+            )
+        self.assertEqual(response.status_code, 503)
+        self.assertFalse(CustomUser.objects.filter(user_name="queued").exists())
+
+    @override_settings(DB_WRITE_QUEUE={"ENABLED": False})
+    def test_disabled(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            SQLiteWriteQueueMiddleware(self.write_view)
+
+    @override_settings(DB_WRITE_QUEUE={"ENABLED": True})
+    async def test_async_writes_run_one_at_a_time(self):
+        write = sync_to_async(self.write, thread_sensitive=False)
+
+        async def view(request):
+            await write()
+            return HttpResponse()
+
+        middleware = SQLiteWriteQueueMiddleware(view)
+        await asyncio.gather(
+            *(middleware(self.factory.post("/")) for _ in range(4)),
+        )
+        self.assertEqual(self.most, 1)
+
+
+class RequestMetricsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        metrics.registry.reset()
+        user = CustomUser.objects.create(user_name="writer")
+        Blog.objects.create(title="t", contect="t.txt", owner=user)
+
+    def series(self, histogram, view):
+        return metrics.registry.__dict__[histogram].series[(view, "GET")]
+
+    def test_records_per_view(self):
+        with self.assertNumQueries(2):
+            self.assertEqual(self.client.get("/doc/blogs/").status_code, 200)
+        self.client.get("/doc/blogs/")  # cached
+
+        self.assertEqual(metrics.registry.requests[("blog_list", "GET", "200")], 2)
+        # sum of the per-request counts: both queries of the first request
+        self.assertEqual(self.series("queries", "blog_list")[-1], 2)
+        self.assertGreater(self.series("serializer_time", "blog_list")[-1], 0)
+        self.assertGreater(self.series("size", "blog_list")[-1], 0)
+
+        body = self.client.get("/metrics").content.decode()
+        self.assertIn(
+            'http_requests_total{view="blog_list",method="GET",status="200"} 2', body
+        )
+        self.assertIn(
+            'http_request_db_queries_bucket{view="blog_list",method="GET",le="+Inf"} 2',
+            body,
+        )
+        self.assertIn("password_hashing_in_flight 0", body)
+
+    @override_settings(REQUEST_METRICS={"SLOW_REQUEST_MS": 0})
+    def test_slow_request_log(self):
+        with self.assertLogs("DL.slow_requests", "WARNING") as logs:
+            self.client.get("/doc/blogs/")
+        self.assertIn("(blog_list) 200", logs.output[0])
+        self.assertIn('FROM "Document_blog"', logs.output[0])
+
+    @override_settings(REQUEST_METRICS={"TOKEN": "scrape"})
+    def test_metrics_token(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 403)
+        response = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer scrape")
+        self.assertEqual(response.status_code, 200)
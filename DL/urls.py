@@ -1,10 +1,15 @@
 from django.contrib import admin
 from django.urls import path, include
 
+from .metrics import metrics_view
+
 urlpatterns = [
     # Uncomment if you want the admin:
     # path("admin/", admin.site.urls),
 
     path("auth/", include("AuthenticationSystem.urls")),
     path("doc/", include("Document.urls")),
+
+    # Prometheus metrics of this process, see DL/metrics.py
+    path("metrics", metrics_view, name="metrics"),
 ]
@@ -0,0 +1,244 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from AuthenticationSystem.models import CustomUser
+from .models import (
+    ArchivedBlog,
+    ArchivedComment,
+    Blog,
+    BlogTag,
+    BlogVote,
+    Comment,
+    CommentVote,
+)
+from .tags import set_tags_of_blogs
+from . import blobs, caching, ranking, search, uploads
+
+# ------------------------------
+# Archive of long-deactivated blogs (see `manage.py archive_blogs`)
+#
+# Blog.objects hides deactivated blogs, but their rows, comments, votes and
+# tag links still live in the hot tables. Blogs deactivated more than
+# AFTER_DAYS ago are moved to ArchivedBlog / ArchivedComment, with their
+# votes and tag names folded into JSON columns, and deleted from the hot
+# tables. Ids are kept, so activating the blog again (active_blog) puts
+# everything back under the same ids.
+#
+# The content file stays where it is: an archived blog keeps its reference
+# on the ContentBlob, cas_report counts it like a live blog.
+# ------------------------------
+
+
+def archive_settings():
+    defaults = {
+        "AFTER_DAYS": 90,  # days a blog stays deactivated before it is archived
+        "BATCH_SIZE": 500,  # blogs moved per transaction
+    }
+    defaults.update(getattr(settings, "DOCUMENT_ARCHIVE", {}))
+    return defaults
+
+
+# Ids of blogs deactivated for more than `after_days`
+def archivable_ids(after_days=None):
+    if after_days is None:
+        after_days = archive_settings()["AFTER_DAYS"]
+    cutoff = timezone.now() - timedelta(days=after_days)
+    return list(
+        Blog.all_objects.filter(active=False, deactivated_at__lt=cutoff)
+        .order_by("id")
+        .values_list("id", flat=True)
+    )
+
+
+def _votes_by(model, key, ids):
+    votes = defaultdict(list)
+    rows = model.objects.filter(**{f"{key}__in": ids}).values_list(
+        key, "user_id", "value"
+    )
+    for target_id, user_id, value in rows:
+        votes[target_id].append([user_id, value])
+    return votes
+
+
+# Move the given blogs (still deactivated) to the archive; returns how many
+def archive_blogs(blog_ids):
+    with transaction.atomic():
+        blogs = list(
+            Blog.all_objects.select_for_update().filter(id__in=blog_ids, active=False)
+        )
+        if not blogs:
+            return 0
+        ids = [blog.id for blog in blogs]
+
+        tags = defaultdict(list)
+        for blog_id, name in BlogTag.objects.filter(blog_id__in=ids).values_list(
+            "blog_id", "tag__name"
+        ):
+            tags[blog_id].append(name)
+        blog_votes = _votes_by(BlogVote, "blog_id", ids)
+        comments = list(Comment.objects.filter(blog_id__in=ids))
+        comment_votes = _votes_by(
+            CommentVote, "comment_id", [comment.id for comment in comments]
+        )
+
+        ArchivedBlog.objects.bulk_create(
+            [
+                ArchivedBlog(
+                    id=blog.id,
+                    title=blog.title,
+                    description=blog.description,
+                    contect=blog.contect.name,
+                    content_name=blog.content_name,
+                    content_hash=blog.content_hash,
+                    content_size=blog.content_size,
+                    tags=sorted(tags[blog.id]),
+                    votes=blog_votes[blog.id],
+                    likes=blog.likes,
+                    dislikes=blog.dislikes,
+                    comment_count=blog.comment_count,
+                    score=blog.score,
+                    owner_id=blog.owner_id,
+                    created_at=blog.created_at,
+                    deactivated_at=blog.deactivated_at,
+                )
+                for blog in blogs
+            ]
+        )
+        ArchivedComment.objects.bulk_create(
+            [
+                ArchivedComment(
+                    id=comment.id,
+                    blog_id=comment.blog_id,
+                    parent_id=comment.parent_id,
+                    content=comment.content,
+                    like=comment.like,
+                    dislike=comment.dislike,
+                    votes=comment_votes[comment.id],
+                    owner_id=comment.owner_id,
+                    created_at=comment.created_at,
+                )
+                for comment in comments
+            ]
+        )
+
+        # comments, votes, tag links and ranks go with the blogs
+        Blog.all_objects.filter(id__in=ids).delete()
+        search.unindex_blogs(ids)
+        caching.invalidate_blogs(ids, feed=False)
+    return len(ids)
+
+
+def _with_users(votes):
+    user_ids = {user_id for user_id, _ in votes}
+    return set(CustomUser.objects.filter(id__in=user_ids).values_list("id", flat=True))
+
+
+# Put an archived blog back as an active Blog; returns it, or None when
+# `blog_id` isn't an archived blog of `owner`
+def restore_blog(blog_id, owner):
+    with transaction.atomic():
+        archived = (
+            ArchivedBlog.objects.select_for_update()
+            .filter(id=blog_id, owner_id=owner.id)
+            .first()
+        )
+        if archived is None:
+            return None
+        comments = list(archived.comments.order_by("id"))
+        # replies whose thread went away with a deleted account are dropped
+        thread_ids = {c.id for c in comments if c.parent_id is None}
+        comments = [
+            c for c in comments if c.parent_id is None or c.parent_id in thread_ids
+        ]
+
+        blog = Blog(
+            id=archived.id,
+            title=archived.title,
+            description=archived.description,
+            contect=archived.contect,
+            content_name=archived.content_name,
+            content_hash=archived.content_hash,
+            content_size=archived.content_size,
+            likes=archived.likes,
+            dislikes=archived.dislikes,
+            comment_count=archived.comment_count,
+            score=archived.score,
+            owner_id=archived.owner_id,
+        )
+        Blog.all_objects.bulk_create([blog])
+        # created_at is auto_now_add, put the original dates back
+        blog.created_at = archived.created_at
+        Blog.all_objects.filter(id=blog.id).update(created_at=archived.created_at)
+
+        restored = Comment.objects.bulk_create(
+            [
+                Comment(
+                    id=comment.id,
+                    blog_id=blog.id,
+                    parent_id=comment.parent_id,
+                    content=comment.content,
+                    like=comment.like,
+                    dislike=comment.dislike,
+                    owner_id=comment.owner_id,
+                )
+                for comment in comments
+            ]
+        )
+        for comment, original in zip(restored, comments):
+            comment.created_at = original.created_at
+        Comment.objects.bulk_update(restored, ["created_at"])
+
+        # votes of accounts deleted in the meantime are dropped;
+        # reconcile_blog_stats brings the counters back in line
+        votes = archived.votes + [vote for c in comments for vote in c.votes]
+        users = _with_users(votes)
+        BlogVote.objects.bulk_create(
+            [
+                BlogVote(user_id=user_id, blog_id=blog.id, value=value)
+                for user_id, value in archived.votes
+                if user_id in users
+            ]
+        )
+        CommentVote.objects.bulk_create(
+            [
+                CommentVote(user_id=user_id, comment_id=comment.id, value=value)
+                for comment in comments
+                for user_id, value in comment.votes
+                if user_id in users
+            ]
+        )
+        set_tags_of_blogs({blog.id: archived.tags} if archived.tags else {})
+        search.index_blog(blog, _content_text(blog))
+
+        archived.delete()
+        caching.invalidate_blog(blog.id)
+        ranking.update_blog(blog.id)
+    return blog
+
+
+def _content_text(blog):
+    try:
+        blog.contect.open("rb")
+    except OSError:
+        return ""  # missing file: indexed by title and description only
+    with blog.contect:
+        return uploads.text_preview(blog.contect, search.MAX_CONTENT_CHARS)
+
+
+# Delete an archived blog of `owner` for good; returns False when not found
+def delete_archived(blog_id, owner):
+    with transaction.atomic():
+        archived = (
+            ArchivedBlog.objects.select_for_update()
+            .filter(id=blog_id, owner_id=owner.id)
+            .first()
+        )
+        if archived is None:
+            return False
+        archived.delete()
+        blobs.release(archived.content_hash)
+    return True
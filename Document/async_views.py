@@ -0,0 +1,293 @@
+import functools
+import json
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+
+from AuthenticationSystem.authentication import CachedJWTAuthentication
+from .models import Blog
+from .pagination import akeyset_page, page_size
+from .serializers import BlogFullSerializer, BlogListSerializer, CommentThreadSerializer
+from .views import (
+    BLOG_FEED_ORDERING,
+    COMMENT_THREAD_ORDERING,
+    MAX_VOTE_LOOKUP,
+    comment_threads,
+    feed_queryset,
+    parse_ids,
+)
+from . import caching, ranking, votes
+
+# ------------------------------
+# Async versions of the read and vote endpoints (/doc/async/...)
+#
+# Same requests and responses as the views in views.py, written as
+# coroutines for an ASGI server (uvicorn DL.asgi:application): while one
+# request waits on the database or the cache, the event loop serves the
+# others instead of parking a worker thread per request.
+#
+# DRF's @api_view is synchronous, so these are plain Django async views:
+# the JWT is checked by CachedJWTAuthentication.aauthenticate and rows are
+# read with the async ORM (aget, async for). Voting needs a transaction
+# with select_for_update, which the async ORM doesn't offer; it runs in a
+# thread through sync_to_async.
+# ------------------------------
+
+_authentication = CachedJWTAuthentication()
+
+
+def async_api_view(methods, login_required=False):
+    def decorator(view):
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in methods:
+                return JsonResponse(
+                    {"error": f"method {request.method} not allowed"},
+                    status=status.HTTP_405_METHOD_NOT_ALLOWED,
+                )
+            try:
+                result = await _authentication.aauthenticate(request)
+            except (AuthenticationFailed, InvalidToken) as e:
+                return JsonResponse(
+                    {"error": e.detail}, status=status.HTTP_401_UNAUTHORIZED
+                )
+            request.user = result[0] if result else AnonymousUser()
+            if login_required and not request.user.is_authenticated:
+                return JsonResponse(
+                    {"error": "Authentication credentials were not provided."},
+                    status=status.HTTP_401_UNAUTHORIZED,
+                )
+            return await view(request, *args, **kwargs)
+
+        # token authentication, no session cookie to protect
+        return csrf_exempt(wrapper)
+
+    return decorator
+
+
+def _data(request):
+    if request.content_type == "application/json":
+        try:
+            data = json.loads(request.body or b"{}")
+        except ValueError:
+            return {}
+        return data if isinstance(data, dict) else {}
+    return request.POST
+
+
+# ------------------------------
+# Reads
+# ------------------------------
+
+
+@async_api_view(["GET"])
+async def blog_list(request):
+    owner_id = request.GET.get("owner")
+    tag = request.GET.get("tag")
+    cursor = request.GET.get("cursor")
+
+    try:
+        size = page_size(request.GET.get("size"))
+    except ValueError:
+        return JsonResponse(
+            {"error": "size must be a positive number"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    if owner_id and not owner_id.isdigit():
+        return JsonResponse(
+            {"error": "owner must be a user id"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    blogs = feed_queryset(owner_id, tag)
+
+    async def load_page():
+        page, next_cursor = await akeyset_page(
+            blogs, BLOG_FEED_ORDERING, cursor, size
+        )
+        return {
+            "blogs": BlogListSerializer(page, many=True).data,
+            "next_cursor": next_cursor,
+        }
+
+    try:
+        # shares its cache entries with the sync view
+        data = await caching.afeed_page(
+            load_page, owner=owner_id, tag=tag, cursor=cursor, size=size
+        )
+    except ValueError as e:
+        return JsonResponse({"error": f"{e}"}, status=status.HTTP_400_BAD_REQUEST)
+
+    return JsonResponse(
+        {
+            "blogs": data["blogs"],
+            "next_cursor": data["next_cursor"],
+            "my_votes": await votes.avotes_for(
+                votes.BLOG, request.user, [blog["id"] for blog in data["blogs"]]
+            ),
+        }
+    )
+
+
+@async_api_view(["GET"])
+async def blog_detail(request, blog_id):
+    async def load_blog():
+        blog = await Blog.objects.prefetch_related("tags").filter(id=blog_id).afirst()
+        return BlogFullSerializer(blog).data if blog else None
+
+    data = await caching.ablog_detail(blog_id, load_blog)
+
+    if data is None:
+        # inactive blogs are only shown to their owner, and never cached
+        blog = (
+            await Blog.all_objects.filter(
+                id=blog_id, active=False, owner_id=request.user.id
+            )
+            .prefetch_related("tags")
+            .afirst()
+        )
+        if blog is None:
+            return JsonResponse(
+                {"error": "your blog not found"}, status=status.HTTP_404_NOT_FOUND
+            )
+        data = BlogFullSerializer(blog).data
+
+    my_votes = await votes.avotes_for(votes.BLOG, request.user, [blog_id])
+    return JsonResponse(
+        {"blog": data, "my_vote": my_votes.get(blog_id, votes.NO_VOTE)}
+    )
+
+
+@async_api_view(["GET"])
+async def comment_list(request, blog_id):
+    cursor = request.GET.get("cursor")
+
+    try:
+        size = page_size(request.GET.get("size"))
+    except ValueError:
+        return JsonResponse(
+            {"error": "size must be a positive number"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    blog = await Blog.all_objects.filter(id=blog_id).values("active", "owner_id").afirst()
+    if blog is None or (not blog["active"] and blog["owner_id"] != request.user.id):
+        return JsonResponse(
+            {"error": "your blog not found"}, status=status.HTTP_404_NOT_FOUND
+        )
+
+    try:
+        page, next_cursor = await akeyset_page(
+            comment_threads(blog_id), COMMENT_THREAD_ORDERING, cursor, size
+        )
+    except ValueError as e:
+        return JsonResponse({"error": f"{e}"}, status=status.HTTP_400_BAD_REQUEST)
+
+    comment_ids = [comment.id for comment in page]
+    comment_ids += [reply.id for comment in page for reply in comment.replies.all()]
+
+    return JsonResponse(
+        {
+            "comments": CommentThreadSerializer(page, many=True).data,
+            "next_cursor": next_cursor,
+            "my_votes": await votes.avotes_for(votes.COMMENT, request.user, comment_ids),
+        }
+    )
+
+
+@async_api_view(["GET"], login_required=True)
+async def my_votes(request):
+    try:
+        blog_ids = parse_ids(request.GET.get("blog_ids"))
+        comment_ids = parse_ids(request.GET.get("comment_ids"))
+    except ValueError:
+        return JsonResponse(
+            {"error": "ids must be comma separated numbers"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    if len(blog_ids) + len(comment_ids) > MAX_VOTE_LOOKUP:
+        return JsonResponse(
+            {"error": f"at most {MAX_VOTE_LOOKUP} ids per request"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    return JsonResponse(
+        {
+            "blogs": await votes.avotes_for(votes.BLOG, request.user, blog_ids),
+            "comments": await votes.avotes_for(
+                votes.COMMENT, request.user, comment_ids
+            ),
+        }
+    )
+
+
+# ------------------------------
+# Votes
+# ------------------------------
+
+
+@sync_to_async
+def _toggle(target, user, target_id, direction):
+    state = votes.toggle(target, user, target_id, direction)
+    if state is not None and target is votes.BLOG:
+        ranking.update_blog(target_id)
+        caching.invalidate_blog(target_id, feed=False)
+    return state
+
+
+async def vote_response(request, target, key, noun, direction):
+    target_id = _data(request).get(key)
+
+    if not target_id:
+        return JsonResponse(
+            {"error": f"{key} field is required"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    try:
+        state = await _toggle(target, request.user, target_id, direction)
+    except ValueError as e:
+        return JsonResponse({"error": f"{e}"}, status=status.HTTP_400_BAD_REQUEST)
+
+    if state is None:
+        return JsonResponse(
+            {"error": f"your {noun} not found"}, status=status.HTTP_404_NOT_FOUND
+        )
+
+    if state == votes.LIKE:
+        msg = f"{noun} liked"
+    elif state == votes.DISLIKE:
+        msg = f"{noun} disliked"
+    else:
+        msg = f"{noun} vote removed"
+
+    return JsonResponse({"msg": msg, "vote": state})
+
+
+@async_api_view(["PATCH"], login_required=True)
+async def like_comment(request):
+    return await vote_response(
+        request, votes.COMMENT, "comment_id", "comment", votes.LIKE
+    )
+
+
+@async_api_view(["PATCH"], login_required=True)
+async def dislike_comment(request):
+    return await vote_response(
+        request, votes.COMMENT, "comment_id", "comment", votes.DISLIKE
+    )
+
+
+@async_api_view(["PATCH"], login_required=True)
+async def like_blog(request):
+    return await vote_response(request, votes.BLOG, "blog_id", "blog", votes.LIKE)
+
+
+@async_api_view(["PATCH"], login_required=True)
+async def dislike_blog(request):
+    return await vote_response(request, votes.BLOG, "blog_id", "blog", votes.DISLIKE)
@@ -0,0 +1,97 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import F
+
+from .models import ContentBlob
+from .storage import blob_name, content_storage
+
+# ------------------------------
+# Reference counting of content-addressed files (see Document/storage.py)
+#
+# ContentBlob counts the blogs pointing at each stored file; the bytes are
+# deleted when the last reference is released, under a lock on the blob
+# row that new references of the same bytes wait for.
+# ------------------------------
+
+
+# Count `count` more blogs using the blob (inside the caller's transaction)
+def acquire(sha256, size, count=1):
+    while True:
+        updated = ContentBlob.objects.filter(sha256=sha256).update(
+            refcount=F("refcount") + count
+        )
+        if updated:
+            return
+        ContentBlob.objects.bulk_create(
+            [ContentBlob(sha256=sha256, size=size, refcount=0)], ignore_conflicts=True
+        )
+
+
+# acquire() for many blobs, {(sha256, size): count}, inside the caller's
+# transaction; a few queries per distinct count instead of a round trip
+# per blob
+def acquire_many(refs):
+    if not refs:
+        return
+    ContentBlob.objects.bulk_create(
+        [ContentBlob(sha256=sha256, size=size, refcount=0) for sha256, size in refs],
+        ignore_conflicts=True,
+    )
+    groups = defaultdict(list)
+    for (sha256, size), count in refs.items():
+        groups[count].append((sha256, size))
+    for count, blobs in groups.items():
+        # locked rows can't be released (deleted) before we commit
+        locked = set(
+            ContentBlob.objects.select_for_update()
+            .filter(sha256__in=[sha256 for sha256, _ in blobs])
+            .values_list("sha256", flat=True)
+        )
+        ContentBlob.objects.filter(sha256__in=locked).update(
+            refcount=F("refcount") + count
+        )
+        for sha256, size in blobs:
+            if sha256 not in locked:  # released in between
+                acquire(sha256, size, count)
+
+
+# Count `count` blogs less, the file goes away with the last reference
+def release(sha256, count=1):
+    if not sha256:
+        return
+    with transaction.atomic():
+        blob = ContentBlob.objects.select_for_update().filter(sha256=sha256).first()
+        if blob is None:
+            return
+        if blob.refcount > count:
+            ContentBlob.objects.filter(sha256=sha256).update(
+                refcount=F("refcount") - count
+            )
+            return
+        blob.delete()
+
+    transaction.on_commit(lambda: _delete_if_unused(sha256))
+
+
+def _delete_if_unused(sha256):
+    with transaction.atomic():
+        # hold the blob row while the file goes: an upload of the same bytes
+        # acquiring it now waits for this transaction, then restores the file
+        ContentBlob.objects.bulk_create(
+            [ContentBlob(sha256=sha256, size=0, refcount=0)], ignore_conflicts=True
+        )
+        blob = ContentBlob.objects.select_for_update().get(sha256=sha256)
+        if blob.refcount > 0:
+            return  # claimed again in the meantime
+        content_storage.delete(blob_name(sha256))
+        blob.delete()
+
+
+# Call after acquire() / acquire_many(), in the same transaction, with the
+# contents just stored: storage skips writing a file that exists, and a
+# release committed since may have deleted it. The reference now keeps it.
+def restore(contents):
+    for content in contents:
+        if not content_storage.exists(blob_name(content.sha256)):
+            content_storage.rewrite(content)
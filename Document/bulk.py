@@ -0,0 +1,424 @@
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q
+
+from .models import Blog, Comment
+from . import blobs, caching, ranking, search, stats, uploads
+from .tags import parse_tags, set_tags_of_blogs
+
+# ------------------------------
+# Batch writes for blogs and comments
+#
+# Every function takes the request user and the list of items sent by the
+# client, checks all items first (a handful of queries for the whole
+# batch), then writes the valid ones with bulk_create / bulk_update /
+# DELETE ... IN inside one transaction. The result has one entry per item,
+# in order:
+#
+#   {"index": 0, "status": 201, "id": 12}
+#   {"index": 1, "status": 403, "error": "you aren't allowed"}
+#
+# Invalid items never stop the valid ones from being written.
+# ------------------------------
+
+
+def bulk_settings():
+    defaults = {
+        "MAX_ITEMS": 500,  # items per request
+    }
+    defaults.update(getattr(settings, "DOCUMENT_BULK", {}))
+    return defaults
+
+
+def check_items(items):
+    limit = bulk_settings()["MAX_ITEMS"]
+    if not isinstance(items, list) or not items:
+        raise ValueError("items must be a non-empty list")
+    if len(items) > limit:
+        raise ValueError(f"at most {limit} items per request")
+    return items
+
+
+def _ok(index, status, **extra):
+    return {"index": index, "status": status, **extra}
+
+
+def _fail(index, status, error):
+    return {"index": index, "status": status, "error": error}
+
+
+def _id_of(item, key="id", bare=False):
+    if bare and not isinstance(item, dict):
+        value = item  # a plain id
+    else:
+        value = item.get(key)
+    if isinstance(value, bool):
+        raise ValueError
+    return int(value)
+
+
+def _text_of(blog, content):
+    if content is not None:
+        return content
+    if not blog.contect:
+        return ""
+    # title / description changed without new content: reindex the stored text
+    with blog.contect.open("rb") as stored:
+        return uploads.text_preview(stored, search.MAX_CONTENT_CHARS)
+
+
+# ------------------------------
+# Blogs
+# ------------------------------
+
+
+# items: {"title", "description", "content" (text), "tags"}
+def create_blogs(user, items):
+    results = [None] * len(items)
+    pending = []  # (index, blog, content, text, tag names)
+
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            results[index] = _fail(index, 400, "item must be an object")
+            continue
+        title = item.get("title")
+        description = item.get("description")
+        text = item.get("content")
+        if not all([title, description, text]):
+            results[index] = _fail(
+                index, 400, "title, description and content are required"
+            )
+            continue
+        try:
+            tag_names = parse_tags(item.get("tags"))
+            content = uploads.content_from_text(text)
+        except uploads.UploadError as e:
+            results[index] = _fail(index, e.status_code, f"{e}")
+            continue
+        except ValueError as e:
+            results[index] = _fail(index, 400, f"{e}")
+            continue
+        blog = Blog(title=title, description=description, owner=user)
+        pending.append((index, blog, content, text, tag_names))
+
+    if not pending:
+        return results
+
+    # files are stored before the transaction, as in create_blog
+    refs = Counter()
+    for _, blog, content, _, _ in pending:
+        uploads.attach_content(blog, content)
+        refs[(blog.content_hash, blog.content_size)] += 1
+
+    new_blogs = [blog for _, blog, _, _, _ in pending]
+    with transaction.atomic():
+        Blog.objects.bulk_create(new_blogs)
+        blobs.acquire_many(refs)
+        blobs.restore(content for _, _, content, _, _ in pending)
+        set_tags_of_blogs(
+            {blog.id: names for _, blog, _, _, names in pending if names}
+        )
+        search.index_blogs([(blog, text) for _, blog, _, text, _ in pending])
+        ids = [blog.id for blog in new_blogs]
+        caching.invalidate_blogs(ids)
+        ranking.update_blogs(ids)
+
+    for index, blog, _, _, _ in pending:
+        results[index] = _ok(index, 201, id=blog.id)
+    return results
+
+
+# items: {"id", and any of "title", "description", "content" (text), "tags"}
+def update_blogs(user, items):
+    results = [None] * len(items)
+    wanted = {}
+    for index, item in enumerate(items):
+        try:
+            wanted[index] = _id_of(item)
+        except (AttributeError, TypeError, ValueError):
+            results[index] = _fail(index, 400, "id is required")
+    blogs = Blog.all_objects.in_bulk(set(wanted.values()))
+
+    pending = []  # (index, blog, new content or None, tag names or None, item)
+    seen = set()
+    for index, blog_id in wanted.items():
+        item = items[index]
+        blog = blogs.get(blog_id)
+        if blog is None:
+            results[index] = _fail(index, 404, "your blog not found")
+            continue
+        if blog.owner_id != user.id:
+            results[index] = _fail(index, 403, "you aren't allowed")
+            continue
+        if blog_id in seen:
+            results[index] = _fail(index, 400, "blog listed twice")
+            continue
+        fields = [
+            name
+            for name in ("title", "description", "content", "tags")
+            if item.get(name)
+        ]
+        if not fields:
+            results[index] = _fail(index, 400, "nothing to update")
+            continue
+        try:
+            tag_names = parse_tags(item["tags"]) if "tags" in fields else None
+            content = None
+            if "content" in fields:
+                content = uploads.content_from_text(item["content"])
+        except uploads.UploadError as e:
+            results[index] = _fail(index, e.status_code, f"{e}")
+            continue
+        except ValueError as e:
+            results[index] = _fail(index, 400, f"{e}")
+            continue
+        seen.add(blog_id)
+        blog.title = item.get("title") or blog.title
+        blog.description = item.get("description") or blog.description
+        pending.append((index, blog, content, tag_names, item))
+
+    if not pending:
+        return results
+
+    acquired, released = Counter(), Counter()
+    for _, blog, content, _, _ in pending:
+        if content is not None:
+            released[blog.content_hash] += 1
+            uploads.attach_content(blog, content)
+            acquired[(blog.content_hash, blog.content_size)] += 1
+
+    reindex = [
+        (blog, _text_of(blog, item.get("content")))
+        for _, blog, _, _, item in pending
+        if any(item.get(name) for name in ("title", "description", "content"))
+    ]
+
+    with transaction.atomic():
+        Blog.all_objects.bulk_update(
+            [blog for _, blog, _, _, _ in pending],
+            [
+                "title",
+                "description",
+                "contect",
+                "content_name",
+                "content_hash",
+                "content_size",
+            ],
+        )
+        blobs.acquire_many(acquired)
+        blobs.restore(
+            content for _, _, content, _, _ in pending if content is not None
+        )
+        for sha256, count in released.items():
+            blobs.release(sha256, count)
+        set_tags_of_blogs(
+            {blog.id: names for _, blog, _, names, _ in pending if names is not None}
+        )
+        search.index_blogs(reindex)
+        caching.invalidate_blogs([blog.id for _, blog, _, _, _ in pending])
+
+    for index, blog, _, _, _ in pending:
+        results[index] = _ok(index, 200, id=blog.id)
+    return results
+
+
+# items: blog ids (or {"id": ...})
+def delete_blogs(user, items):
+    results = [None] * len(items)
+    wanted = {}
+    for index, item in enumerate(items):
+        try:
+            wanted[index] = _id_of(item, bare=True)
+        except (AttributeError, TypeError, ValueError):
+            results[index] = _fail(index, 400, "id is required")
+    rows = {
+        row["id"]: row
+        for row in Blog.all_objects.filter(id__in=set(wanted.values())).values(
+            "id", "owner_id", "content_hash"
+        )
+    }
+
+    doomed = {}
+    for index, blog_id in wanted.items():
+        row = rows.get(blog_id)
+        if row is None:
+            results[index] = _fail(index, 404, "your blog not found")
+        elif row["owner_id"] != user.id:
+            results[index] = _fail(index, 403, "you aren't allowed")
+        else:
+            doomed[index] = blog_id
+
+    ids = set(doomed.values())
+    if ids:
+        with transaction.atomic():
+            search.unindex_blogs(ids)
+            caching.invalidate_blogs(ids)
+            Blog.all_objects.filter(id__in=ids).delete()
+            for sha256, count in Counter(rows[i]["content_hash"] for i in ids).items():
+                blobs.release(sha256, count)
+
+    for index, blog_id in doomed.items():
+        results[index] = _ok(index, 200, id=blog_id)
+    return results
+
+
+# ------------------------------
+# Comments
+# ------------------------------
+
+
+def _comments_changed(blog_counts):
+    blog_ids = list(blog_counts)
+    caching.invalidate_blogs(blog_ids, feed=False)
+    ranking.update_blogs(blog_ids)
+
+
+# items: {"blog_id", "content", "parent_id" (optional)}
+def create_comments(user, items):
+    results = [None] * len(items)
+    checked = {}
+    for index, item in enumerate(items):
+        if not isinstance(item, dict) or not item.get("content"):
+            results[index] = _fail(index, 400, "blog_id and content are required")
+            continue
+        try:
+            blog_id = _id_of(item, "blog_id")
+            parent_id = _id_of(item, "parent_id") if item.get("parent_id") else None
+        except (TypeError, ValueError):
+            results[index] = _fail(index, 400, "blog_id and content are required")
+            continue
+        checked[index] = (blog_id, parent_id)
+
+    blog_ids = set(
+        Blog.objects.filter(
+            id__in={blog_id for blog_id, _ in checked.values()}
+        ).values_list("id", flat=True)
+    )
+    parents = {
+        row["id"]: row
+        for row in Comment.objects.filter(
+            id__in={parent_id for _, parent_id in checked.values() if parent_id}
+        ).values("id", "blog_id", "parent_id")
+    }
+
+    pending = []
+    for index, (blog_id, parent_id) in checked.items():
+        if blog_id not in blog_ids:
+            results[index] = _fail(index, 404, f"there is no blog with {blog_id} id")
+            continue
+        parent = parents.get(parent_id) if parent_id else None
+        if parent_id and (parent is None or parent["blog_id"] != blog_id):
+            results[index] = _fail(
+                index, 404, f"there is no comment with {parent_id} id on this blog"
+            )
+            continue
+        comment = Comment(
+            content=items[index]["content"],
+            blog_id=blog_id,
+            # a reply to a reply joins the same thread
+            parent_id=(parent["parent_id"] or parent["id"]) if parent else None,
+            owner=user,
+        )
+        pending.append((index, comment))
+
+    if pending:
+        blog_counts = Counter(comment.blog_id for _, comment in pending)
+        with transaction.atomic():
+            Comment.objects.bulk_create([comment for _, comment in pending])
+            for blog_id, count in blog_counts.items():
+                stats.comments_added(blog_id, count)
+            _comments_changed(blog_counts)
+
+    for index, comment in pending:
+        results[index] = _ok(index, 201, id=comment.id)
+    return results
+
+
+# items: {"id", "content"}
+def update_comments(user, items):
+    results = [None] * len(items)
+    wanted = {}
+    for index, item in enumerate(items):
+        try:
+            wanted[index] = _id_of(item)
+        except (AttributeError, TypeError, ValueError):
+            results[index] = _fail(index, 400, "id and content are required")
+            continue
+        if not item.get("content"):
+            del wanted[index]
+            results[index] = _fail(index, 400, "id and content are required")
+    comments = Comment.objects.in_bulk(set(wanted.values()))
+
+    pending = {}
+    for index, comment_id in wanted.items():
+        comment = comments.get(comment_id)
+        if comment is None:
+            results[index] = _fail(
+                index, 404, f"there is no comment by id: {comment_id}"
+            )
+        elif comment.owner_id != user.id:
+            results[index] = _fail(index, 403, "you are not allowed")
+        else:
+            comment.content = items[index]["content"]
+            pending[index] = comment
+
+    if pending:
+        with transaction.atomic():
+            Comment.objects.bulk_update(list(pending.values()), ["content"])
+            caching.invalidate_blogs(
+                {comment.blog_id for comment in pending.values()}, feed=False
+            )
+
+    for index, comment in pending.items():
+        results[index] = _ok(index, 200, id=comment.id)
+    return results
+
+
+# items: comment ids (or {"id": ...}); replies go with their thread
+def delete_comments(user, items):
+    results = [None] * len(items)
+    wanted = {}
+    for index, item in enumerate(items):
+        try:
+            wanted[index] = _id_of(item, bare=True)
+        except (AttributeError, TypeError, ValueError):
+            results[index] = _fail(index, 400, "id is required")
+    rows = {
+        row["id"]: row
+        for row in Comment.objects.filter(id__in=set(wanted.values())).values(
+            "id", "owner_id"
+        )
+    }
+
+    doomed = {}
+    for index, comment_id in wanted.items():
+        row = rows.get(comment_id)
+        if row is None:
+            results[index] = _fail(
+                index, 404, f"there is no comment by id: {comment_id}"
+            )
+        elif row["owner_id"] != user.id:
+            results[index] = _fail(index, 403, "you aren't allowed")
+        else:
+            doomed[index] = comment_id
+
+    ids = set(doomed.values())
+    if ids:
+        with transaction.atomic():
+            gone = Comment.objects.filter(Q(id__in=ids) | Q(parent_id__in=ids))
+            blog_counts = dict(
+                gone.order_by()
+                .values("blog_id")
+                .annotate(n=Count("id"))
+                .values_list("blog_id", "n")
+            )
+            Comment.objects.filter(id__in=ids).delete()
+            for blog_id, count in blog_counts.items():
+                stats.comments_removed(blog_id, count)
+            _comments_changed(blog_counts)
+
+    for index, comment_id in doomed.items():
+        results[index] = _ok(index, 200, id=comment_id)
+    return results
@@ -0,0 +1,199 @@
+import asyncio
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+# ------------------------------
+# Response caching for the blog read endpoints
+#
+# Serialized blog details and feed pages are kept in the cache named by
+# DOCUMENT_CACHE["ALIAS"] (locmem by default, Redis / Memcached in
+# production through CACHES).
+#
+# Invalidation is by version: every blog has a version counter and all
+# feed pages share one, and cache keys include the current version. A
+# write bumps the version after commit, so an entry computed from old data
+# can never be read again, even if it is stored after the bump.
+#
+# Entries are fresh for BLOG_TIMEOUT / FEED_TIMEOUT seconds, then kept for
+# STALE_TIMEOUT more as stale copies: the first reader to notice takes a short lock and
+# recomputes while the others keep getting the stale copy, so a popular
+# blog expiring doesn't send every worker to the database at once.
+# ------------------------------
+
+MISSING = "__missing__"  # cached "not found / not public"
+
+
+def cache_settings():
+    defaults = {
+        "ALIAS": "default",
+        "BLOG_TIMEOUT": 300,  # seconds an entry is fresh
+        "FEED_TIMEOUT": 60,
+        "STALE_TIMEOUT": 60,  # extra seconds a stale entry may be served
+        "LOCK_TIMEOUT": 10,  # seconds a recompute lock is held at most
+        "LOCK_WAIT": 2.0,  # seconds a reader waits for the first value
+    }
+    defaults.update(getattr(settings, "DOCUMENT_CACHE", {}))
+    return defaults
+
+
+def _cache():
+    return caches[cache_settings()["ALIAS"]]
+
+
+def _version(name):
+    cache = _cache()
+    key = f"doc:v:{name}"
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, 1, timeout=None)
+        version = cache.get(key, 1)
+    return version
+
+
+def _bump(name):
+    cache = _cache()
+    key = f"doc:v:{name}"
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 2, timeout=None)
+
+
+# Value for `key`, computed with `compute()` at most once at a time
+def get_or_compute(key, compute, timeout):
+    conf = cache_settings()
+    cache = _cache()
+    lock_key = f"{key}:lock"
+
+    entry = cache.get(key)
+    if entry is not None:
+        fresh_until, value = entry
+        if fresh_until > time.time() or not cache.add(
+            lock_key, 1, conf["LOCK_TIMEOUT"]
+        ):
+            return value  # fresh, or stale while someone else recomputes
+    elif not cache.add(lock_key, 1, conf["LOCK_TIMEOUT"]):
+        # cold entry being computed by another request: wait for it
+        deadline = time.monotonic() + conf["LOCK_WAIT"]
+        while time.monotonic() < deadline:
+            time.sleep(0.02)
+            entry = cache.get(key)
+            if entry is not None:
+                return entry[1]
+        return compute()
+
+    try:
+        value = compute()
+        cache.set(
+            key, (time.time() + timeout, value), timeout + conf["STALE_TIMEOUT"]
+        )
+        return value
+    finally:
+        cache.delete(lock_key)
+
+
+# Same as get_or_compute, for the async views: `acompute` is a coroutine
+# function and the cache is used through its a* methods
+async def aget_or_compute(key, acompute, timeout):
+    conf = cache_settings()
+    cache = _cache()
+    lock_key = f"{key}:lock"
+
+    entry = await cache.aget(key)
+    if entry is not None:
+        fresh_until, value = entry
+        if fresh_until > time.time() or not await cache.aadd(
+            lock_key, 1, conf["LOCK_TIMEOUT"]
+        ):
+            return value
+    elif not await cache.aadd(lock_key, 1, conf["LOCK_TIMEOUT"]):
+        deadline = time.monotonic() + conf["LOCK_WAIT"]
+        while time.monotonic() < deadline:
+            await asyncio.sleep(0.02)
+            entry = await cache.aget(key)
+            if entry is not None:
+                return entry[1]
+        return await acompute()
+
+    try:
+        value = await acompute()
+        await cache.aset(
+            key, (time.time() + timeout, value), timeout + conf["STALE_TIMEOUT"]
+        )
+        return value
+    finally:
+        await cache.adelete(lock_key)
+
+
+async def _aversion(name):
+    cache = _cache()
+    key = f"doc:v:{name}"
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, 1, timeout=None)
+        version = await cache.aget(key, 1)
+    return version
+
+
+def _feed_digest(params):
+    raw = "&".join(f"{name}={params[name]}" for name in sorted(params))
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def blog_key(blog_id):
+    return f"doc:blog:{blog_id}:{_version(f'blog:{blog_id}')}"
+
+
+def feed_key(**params):
+    return f"doc:feed:{_version('feed')}:{_feed_digest(params)}"
+
+
+# Serialized blog, or None when missing / inactive
+def blog_detail(blog_id, compute):
+    value = get_or_compute(
+        blog_key(blog_id),
+        lambda: compute() or MISSING,
+        cache_settings()["BLOG_TIMEOUT"],
+    )
+    return None if value == MISSING else value
+
+
+def feed_page(compute, **params):
+    return get_or_compute(
+        feed_key(**params), compute, cache_settings()["FEED_TIMEOUT"]
+    )
+
+
+async def ablog_detail(blog_id, acompute):
+    async def compute():
+        return await acompute() or MISSING
+
+    key = f"doc:blog:{blog_id}:{await _aversion(f'blog:{blog_id}')}"
+    value = await aget_or_compute(key, compute, cache_settings()["BLOG_TIMEOUT"])
+    return None if value == MISSING else value
+
+
+async def afeed_page(acompute, **params):
+    key = f"doc:feed:{await _aversion('feed')}:{_feed_digest(params)}"
+    return await aget_or_compute(key, acompute, cache_settings()["FEED_TIMEOUT"])
+
+
+# Call after a write that changes what readers see of the blog
+def invalidate_blog(blog_id, feed=True):
+    invalidate_blogs([blog_id], feed)
+
+
+def invalidate_blogs(blog_ids, feed=True):
+    blog_ids = list(blog_ids)
+
+    def bump():
+        for blog_id in blog_ids:
+            _bump(f"blog:{blog_id}")
+        if feed:
+            _bump("feed")
+
+    transaction.on_commit(bump)
@@ -0,0 +1,172 @@
+import atexit
+import logging
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import F
+
+from .models import Blog
+from . import caching, ranking
+
+logger = logging.getLogger(__name__)
+
+# ------------------------------
+# Counter updates for likes / dislikes
+#
+# Every increment is applied as a single
+# `UPDATE ... SET col = col + n WHERE id = ...` so concurrent votes never
+# overwrite each other and only the counter columns are written.
+#
+# When DOCUMENT_COUNTERS["BUFFERED"] is on, increments are collected in
+# memory and flushed in batches (one UPDATE per distinct delta) by a
+# background thread, so a hot row is written once per flush instead of
+# once per vote. Buffers are per process: deltas not yet flushed are lost
+# if the process is killed. Blogs are re-ranked and their cached details
+# dropped when their deltas are flushed, not when the vote is made.
+# ------------------------------
+
+
+def counter_settings():
+    defaults = {
+        "BUFFERED": False,
+        "FLUSH_INTERVAL": 1.0,  # seconds
+        "MAX_PENDING": 1000,  # buffered rows before a forced flush
+    }
+    defaults.update(getattr(settings, "DOCUMENT_COUNTERS", {}))
+    return defaults
+
+
+def _deltas_expression(deltas):
+    return {field: F(field) + amount for field, amount in deltas.items() if amount}
+
+
+# Apply the deltas to one row right away, returns the number of rows updated.
+# Counters go through _base_manager: they also apply to rows the default
+# manager hides (deactivated blogs)
+def apply(model, pk, **deltas):
+    values = _deltas_expression(deltas)
+    if not values:
+        return model._base_manager.filter(pk=pk).count()
+    return model._base_manager.filter(pk=pk).update(**values)
+
+
+class CounterBuffer:
+    def __init__(self, flush_interval=1.0, max_pending=1000):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._lock = threading.Lock()  # guards _pending and _timer
+        self._flush_lock = threading.Lock()  # one flush at a time
+        self._pending = defaultdict(lambda: defaultdict(int))
+        self._timer = None
+        self._wake = threading.Event()
+
+    def add(self, model, pk, **deltas):
+        with self._lock:
+            row = self._pending[(model, pk)]
+            for field, amount in deltas.items():
+                row[field] += amount
+            if self._timer is None:
+                self._timer = threading.Thread(
+                    target=self._run, name="counter-flush", daemon=True
+                )
+                self._timer.start()
+            if len(self._pending) >= self.max_pending:
+                self._wake.set()
+
+    # The flush thread: writes the buffer every flush_interval (sooner past
+    # max_pending) on its own connection, so a flush never joins the
+    # transaction of the request that added the deltas. Exits once idle.
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("counter flush failed, retrying")
+            finally:
+                connections.close_all()
+            with self._lock:
+                if not self._pending:
+                    self._timer = None
+                    return
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                pending = self._pending
+                self._pending = defaultdict(lambda: defaultdict(int))
+            if not pending:
+                return 0
+            try:
+                return self._write(pending)
+            except Exception:
+                # keep the deltas for the next flush
+                with self._lock:
+                    for key, deltas in pending.items():
+                        row = self._pending[key]
+                        for field, amount in deltas.items():
+                            row[field] += amount
+                raise
+
+    def _write(self, pending):
+        # rows sharing the same deltas are written with one UPDATE ... WHERE id IN
+        groups = defaultdict(list)
+        for (model, pk), deltas in pending.items():
+            key = tuple(sorted((f, n) for f, n in deltas.items() if n))
+            if key:
+                groups[(model, key)].append(pk)
+
+        updated = 0
+        blog_ids = []
+        with transaction.atomic():
+            for (model, key), pks in groups.items():
+                updated += model._base_manager.filter(pk__in=pks).update(
+                    **_deltas_expression(dict(key))
+                )
+                if model is Blog:
+                    blog_ids += pks
+            # the votes rescored their blogs before these deltas landed
+            ranking.update_blogs(blog_ids)
+            caching.invalidate_blogs(blog_ids, feed=False)
+        return updated
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_buffer():
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                conf = counter_settings()
+                _buffer = CounterBuffer(
+                    flush_interval=conf["FLUSH_INTERVAL"],
+                    max_pending=conf["MAX_PENDING"],
+                )
+                atexit.register(_buffer.flush)
+    return _buffer
+
+
+# Increment counters of an existing row, buffered or direct depending on settings.
+# Returns False when the row doesn't exist.
+def increment(model, pk, **deltas):
+    if not counter_settings()["BUFFERED"]:
+        return apply(model, pk, **deltas) > 0
+
+    if not model._base_manager.filter(pk=pk).exists():
+        return False
+    # buffered once the vote is committed: a rolled back vote adds nothing
+    buffer = get_buffer()
+    transaction.on_commit(lambda: buffer.add(model, pk, **deltas))
+    return True
+
+
+def flush():
+    if _buffer is not None:
+        return _buffer.flush()
+    return 0
@@ -0,0 +1,146 @@
+import json
+import zlib
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from AuthenticationSystem.models import CustomUser
+from .models import Blog, Comment
+
+# ------------------------------
+# NDJSON export
+#
+# One JSON object per line, tagged with its "type":
+#
+#   {"type": "user", "id": 1, "user_name": "sara", ...}
+#   {"type": "blog", "id": 7, "owner": "sara", "tags": ["django"], ...}
+#   {"type": "comment", "id": 3, "blog_id": 7, "owner": "ali", ...}
+#
+# Rows are read with .iterator(chunk_size) (server-side cursors on
+# PostgreSQL) and encoded one at a time, so memory stays flat whatever the
+# table size. Owners are written by user_name, the key import_articles
+# resolves them by. Password hashes are never exported.
+# ------------------------------
+
+TYPES = ["users", "blogs", "comments"]
+CHUNK_SIZE = 2000
+
+
+def _users():
+    rows = CustomUser.objects.order_by("id").values(
+        "id", "user_name", "first_name", "last_name", "user_type", "active_mode"
+    )
+    for row in rows.iterator(chunk_size=CHUNK_SIZE):
+        yield {"type": "user", **row}
+
+
+def _blogs():
+    blogs = (
+        Blog.all_objects.order_by("id")
+        .select_related("owner")
+        .only(
+            "id",
+            "title",
+            "description",
+            "contect",
+            "content_name",
+            "content_hash",
+            "content_size",
+            "likes",
+            "dislikes",
+            "comment_count",
+            "score",
+            "active",
+            "deactivated_at",
+            "created_at",
+            "owner__user_name",
+        )
+        .prefetch_related("tags")
+    )
+    for blog in blogs.iterator(chunk_size=CHUNK_SIZE):
+        yield {
+            "type": "blog",
+            "id": blog.id,
+            "title": blog.title,
+            "description": blog.description,
+            "content": blog.contect.name,
+            "content_name": blog.content_name,
+            "content_hash": blog.content_hash,
+            "content_size": blog.content_size,
+            "tags": [tag.name for tag in blog.tags.all()],
+            "likes": blog.likes,
+            "dislikes": blog.dislikes,
+            "comment_count": blog.comment_count,
+            "score": blog.score,
+            "active": blog.active,
+            "deactivated_at": blog.deactivated_at,
+            "owner": blog.owner.user_name,
+            "created_at": blog.created_at,
+        }
+
+
+def _comments():
+    rows = Comment.objects.order_by("id").values(
+        "id",
+        "blog_id",
+        "parent_id",
+        "content",
+        "like",
+        "dislike",
+        "created_at",
+        "owner__user_name",
+    )
+    for row in rows.iterator(chunk_size=CHUNK_SIZE):
+        row["owner"] = row.pop("owner__user_name")
+        yield {"type": "comment", **row}
+
+
+_SOURCES = {"users": _users, "blogs": _blogs, "comments": _comments}
+
+
+# "blogs,comments" -> ["blogs", "comments"], everything when empty
+def parse_types(raw):
+    if not raw:
+        return list(TYPES)
+    types = [part.strip() for part in raw.split(",") if part.strip()]
+    unknown = [name for name in types if name not in _SOURCES]
+    if unknown:
+        raise ValueError(f"unknown types: {', '.join(unknown)}")
+    return types
+
+
+# Encoded NDJSON lines (bytes) of the requested types
+def export_lines(types=TYPES):
+    for name in types:
+        for row in _SOURCES[name]():
+            line = json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False)
+            yield line.encode() + b"\n"
+
+
+# gzip stream of `chunks`, compressed as they come
+def gzip_chunks(chunks, level=6, flush_size=64 * 1024):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # 31: gzip container
+    pending = []
+    size = 0
+    for chunk in chunks:
+        pending.append(chunk)
+        size += len(chunk)
+        if size >= flush_size:
+            data = compressor.compress(b"".join(pending))
+            pending, size = [], 0
+            if data:
+                yield data
+    yield compressor.compress(b"".join(pending)) + compressor.flush()
+
+
+# Groups small lines into bigger writes
+def batched(chunks, size=64 * 1024):
+    pending = []
+    length = 0
+    for chunk in chunks:
+        pending.append(chunk)
+        length += len(chunk)
+        if length >= size:
+            yield b"".join(pending)
+            pending, length = [], 0
+    if pending:
+        yield b"".join(pending)
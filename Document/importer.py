@@ -0,0 +1,224 @@
+from collections import Counter
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from AuthenticationSystem.models import CustomUser
+from .models import Blog, ImportCheckpoint
+from .storage import blob_name, content_storage
+from .tags import parse_tags, set_tags_of_blogs
+from . import blobs, caching, ranking, search, uploads
+
+# ------------------------------
+# Batched article import (see `manage.py import_articles`)
+#
+# Accepts the lines written by export_ndjson as well as plain article
+# objects without a "type":
+#
+#   {"title": "...", "description": "...", "content": "text",
+#    "tags": ["django"], "owner": "sara", "created_at": "2024-01-01T10:00:00Z"}
+#
+# Rows are collected into batches and each batch is written in one
+# transaction: bulk_create of the blogs and their tag links, one reference
+# update per distinct content file, one executemany into the search index,
+# and the ImportCheckpoint row saying how far into the file that batch got.
+# Owners are resolved by user_name through an in-memory cache, so each
+# user is looked up once per import. Like / dislike counts are not
+# imported: they are derived from the vote ledger, which isn't exported.
+# ------------------------------
+
+
+class ArticleImporter:
+    def __init__(self, default_owner=None, create_owners=False):
+        self.default_owner = default_owner
+        self.create_owners = create_owners
+        self._owners = {}  # user_name -> id, None when unknown
+        self.pending = []  # (blog, content or None, text, tag names, created_at)
+        self.imported = 0
+        self.skipped = Counter()  # reason -> rows
+
+    # ------------------------------
+    # Owners
+    # ------------------------------
+
+    def _owner_ids(self, names):
+        missing = [name for name in names if name not in self._owners]
+        if missing:
+            found = dict(
+                CustomUser.objects.filter(user_name__in=missing).values_list(
+                    "user_name", "id"
+                )
+            )
+            if self.create_owners:
+                new = [name for name in missing if name not in found]
+                CustomUser.objects.bulk_create(
+                    [self._placeholder(name) for name in new], ignore_conflicts=True
+                )
+                found.update(
+                    CustomUser.objects.filter(user_name__in=new).values_list(
+                        "user_name", "id"
+                    )
+                )
+            for name in missing:
+                self._owners[name] = found.get(name)
+        return {name: self._owners[name] for name in names}
+
+    def _placeholder(self, user_name, row=None):
+        row = row or {}
+        # imported accounts can't log in until a password is set
+        return CustomUser(
+            user_name=user_name,
+            first_name=row.get("first_name") or user_name,
+            last_name=row.get("last_name") or user_name,
+            user_type="normal",
+            active_mode=row.get("active_mode", True),
+            password=make_password(None),
+        )
+
+    # ------------------------------
+    # Rows
+    # ------------------------------
+
+    # Queue one parsed NDJSON object; returns True when the batch should be flushed
+    def add(self, row, batch_size):
+        kind = row.get("type", "blog")
+        if kind == "user":
+            self._add_user(row)
+        elif kind == "blog":
+            self._add_blog(row)
+        else:
+            self.skipped[f"{kind} rows"] += 1
+        return len(self.pending) >= batch_size
+
+    def _add_user(self, row):
+        name = row.get("user_name")
+        if not name:
+            self.skipped["users without user_name"] += 1
+            return
+        if self._owner_ids([name])[name] is None:
+            CustomUser.objects.bulk_create(
+                [self._placeholder(name, row)], ignore_conflicts=True
+            )
+            self._owners.pop(name)
+
+    def _add_blog(self, row):
+        title = row.get("title")
+        if not title:
+            self.skipped["blogs without title"] += 1
+            return
+        try:
+            tag_names = parse_tags(row.get("tags"))
+        except ValueError:
+            self.skipped["blogs with invalid tags"] += 1
+            return
+
+        blog = Blog(
+            title=title,
+            description=row.get("description") or "",
+            content_name=row.get("content_name") or "",
+        )
+        blog.owner_name = row.get("owner") or self.default_owner
+        if row.get("active", True) is False:
+            # stays deactivated, from the same moment for archive_blogs
+            deactivated_at = row.get("deactivated_at")
+            blog.active = False
+            blog.deactivated_at = (
+                isinstance(deactivated_at, str) and parse_datetime(deactivated_at)
+            ) or timezone.now()
+
+        # an export from this deployment points at files already stored
+        sha256 = row.get("content_hash")
+        text = row.get("content")
+        content = None
+        if sha256 and content_storage.exists(blob_name(sha256)):
+            blog.contect.name = blob_name(sha256)
+            blog.content_hash = sha256
+            blog.content_size = row.get("content_size") or 0
+            text = ""  # the file may be binary, it is not indexed
+        elif sha256 is None and isinstance(text, str) and text:
+            try:
+                content = uploads.content_from_text(text)
+            except uploads.UploadError:
+                self.skipped["blogs with content too large"] += 1
+                return
+        else:
+            self.skipped["blogs without content"] += 1
+            return
+
+        created_at = row.get("created_at")
+        created_at = parse_datetime(created_at) if isinstance(created_at, str) else None
+        self.pending.append((blog, content, text, tag_names, created_at))
+
+    # ------------------------------
+    # Writing
+    # ------------------------------
+
+    # Write the queued rows in one transaction; returns the number written
+    # Write the queued rows in one transaction. `checkpoint` is (source,
+    # offset, line): saved in that same transaction, so a crash either keeps
+    # both the batch and the position past it or neither
+    def flush(self, checkpoint=None):
+        batch, self.pending = self.pending, []
+        if not batch:
+            if checkpoint:
+                self._save_checkpoint(*checkpoint)
+            return 0
+
+        names = {blog.owner_name for blog, *_ in batch if blog.owner_name}
+        owners = self._owner_ids(names)
+        rows = []
+        for blog, content, text, tag_names, created_at in batch:
+            owner_id = owners.get(blog.owner_name) if blog.owner_name else None
+            if owner_id is None:
+                self.skipped["blogs with unknown owner"] += 1
+                continue
+            blog.owner_id = owner_id
+            rows.append((blog, content, text, tag_names, created_at))
+
+        refs = Counter()
+        for blog, content, *_ in rows:
+            if content is not None:
+                uploads.attach_content(blog, content)
+            refs[(blog.content_hash, blog.content_size)] += 1
+
+        new_blogs = [blog for blog, *_ in rows]
+        with transaction.atomic():
+            Blog.objects.bulk_create(new_blogs)
+            # created_at is auto_now_add, put the original dates back
+            dated = []
+            for blog, _, _, _, created_at in rows:
+                if created_at:
+                    blog.created_at = created_at
+                    dated.append(blog)
+            if dated:
+                Blog.all_objects.bulk_update(dated, ["created_at"])
+            blobs.acquire_many(refs)
+            blobs.restore(content for _, content, *_ in rows if content is not None)
+            set_tags_of_blogs(
+                {blog.id: names for blog, _, _, names, _ in rows if names}
+            )
+            search.index_blogs([(blog, text) for blog, _, text, _, _ in rows])
+            caching.invalidate_blogs([], feed=True)
+            ranking.update_blogs([blog.id for blog in new_blogs])
+            if checkpoint:
+                self._save_checkpoint(*checkpoint)
+
+        self.imported += len(rows)
+        return len(rows)
+
+    # ------------------------------
+    # Checkpoints
+    # ------------------------------
+
+    @staticmethod
+    def checkpoint_of(source):
+        saved = ImportCheckpoint.objects.filter(source=source).first()
+        return (saved.offset, saved.line) if saved else (0, 0)
+
+    @staticmethod
+    def _save_checkpoint(source, offset, line):
+        ImportCheckpoint.objects.update_or_create(
+            source=source, defaults={"offset": offset, "line": line}
+        )
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from Document import archive
+
+
+class Command(BaseCommand):
+    help = (
+        "Move blogs deactivated for longer than DOCUMENT_ARCHIVE['AFTER_DAYS'] "
+        "to the archive tables. Activating a blog brings it back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days", type=int, help="archive blogs deactivated more than N days ago"
+        )
+        parser.add_argument("--batch-size", type=int, help="blogs per transaction")
+        parser.add_argument(
+            "--dry-run", action="store_true", help="only count what would move"
+        )
+
+    def handle(self, *args, **options):
+        conf = archive.archive_settings()
+        batch_size = options["batch_size"] or conf["BATCH_SIZE"]
+        ids = archive.archivable_ids(options["days"])
+
+        if options["dry_run"]:
+            self.stdout.write(f"{len(ids)} blogs would be archived")
+            return
+
+        moved = 0
+        for start in range(0, len(ids), batch_size):
+            moved += archive.archive_blogs(ids[start : start + batch_size])
+        self.stdout.write(f"archived {moved} blogs")
@@ -0,0 +1,115 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Q
+
+from AuthenticationSystem.models import CustomUser
+from Document import search
+from Document.models import Blog
+
+WORDS = (
+    "django python rest api article blog search index database query cache "
+    "token user comment like vote tag feed rank page cursor stream upload "
+    "storage content title description server client async thread process "
+    "memory disk network latency throughput benchmark sqlite postgres model "
+    "view serializer migration schema table column row transaction lock"
+).split()
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the full-text index with icontains scans on a synthetic corpus. "
+        "Everything is written inside a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--blogs", type=int, default=100_000)
+        parser.add_argument("--queries", type=int, default=50)
+        parser.add_argument("--batch", type=int, default=5000)
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **options):
+        if search.backend() is None:
+            raise CommandError(f"no search backend for {connection.vendor}")
+
+        self.rng = random.Random(options["seed"])
+        try:
+            with transaction.atomic():
+                self.run(options)
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def sentence(self, words):
+        # a few rare made-up words so queries have a realistic selectivity
+        vocabulary = WORDS + [f"term{self.rng.randint(0, 5000)}" for _ in range(3)]
+        return " ".join(self.rng.choice(vocabulary) for _ in range(words))
+
+    def run(self, options):
+        owner = CustomUser.objects.create(
+            user_name=f"bench-search-{time.time_ns()}", first_name="bench", last_name="bench"
+        )
+
+        started = time.perf_counter()
+        created = 0
+        while created < options["blogs"]:
+            size = min(options["batch"], options["blogs"] - created)
+            blogs = Blog.objects.bulk_create(
+                [
+                    Blog(
+                        title=self.sentence(6),
+                        description=self.sentence(30),
+                        contect="bench.txt",
+                        owner=owner,
+                    )
+                    for _ in range(size)
+                ]
+            )
+            for blog in blogs:
+                search.index_blog(blog, self.sentence(200))
+            created += size
+        self.stdout.write(
+            f"corpus: {created} blogs indexed in {time.perf_counter() - started:.1f}s"
+        )
+
+        # common words match a large share of the corpus, rare terms only a few rows
+        workloads = {
+            "common": [
+                " ".join(self.rng.sample(WORDS, 2)) for _ in range(options["queries"])
+            ],
+            "rare": [
+                f"term{self.rng.randint(0, 5000)}" for _ in range(options["queries"])
+            ],
+        }
+
+        def fts(query):
+            return search.search_ids(query, limit=20)
+
+        # content lives in files, so the scan can only look at title / description
+        def scan(query):
+            condition = Q(active=True)
+            for word in query.split():
+                condition &= (
+                    Q(title__icontains=word) | Q(description__icontains=word)
+                )
+            return list(Blog.objects.filter(condition).values_list("id", flat=True)[:20])
+
+        self.stdout.write(
+            f"{'workload':<10}{'method':<12}{'queries':>8}{'total s':>10}{'avg ms':>10}"
+        )
+        for workload, queries in workloads.items():
+            for name, func in (("fts", fts), ("icontains", scan)):
+                started = time.perf_counter()
+                for query in queries:
+                    func(query)
+                total = time.perf_counter() - started
+                self.stdout.write(
+                    f"{workload:<10}{name:<12}{len(queries):>8}{total:>10.3f}"
+                    f"{total / len(queries) * 1000:>10.2f}"
+                )
@@ -0,0 +1,143 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Max, Sum
+
+from Document.models import ArchivedBlog, Blog, ContentBlob
+from Document.storage import PREFIX, blob_name, content_storage
+
+
+class Command(BaseCommand):
+    help = (
+        "Report how much the content-addressed storage saves and find drifted "
+        "reference counts and orphaned files. --reclaim fixes what it finds."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--reclaim",
+            action="store_true",
+            help="fix reference counts and delete unreferenced files",
+        )
+        parser.add_argument(
+            "--min-age",
+            type=int,
+            default=3600,
+            help="seconds since a file was written before --reclaim deletes it "
+            "(a file is stored before the blog referencing it is committed)",
+        )
+
+    def handle(self, *args, **options):
+        reclaim = options["reclaim"]
+
+        # archived blogs keep their reference, they count like live ones
+        actual = {}
+        for manager in (Blog.all_objects, ArchivedBlog.objects):
+            for row in (
+                manager.exclude(content_hash="")
+                .values("content_hash")
+                .annotate(refs=Count("id"), size=Max("content_size"))
+            ):
+                entry = actual.setdefault(
+                    row["content_hash"], {"refs": 0, "size": row["size"]}
+                )
+                entry["refs"] += row["refs"]
+        logical = sum(row["refs"] * row["size"] for row in actual.values())
+        physical = ContentBlob.objects.aggregate(total=Sum("size"))["total"] or 0
+        blob_count = ContentBlob.objects.count()
+        ratio = logical / physical if physical else 1.0
+
+        self.stdout.write(f"blobs stored:       {blob_count}")
+        self.stdout.write(f"bytes referenced:   {logical}")
+        self.stdout.write(f"bytes on disk:      {physical}")
+        self.stdout.write(f"dedup ratio:        {ratio:.2f}x")
+        self.stdout.write(f"saved:              {logical - physical} bytes")
+
+        recorded = dict(ContentBlob.objects.values_list("sha256", "refcount"))
+
+        drifted = [
+            sha for sha, row in actual.items() if recorded.get(sha) != row["refs"]
+        ]
+        unreferenced = [sha for sha in recorded if sha not in actual]
+        self.stdout.write(f"drifted refcounts:  {len(drifted)}")
+        self.stdout.write(f"unreferenced blobs: {len(unreferenced)}")
+
+        orphans = []
+        for name in self._stored_files():
+            sha = os.path.basename(name)
+            if sha not in actual and sha not in recorded:
+                orphans.append(name)
+        self.stdout.write(f"orphaned files:     {len(orphans)}")
+
+        if not reclaim:
+            return
+
+        # the counts above were read without locks: each blob is checked again
+        cutoff = time.time() - options["min_age"]
+        fixed = freed = removed = kept = 0
+        for name in [blob_name(sha) for sha in drifted + unreferenced] + orphans:
+            sha = os.path.basename(name)
+            if blob_name(sha) == name:
+                outcome, size = self._reclaim(sha, cutoff)
+            else:
+                outcome, size = self._remove(name, cutoff)  # not a blob's name
+            fixed += outcome == "fixed"
+            removed += outcome == "removed"
+            kept += outcome == "kept"
+            freed += size
+        self.stdout.write(
+            f"reclaimed: {fixed} refcounts fixed, "
+            f"{removed} files removed, {freed} bytes freed, "
+            f"{kept} recent files kept"
+        )
+
+    # Recount the blogs using one blob under the lock on its row that every
+    # acquire() / release() of the same bytes takes (see Document/blobs.py):
+    # a blog committed since the report was read is counted, and one being
+    # saved now waits, then restores the file if it went
+    def _reclaim(self, sha, cutoff):
+        with transaction.atomic():
+            ContentBlob.objects.bulk_create(
+                [ContentBlob(sha256=sha, size=0, refcount=0)], ignore_conflicts=True
+            )
+            blob = ContentBlob.objects.select_for_update().get(sha256=sha)
+            refs = size = 0
+            for manager in (Blog.all_objects, ArchivedBlog.objects):
+                row = manager.filter(content_hash=sha).aggregate(
+                    refs=Count("id"), size=Max("content_size")
+                )
+                refs += row["refs"]
+                size = max(size, row["size"] or 0)
+            if refs:
+                if blob.refcount == refs:
+                    return None, 0
+                ContentBlob.objects.filter(sha256=sha).update(
+                    refcount=refs, size=size
+                )
+                return "fixed", 0
+            blob.delete()
+            return self._remove(blob_name(sha), cutoff)
+
+    def _remove(self, name, cutoff):
+        path = content_storage.path(name)
+        try:
+            if os.path.getmtime(path) > cutoff:
+                return "kept", 0  # maybe an upload still being saved
+            size = os.path.getsize(path)
+            os.remove(path)
+        except FileNotFoundError:
+            return None, 0
+        return "removed", size
+
+    def _stored_files(self):
+        # cas/ab/cd/<sha256>
+        if not content_storage.exists(PREFIX):
+            return
+        for first in content_storage.listdir(PREFIX)[0]:
+            for second in content_storage.listdir(f"{PREFIX}/{first}")[0]:
+                directory = f"{PREFIX}/{first}/{second}"
+                for name in content_storage.listdir(directory)[1]:
+                    if not name.startswith(".incoming-"):
+                        yield f"{directory}/{name}"
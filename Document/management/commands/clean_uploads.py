@@ -0,0 +1,24 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from Document.models import ContentUpload
+from Document.uploads import discard_upload
+
+
+class Command(BaseCommand):
+    help = "Discard resumable uploads that were started but never finished."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--hours", type=int, default=24, help="age of the uploads to discard"
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options["hours"])
+        count = 0
+        for upload in ContentUpload.objects.filter(created_at__lt=cutoff).iterator():
+            discard_upload(upload)
+            count += 1
+        self.stdout.write(f"discarded {count} unfinished uploads")
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from Document.queryplans import explain_hot_queries
+
+
+class Command(BaseCommand):
+    help = (
+        "Print the query plans of the feed, comment, trending and vote "
+        "queries and flag full table scans or sorts outside an index."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--plans", action="store_true", help="print every plan, not just problems"
+        )
+        parser.add_argument(
+            "--strict",
+            action="store_true",
+            help="exit with an error when a query has a problem (for CI)",
+        )
+
+    def handle(self, *args, **options):
+        failing = 0
+        for name, plan, problems in explain_hot_queries():
+            if problems:
+                failing += 1
+                self.stdout.write(f"{name}: {', '.join(problems)}")
+            else:
+                self.stdout.write(f"{name}: ok")
+            if options["plans"] or problems:
+                for line in plan.splitlines():
+                    self.stdout.write(f"    {line}")
+
+        if failing and options["strict"]:
+            raise CommandError(f"{failing} queries scan or sort without an index")
@@ -0,0 +1,53 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from Document.export import batched, export_lines, gzip_chunks, parse_types
+
+
+class Command(BaseCommand):
+    help = (
+        "Dump users, blogs and comments as newline-delimited JSON, "
+        "streamed with constant memory."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--output", "-o", default="-", help="file to write, - for stdout"
+        )
+        parser.add_argument(
+            "--types", default="", help="comma separated: users,blogs,comments"
+        )
+        parser.add_argument("--gzip", action="store_true", help="gzip the output")
+
+    def handle(self, *args, **options):
+        try:
+            types = parse_types(options["types"])
+        except ValueError as e:
+            raise CommandError(f"{e}")
+
+        lines = 0
+
+        def counted(chunks):
+            nonlocal lines
+            for chunk in chunks:
+                lines += 1
+                yield chunk
+
+        chunks = batched(counted(export_lines(types)))
+        if options["gzip"]:
+            chunks = gzip_chunks(chunks)
+
+        started = time.perf_counter()
+        output = options["output"]
+        stream = sys.stdout.buffer if output == "-" else open(output, "wb")
+        try:
+            for chunk in chunks:
+                stream.write(chunk)
+        finally:
+            if output != "-":
+                stream.close()
+
+        elapsed = time.perf_counter() - started
+        self.stderr.write(f"exported {lines} rows in {elapsed:.2f}s")
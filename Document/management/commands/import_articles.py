@@ -0,0 +1,102 @@
+import gzip
+import json
+import os
+import resource
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from Document.importer import ArticleImporter
+
+
+class Command(BaseCommand):
+    help = (
+        "Import articles from a newline-delimited JSON file (plain or .gz), "
+        "in batches, resuming from the last checkpoint after a crash."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="NDJSON file, .gz is decompressed")
+        parser.add_argument(
+            "--batch-size", type=int, default=1000, help="rows per transaction"
+        )
+        parser.add_argument(
+            "--checkpoint",
+            help="name the progress is saved under (default: absolute path)",
+        )
+        parser.add_argument(
+            "--restart",
+            action="store_true",
+            help="ignore the checkpoint and start from the first line",
+        )
+        parser.add_argument(
+            "--default-owner", help="user_name for rows without an owner"
+        )
+        parser.add_argument(
+            "--create-owners",
+            action="store_true",
+            help="create missing owners as accounts without a password",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        if not os.path.exists(path):
+            raise CommandError(f"{path} not found")
+        name = options["checkpoint"] or os.path.abspath(path)
+
+        offset = line_no = 0
+        if not options["restart"]:
+            offset, line_no = ArticleImporter.checkpoint_of(name)
+            if line_no:
+                self.stdout.write(f"resuming at line {line_no} (byte {offset})")
+
+        importer = ArticleImporter(
+            default_owner=options["default_owner"],
+            create_owners=options["create_owners"],
+        )
+        batch_size = options["batch_size"]
+        bad_lines = 0
+        started = time.perf_counter()
+
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rb") as source:
+            source.seek(offset)
+            while True:
+                line = source.readline()
+                if not line:
+                    break
+                offset += len(line)
+                line_no += 1
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                    if not isinstance(row, dict):
+                        raise ValueError
+                except ValueError:
+                    bad_lines += 1
+                    continue
+                if importer.add(row, batch_size):
+                    importer.flush(checkpoint=(name, offset, line_no))
+                    self._progress(importer, started)
+
+        importer.flush(checkpoint=(name, offset, line_no))
+
+        elapsed = time.perf_counter() - started
+        # ru_maxrss is in kilobytes on Linux
+        peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        rate = importer.imported / elapsed if elapsed else 0
+        self.stdout.write(
+            f"imported {importer.imported} blogs from {line_no} lines "
+            f"in {elapsed:.1f}s ({rate:.0f} rows/s), peak memory {peak_mb:.0f} MB"
+        )
+        if bad_lines:
+            self.stdout.write(f"skipped {bad_lines} lines that are not JSON objects")
+        for reason, count in sorted(importer.skipped.items()):
+            self.stdout.write(f"skipped {count} {reason}")
+
+    def _progress(self, importer, started):
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"  {importer.imported} blogs, {importer.imported / elapsed:.0f} rows/s"
+        )
@@ -0,0 +1,147 @@
+import asyncio
+import statistics
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        "Hold many concurrent keep-alive connections against a running server "
+        "and measure what it answers: start it with uvicorn DL.asgi:application "
+        "or gunicorn DL.wsgi, then point --url at it. Compare /doc/blogs/ "
+        "(sync views) with /doc/async/blogs/ (async views) on both."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--url", default="http://127.0.0.1:8000/doc/async/blogs/"
+        )
+        parser.add_argument(
+            "--connections",
+            type=int,
+            nargs="+",
+            default=[10, 100, 500],
+            help="concurrent connections, one run per value",
+        )
+        parser.add_argument(
+            "--duration", type=float, default=10, help="seconds per run"
+        )
+        parser.add_argument(
+            "--token", help="JWT access token, sent as Authorization: Bearer"
+        )
+        parser.add_argument(
+            "--timeout", type=float, default=10, help="seconds before a request fails"
+        )
+
+    def handle(self, *args, **options):
+        url = urlsplit(options["url"])
+        if url.scheme != "http" or not url.hostname:
+            raise CommandError("--url must be an http:// URL")
+        self.host = url.hostname
+        self.port = url.port or 80
+        self.timeout = options["timeout"]
+
+        path = url.path or "/"
+        if url.query:
+            path += f"?{url.query}"
+        headers = [
+            f"GET {path} HTTP/1.1",
+            f"Host: {url.netloc}",
+            "Connection: keep-alive",
+        ]
+        if options["token"]:
+            headers.append(f"Authorization: Bearer {options['token']}")
+        self.request = ("\r\n".join(headers) + "\r\n\r\n").encode()
+
+        self.stdout.write(f"GET {options['url']}, {options['duration']:g}s per run")
+        self.stdout.write(
+            f"{'connections':<12}{'requests':>9}{'errors':>8}{'req/s':>9}"
+            f"{'p50 ms':>9}{'p95 ms':>9}"
+        )
+        for connections in options["connections"]:
+            self.report(
+                connections,
+                asyncio.run(self.run(connections, options["duration"])),
+                options["duration"],
+            )
+
+    def report(self, connections, results, duration):
+        timings, errors = results
+        if not timings:
+            self.stdout.write(f"{connections:<12}{0:>9}{errors:>8}")
+            return
+        timings.sort()
+        p50 = statistics.median(timings) * 1000
+        p95 = timings[max(int(len(timings) * 0.95) - 1, 0)] * 1000
+        self.stdout.write(
+            f"{connections:<12}{len(timings):>9}{errors:>8}"
+            f"{len(timings) / duration:>9.0f}{p50:>9.1f}{p95:>9.1f}"
+        )
+
+    async def run(self, connections, duration):
+        timings = []
+        errors = [0]
+        deadline = time.perf_counter() + duration
+        await asyncio.gather(
+            *(self.client(deadline, timings, errors) for _ in range(connections))
+        )
+        return timings, errors[0]
+
+    async def client(self, deadline, timings, errors):
+        # one connection, reused until the server closes it or it fails
+        reader = writer = None
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                if writer is None:
+                    reader, writer = await asyncio.wait_for(
+                        asyncio.open_connection(self.host, self.port), self.timeout
+                    )
+                ok, keep_alive = await asyncio.wait_for(
+                    self.exchange(reader, writer), self.timeout
+                )
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError):
+                ok, keep_alive = False, False
+
+            if ok:
+                timings.append(time.perf_counter() - started)
+            else:
+                errors[0] += 1
+            if not keep_alive and writer is not None:
+                writer.close()
+                reader = writer = None
+            if not ok:
+                # don't spin on a refused connection
+                await asyncio.sleep(0.05)
+
+        if writer is not None:
+            writer.close()
+
+    async def exchange(self, reader, writer):
+        writer.write(self.request)
+        await writer.drain()
+
+        head = await reader.readuntil(b"\r\n\r\n")
+        lines = head.decode("latin-1").split("\r\n")
+        status = int(lines[0].split()[1])
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip().lower()
+
+        if "content-length" in headers:
+            await reader.readexactly(int(headers["content-length"]))
+        elif headers.get("transfer-encoding") == "chunked":
+            while True:
+                size = int((await reader.readuntil(b"\r\n")).split(b";")[0], 16)
+                await reader.readexactly(size + 2)
+                if size == 0:
+                    break
+        else:
+            await reader.read()
+            return status < 400, False
+
+        return status < 400, headers.get("connection") != "close"
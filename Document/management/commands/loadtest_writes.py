@@ -0,0 +1,159 @@
+import itertools
+import logging
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand
+from django.db import connection
+from rest_framework.test import APIClient
+
+from AuthenticationSystem.models import CustomUser
+from AuthenticationSystem.views import get_tokens_for_user
+from Document import bulk
+from Document.models import Blog, Comment
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure write throughput of create_blog and like_blog, and reads next "
+        "to them, on the configured database: run it once per profile "
+        "(DB_ENGINE=sqlite / postgresql, DB_POOL=1, DB_SQLITE_TUNED=1) and "
+        "compare. Requests go through the full middleware and JWT stack; "
+        "everything written is removed at the end."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=8, help="parallel clients")
+        parser.add_argument(
+            "--requests", type=int, default=500, help="requests per scenario"
+        )
+        parser.add_argument(
+            "--scenario",
+            choices=["create_blog", "like_blog", "read", "mixed", "all"],
+            default="all",
+        )
+        parser.add_argument(
+            "--keep", action="store_true", help="don't delete the load-test data"
+        )
+
+    def handle(self, *args, **options):
+        stamp = time.time_ns()
+        self.users = [
+            CustomUser.objects.create(
+                user_name=f"loadtest-{stamp}-{i}",
+                first_name="load",
+                last_name="test",
+            )
+            for i in range(options["workers"])
+        ]
+        self.tokens = [get_tokens_for_user(user)["access"] for user in self.users]
+        target = Blog.objects.create(
+            title="load test target", contect="load.txt", owner=self.users[0]
+        )
+        Comment.objects.bulk_create(
+            Comment(content=f"comment {i}", blog=target, owner=self.users[0])
+            for i in range(20)
+        )
+        self.target_id = target.id
+        # failed requests are counted, not logged one traceback at a time
+        logging.getLogger("django.request").setLevel(logging.CRITICAL)
+
+        self.stdout.write(
+            f"database: {connection.vendor} ({connection.settings_dict['NAME']}), "
+            f"{options['workers']} workers"
+        )
+        self.stdout.write(
+            f"{'scenario':<14}{'requests':>9}{'errors':>8}{'req/s':>9}"
+            f"{'p50 ms':>9}{'p95 ms':>9}"
+        )
+        try:
+            scenarios = (
+                ["create_blog", "like_blog", "read", "mixed"]
+                if options["scenario"] == "all"
+                else [options["scenario"]]
+            )
+            for name in scenarios:
+                self.run(name, options["workers"], options["requests"])
+        finally:
+            if not options["keep"]:
+                self.clean_up()
+
+    def client(self):
+        # one client, user and database connection per thread
+        client = getattr(self._local, "client", None)
+        if client is None:
+            token = self.tokens[next(self._worker_ids)]
+            client = APIClient(HTTP_HOST="localhost")
+            client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+            self._local.client = client
+        return client
+
+    def create_blog(self, client, i):
+        return client.post(
+            "/doc/create-blog/",
+            {
+                "title": f"load test {i}",
+                "description": "written by loadtest_writes",
+                "tags": "loadtest",
+                "content": SimpleUploadedFile("load.txt", b"load test body\n" * 64),
+            },
+        )
+
+    def like_blog(self, client, i):
+        # every worker toggles its vote on one shared blog: a hot row
+        return client.patch(
+            "/doc/like-blog/", {"blog_id": self.target_id}, format="json"
+        )
+
+    def read(self, client, i):
+        # comment threads are not cached, every read reaches the database
+        return client.get(f"/doc/blogs/{self.target_id}/comments/")
+
+    def mixed(self, client, i):
+        return self.like_blog(client, i) if i % 2 else self.read(client, i)
+
+    def run(self, name, workers, requests):
+        action = getattr(self, name)
+        self._local = threading.local()
+        self._worker_ids = itertools.count()
+        timings = []
+        errors = 0
+        lock = threading.Lock()
+
+        def one(i):
+            nonlocal errors
+            client = self.client()
+            started = time.perf_counter()
+            try:
+                ok = action(client, i).status_code < 400
+            except Exception:  # "database is locked" and friends count as errors
+                ok = False
+            elapsed = time.perf_counter() - started
+            with lock:
+                timings.append(elapsed)
+                errors += not ok
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(one, range(requests)))
+        total = time.perf_counter() - started
+
+        timings.sort()
+        p50 = statistics.median(timings) * 1000
+        p95 = timings[int(len(timings) * 0.95) - 1] * 1000
+        self.stdout.write(
+            f"{name:<14}{requests:>9}{errors:>8}{requests / total:>9.0f}"
+            f"{p50:>9.1f}{p95:>9.1f}"
+        )
+
+    def clean_up(self):
+        for user in self.users:
+            ids = list(
+                Blog.all_objects.filter(owner=user).values_list("id", flat=True)
+            )
+            if ids:
+                bulk.delete_blogs(user, ids)
+        CustomUser.objects.filter(id__in=[user.id for user in self.users]).delete()
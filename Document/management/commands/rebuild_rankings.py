@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from Document import ranking
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the hot / top_day / top_week ranking boards. Run it every "
+        "few minutes (cron, systemd timer) or keep it running with --every."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--every",
+            type=int,
+            default=0,
+            help="rebuild again every N seconds instead of exiting",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.perf_counter()
+            rows = ranking.rebuild()
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f"ranked {rows} rows in {elapsed:.2f}s")
+            if not options["every"]:
+                return
+            time.sleep(options["every"])
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from Document.counters import counter_settings
+from Document.stats import reconcile
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute likes, dislikes, comment_count and score of every blog from "
+        "the vote ledger and the comments, and fix the ones that drifted. "
+        "DOCUMENT_COUNTERS['BUFFERED'] must be off: deltas still buffered in "
+        "the workers would be added again on top of the fixed counts."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=1000, help="blogs per transaction"
+        )
+        parser.add_argument(
+            "--dry-run", action="store_true", help="only count drifted blogs"
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="fix even with BUFFERED on (every worker stopped first)",
+        )
+
+    def handle(self, *args, **options):
+        buffered = counter_settings()["BUFFERED"]
+        if buffered and not options["dry_run"] and not options["force"]:
+            raise CommandError(
+                "DOCUMENT_COUNTERS['BUFFERED'] is on: turn it off (or stop every "
+                "worker) and run again with --force"
+            )
+        checked, drifted = reconcile(
+            batch_size=options["batch_size"], dry_run=options["dry_run"]
+        )
+        verb = "drifted" if options["dry_run"] else "fixed"
+        self.stdout.write(f"checked {checked} blogs, {drifted} {verb}")
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.5 on 2026-10-18 13:40
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Document', '0002_votes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blog',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
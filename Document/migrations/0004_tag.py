@@ -0,0 +1,48 @@
+# Generated by Django 5.2.5 on 2026-10-18 13:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Document', '0003_blog_created_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+            ],
+        ),
+        # keep the old "a - b - c" strings until 0005 has parsed them
+        migrations.RenameField(
+            model_name='blog',
+            old_name='tags',
+            new_name='legacy_tags',
+        ),
+        migrations.CreateModel(
+            name='BlogTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('blog', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='Document.blog')),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='Document.tag')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='blog',
+            name='tags',
+            field=models.ManyToManyField(blank=True, related_name='blogs', through='Document.BlogTag', to='Document.tag'),
+        ),
+        migrations.AddIndex(
+            model_name='blogtag',
+            index=models.Index(fields=['tag', 'blog'], name='blogtag_tag_blog_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='blogtag',
+            constraint=models.UniqueConstraint(fields=('blog', 'tag'), name='unique_blog_tag'),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.5 on 2026-10-18 13:20
+
+import re
+
+from django.db import migrations
+
+SEPARATOR = re.compile(r"\s+-\s+|,")
+
+
+def parse(raw):
+    names = []
+    for part in SEPARATOR.split(raw or ""):
+        name = part.strip().lower()[:50]
+        if name and name != "none" and name not in names:
+            names.append(name)
+    return names
+
+
+def forwards(apps, schema_editor):
+    Blog = apps.get_model('Document', 'Blog')
+    Tag = apps.get_model('Document', 'Tag')
+    BlogTag = apps.get_model('Document', 'BlogTag')
+
+    tag_ids = {}
+    links = []
+    rows = Blog.objects.exclude(legacy_tags__isnull=True).values_list('id', 'legacy_tags')
+    for blog_id, raw in rows.iterator(chunk_size=2000):
+        for name in parse(raw):
+            if name not in tag_ids:
+                tag_ids[name] = Tag.objects.get_or_create(name=name)[0].id
+            links.append(BlogTag(blog_id=blog_id, tag_id=tag_ids[name]))
+        if len(links) >= 2000:
+            BlogTag.objects.bulk_create(links, ignore_conflicts=True)
+            links = []
+    BlogTag.objects.bulk_create(links, ignore_conflicts=True)
+
+
+def backwards(apps, schema_editor):
+    Blog = apps.get_model('Document', 'Blog')
+    BlogTag = apps.get_model('Document', 'BlogTag')
+
+    names = {}
+    for blog_id, name in BlogTag.objects.values_list('blog_id', 'tag__name').order_by('id'):
+        names.setdefault(blog_id, []).append(name)
+    for blog_id, tags in names.items():
+        Blog.objects.filter(id=blog_id).update(legacy_tags=" - ".join(tags))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Document', '0004_tag'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, backwards),
+    ]
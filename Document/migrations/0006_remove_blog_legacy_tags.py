@@ -0,0 +1,17 @@
+# Generated by Django 5.2.5 on 2026-10-18 13:20
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Document', '0005_populate_tags'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='blog',
+            name='legacy_tags',
+        ),
+    ]
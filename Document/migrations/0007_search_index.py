@@ -0,0 +1,56 @@
+# Generated by Django 5.2.5 on 2026-10-18 14:05
+
+from django.db import migrations
+
+FTS_TABLE = 'document_blog_fts'
+PG_TABLE = 'document_blog_search'
+
+
+def create_index(apps, schema_editor):
+    connection = schema_editor.connection
+    blog_table = connection.ops.quote_name(apps.get_model('Document', 'Blog')._meta.db_table)
+
+    if connection.vendor == 'sqlite':
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {FTS_TABLE} "
+            "USING fts5(title, description, content, tokenize = 'porter unicode61')"
+        )
+        schema_editor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, title, description, content) "
+            f"SELECT id, title, coalesce(description, ''), '' FROM {blog_table}"
+        )
+    elif connection.vendor == 'postgresql':
+        schema_editor.execute(
+            f"CREATE TABLE {PG_TABLE} ("
+            f"blog_id bigint PRIMARY KEY REFERENCES {blog_table} (id) "
+            "ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+            "document tsvector NOT NULL)"
+        )
+        schema_editor.execute(
+            f"CREATE INDEX {PG_TABLE}_document_gin ON {PG_TABLE} USING GIN (document)"
+        )
+        schema_editor.execute(
+            f"INSERT INTO {PG_TABLE} (blog_id, document) "
+            "SELECT id, setweight(to_tsvector('english', title), 'A') || "
+            "setweight(to_tsvector('english', coalesce(description, '')), 'B') "
+            f"FROM {blog_table}"
+        )
+
+
+def drop_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite':
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+    elif connection.vendor == 'postgresql':
+        schema_editor.execute(f"DROP TABLE IF EXISTS {PG_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Document', '0006_remove_blog_legacy_tags'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
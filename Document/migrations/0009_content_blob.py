@@ -0,0 +1,74 @@
+# Generated by Django 5.2.5 on 2026-10-18 13:27
+
+import Document.storage
+import hashlib
+import os
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def move_into_cas(apps, schema_editor):
+    # blogs saved before content addressing keep their files under blogs/
+    from Document.storage import PREFIX, content_storage
+
+    Blog = apps.get_model('Document', 'Blog')
+    ContentBlob = apps.get_model('Document', 'ContentBlob')
+
+    blogs = Blog.objects.exclude(contect='').exclude(contect__startswith=f'{PREFIX}/')
+    for blog in blogs.iterator():
+        old_name = blog.contect.name
+        if not content_storage.exists(old_name):
+            continue
+        digest = hashlib.sha256()
+        with content_storage.open(old_name, 'rb') as old:
+            for chunk in old.chunks():
+                digest.update(chunk)
+            old.sha256 = digest.hexdigest()
+            new_name = content_storage.save(old_name, old)
+        Blog.objects.filter(id=blog.id).update(
+            contect=new_name,
+            content_hash=old.sha256,
+            content_name=os.path.basename(old_name),
+        )
+        content_storage.delete(old_name)
+
+    refs = (
+        Blog.objects.filter(contect__startswith=f'{PREFIX}/')
+        .values('content_hash')
+        .annotate(refcount=Count('id'), size=Max('content_size'))
+    )
+    ContentBlob.objects.bulk_create(
+        [ContentBlob(sha256=row['content_hash'], size=row['size'], refcount=row['refcount']) for row in refs],
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Document', '0008_content_upload'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContentBlob',
+            fields=[
+                ('sha256', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('size', models.BigIntegerField()),
+                ('refcount', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='blog',
+            name='content_name',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='blog',
+            name='contect',
+            field=models.FileField(max_length=255, storage=Document.storage.get_content_storage, upload_to=''),
+        ),
+        migrations.RunPython(move_into_cas, migrations.RunPython.noop),
+    ]
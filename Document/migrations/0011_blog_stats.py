@@ -0,0 +1,44 @@
+# Generated by Django 5.2.5 on 2026-10-18 19:40
+
+from django.db import migrations, models
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill(apps, schema_editor):
+    Blog = apps.get_model('Document', 'Blog')
+    Comment = apps.get_model('Document', 'Comment')
+
+    comments = (
+        Comment.objects.filter(blog=OuterRef('pk'))
+        .order_by()
+        .values('blog')
+        .annotate(n=Count('id'))
+        .values('n')
+    )
+    Blog.objects.update(
+        comment_count=Coalesce(Subquery(comments, output_field=IntegerField()), 0)
+    )
+    # weights as in Document/stats.py at the time of this migration
+    Blog.objects.update(score=F('likes') - F('dislikes') + F('comment_count') * 2)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Document', '0010_comment_thread'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blog',
+            name='comment_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='blog',
+            name='score',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
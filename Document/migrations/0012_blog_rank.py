@@ -0,0 +1,28 @@
+# Generated by Django 5.2.5 on 2026-10-18 20:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Document', '0011_blog_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BlogRank',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('board', models.CharField(choices=[('hot', 'Hot'), ('top_day', 'Top of the day'), ('top_week', 'Top of the week')], max_length=16)),
+                ('score', models.FloatField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('blog', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ranks', to='Document.blog')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['board', '-score', '-blog'], name='blogrank_board_score_idx')],
+                'constraints': [models.UniqueConstraint(fields=('board', 'blog'), name='unique_board_blog')],
+            },
+        ),
+    ]
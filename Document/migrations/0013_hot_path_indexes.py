@@ -0,0 +1,37 @@
+# Generated by Django 5.2.5 on 2026-10-18 14:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("AuthenticationSystem", "0001_initial"),
+        ("Document", "0012_blog_rank"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="blog",
+            index=models.Index(
+                condition=models.Q(("active", True)),
+                fields=["-created_at", "-id"],
+                name="blog_feed_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="blog",
+            index=models.Index(
+                condition=models.Q(("active", True)),
+                fields=["owner", "-created_at", "-id"],
+                name="blog_owner_feed_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="comment",
+            index=models.Index(
+                fields=["blog", "parent", "created_at", "id"],
+                name="comment_thread_idx",
+            ),
+        ),
+    ]
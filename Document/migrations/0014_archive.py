@@ -0,0 +1,65 @@
+# Generated by Django 5.2.5 on 2026-10-18 21:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill(apps, schema_editor):
+    # blogs deactivated before this migration count as deactivated now
+    Blog = apps.get_model('Document', 'Blog')
+    Blog.objects.filter(active=False).update(deactivated_at=timezone.now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Document', '0013_hot_path_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blog',
+            name='deactivated_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='ArchivedBlog',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('title', models.CharField()),
+                ('description', models.TextField(blank=True, null=True)),
+                ('contect', models.CharField(max_length=255)),
+                ('content_name', models.CharField(blank=True, default='', max_length=255)),
+                ('content_hash', models.CharField(blank=True, default='', max_length=64)),
+                ('content_size', models.BigIntegerField(default=0)),
+                ('tags', models.JSONField(default=list)),
+                ('votes', models.JSONField(default=list)),
+                ('likes', models.IntegerField(default=0)),
+                ('dislikes', models.IntegerField(default=0)),
+                ('comment_count', models.IntegerField(default=0)),
+                ('score', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField()),
+                ('deactivated_at', models.DateTimeField(blank=True, null=True)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_blogs', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedComment',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('parent_id', models.BigIntegerField(blank=True, null=True)),
+                ('content', models.TextField()),
+                ('like', models.IntegerField(default=0)),
+                ('dislike', models.IntegerField(default=0)),
+                ('votes', models.JSONField(default=list)),
+                ('created_at', models.DateTimeField()),
+                ('blog', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='comments', to='Document.archivedblog')),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_comments', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
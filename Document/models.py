@@ -1,24 +1,88 @@
+import uuid
+
 from django.db import models
 from AuthenticationSystem.models import CustomUser
+from .storage import get_content_storage
+
+
+class Tag(models.Model):
+    name = models.CharField(max_length=50, unique=True, null=False, blank=False)
+
+    def __str__(self):
+        return f"{self.name}"
+
+
+class ActiveBlogManager(models.Manager):
+    # deactivated blogs stay out of every query unless asked for through
+    # Blog.all_objects (owner views, maintenance jobs)
+    def get_queryset(self):
+        return super().get_queryset().filter(active=True)
 
 
 class Blog(models.Model):
     title = models.CharField(blank=False, null=False)
     description = models.TextField(blank=True, null=True)
-    contect = models.FileField(null=False, blank=False)
-    tags = models.TextField(
-        null=True, blank=True, default="none"
-    )  # tags will be like : "none - lovely - fun"
+    contect = models.FileField(
+        storage=get_content_storage, max_length=255, null=False, blank=False
+    )  # stored by sha256, see Document/storage.py
+    content_name = models.CharField(max_length=255, blank=True, default="")
+    content_hash = models.CharField(max_length=64, blank=True, default="")  # sha256
+    content_size = models.BigIntegerField(default=0)
+    tags = models.ManyToManyField(
+        Tag,
+        through="BlogTag",
+        blank=True,
+        related_name="blogs",
+    )  # sent by clients as : "lovely - fun"
     likes = models.IntegerField(default=0, blank=False, null=False)
     dislikes = models.IntegerField(default=0, blank=False, null=False)
+    comment_count = models.IntegerField(default=0, blank=False, null=False)
+    score = models.IntegerField(default=0, blank=False, null=False)  # see Document/stats.py
     owner = models.ForeignKey(
         CustomUser,
-        on_delete=models.CASCADE(),
+        on_delete=models.CASCADE,
         null=False,
         blank=False,
         related_name="blogs",
     )
     active = models.BooleanField(default=True)
+    deactivated_at = models.DateTimeField(null=True, blank=True)  # see Document/archive.py
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = ActiveBlogManager()
+    all_objects = models.Manager()
+
+    class Meta:
+        indexes = [
+            # the feed, newest first: pages are read straight off the index.
+            # Partial on active rows: Django filters booleans as a bare
+            # `WHERE active`, which SQLite can't match to an (active, ...) index
+            models.Index(
+                fields=["-created_at", "-id"],
+                name="blog_feed_idx",
+                condition=models.Q(active=True),
+            ),
+            # one owner's blogs, newest first (?owner= on the feed)
+            models.Index(
+                fields=["owner", "-created_at", "-id"],
+                name="blog_owner_feed_idx",
+                condition=models.Q(active=True),
+            ),
+        ]
+
+
+class BlogTag(models.Model):
+    blog = models.ForeignKey(Blog, on_delete=models.CASCADE, null=False, blank=False)
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, null=False, blank=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["blog", "tag"], name="unique_blog_tag"),
+        ]
+        indexes = [
+            # tag -> blogs lookups (?tag= filter, tag counts)
+            models.Index(fields=["tag", "blog"], name="blogtag_tag_blog_idx"),
+        ]
 
 
 class Comment(models.Model):
@@ -27,14 +91,208 @@ class Comment(models.Model):
     dislike = models.IntegerField(default=0, blank=False, null=False)
     blog = models.ForeignKey(
         Blog,
-        on_delete=models.CASCADE(),
+        on_delete=models.CASCADE,
         blank=False,
         null=False,
         related_name="comments",
     )
+    # replies hang off a top-level comment, threads are one level deep
+    parent = models.ForeignKey(
+        "self",
+        on_delete=models.CASCADE,
+        blank=True,
+        null=True,
+        related_name="replies",
+    )
+    owner = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        null=False,
+        blank=False,
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # threads of a blog, oldest first
+            models.Index(
+                fields=["blog", "parent", "created_at", "id"],
+                name="comment_thread_idx",
+            ),
+        ]
+
+
+class BlogVote(models.Model):
+    LIKE = 1
+    DISLIKE = -1
+    VALUES = [
+        (LIKE, "Like"),
+        (DISLIKE, "Dislike"),
+    ]
+
+    user = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        null=False,
+        blank=False,
+        related_name="blog_votes",
+    )
+    blog = models.ForeignKey(
+        Blog,
+        on_delete=models.CASCADE,
+        null=False,
+        blank=False,
+        related_name="votes",
+    )
+    value = models.SmallIntegerField(choices=VALUES, null=False, blank=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "blog"], name="unique_blog_vote"),
+        ]
+
+
+class CommentVote(models.Model):
+    LIKE = 1
+    DISLIKE = -1
+    VALUES = [
+        (LIKE, "Like"),
+        (DISLIKE, "Dislike"),
+    ]
+
+    user = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        null=False,
+        blank=False,
+        related_name="comment_votes",
+    )
+    comment = models.ForeignKey(
+        Comment,
+        on_delete=models.CASCADE,
+        null=False,
+        blank=False,
+        related_name="votes",
+    )
+    value = models.SmallIntegerField(choices=VALUES, null=False, blank=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "comment"], name="unique_comment_vote"
+            ),
+        ]
+
+
+class ContentUpload(models.Model):
+    # resumable upload of a blog content file, see Document/uploads.py
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    owner = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        null=False,
+        blank=False,
+        related_name="content_uploads",
+    )
+    filename = models.CharField(max_length=255, null=False, blank=False)
+    size = models.BigIntegerField(null=False, blank=False)
+    received = models.BigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+
+class ContentBlob(models.Model):
+    # one stored content file, shared by every blog with the same bytes
+    sha256 = models.CharField(max_length=64, primary_key=True)
+    size = models.BigIntegerField(null=False, blank=False)
+    refcount = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+
+class ImportCheckpoint(models.Model):
+    # how far `manage.py import_articles` got in a file, saved in the same
+    # transaction as each batch, see Document/importer.py
+    source = models.CharField(max_length=255, unique=True)  # absolute path
+    offset = models.BigIntegerField(default=0)  # bytes read
+    line = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class BlogRank(models.Model):
+    # precomputed position of a blog on a ranking board, see Document/ranking.py
+    BOARDS = [
+        ("hot", "Hot"),
+        ("top_day", "Top of the day"),
+        ("top_week", "Top of the week"),
+    ]
+
+    board = models.CharField(max_length=16, choices=BOARDS, null=False, blank=False)
+    blog = models.ForeignKey(
+        Blog, on_delete=models.CASCADE, null=False, blank=False, related_name="ranks"
+    )
+    score = models.FloatField(null=False, blank=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["board", "blog"], name="unique_board_blog"),
+        ]
+        indexes = [
+            # one board, best first: serves a page by walking the index
+            models.Index(
+                fields=["board", "-score", "-blog"], name="blogrank_board_score_idx"
+            ),
+        ]
+
+
+class ArchivedBlog(models.Model):
+    # a blog deactivated for long enough, moved out of Blog with its comments,
+    # votes and tags by `manage.py archive_blogs`; see Document/archive.py
+    id = models.BigIntegerField(primary_key=True)  # the Blog id, reused on restore
+    title = models.CharField(blank=False, null=False)
+    description = models.TextField(blank=True, null=True)
+    contect = models.CharField(max_length=255)  # storage name, the file is kept
+    content_name = models.CharField(max_length=255, blank=True, default="")
+    content_hash = models.CharField(max_length=64, blank=True, default="")
+    content_size = models.BigIntegerField(default=0)
+    tags = models.JSONField(default=list)  # tag names
+    votes = models.JSONField(default=list)  # [[user_id, value], ...]
+    likes = models.IntegerField(default=0)
+    dislikes = models.IntegerField(default=0)
+    comment_count = models.IntegerField(default=0)
+    score = models.IntegerField(default=0)
+    owner = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        null=False,
+        blank=False,
+        related_name="archived_blogs",
+    )
+    created_at = models.DateTimeField()
+    deactivated_at = models.DateTimeField(null=True, blank=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+
+class ArchivedComment(models.Model):
+    id = models.BigIntegerField(primary_key=True)  # the Comment id
+    blog = models.ForeignKey(
+        ArchivedBlog,
+        on_delete=models.CASCADE,
+        null=False,
+        blank=False,
+        related_name="comments",
+    )
+    parent_id = models.BigIntegerField(null=True, blank=True)
+    content = models.TextField(null=False, blank=False)
+    like = models.IntegerField(default=0)
+    dislike = models.IntegerField(default=0)
+    votes = models.JSONField(default=list)  # [[user_id, value], ...]
     owner = models.ForeignKey(
         CustomUser,
-        on_delete=models.CASCADE(),
+        on_delete=models.CASCADE,
         null=False,
         blank=False,
+        related_name="archived_comments",
     )
+    created_at = models.DateTimeField()
@@ -0,0 +1,105 @@
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+# ------------------------------
+# Keyset (cursor) pagination
+#
+# Pages are selected with `WHERE (a, b) < (last_a, last_b) ORDER BY a, b
+# LIMIT n` instead of OFFSET, so page 10,000 costs the same as page 1 as
+# long as the ordering is backed by an index. The last ordering field must
+# be unique (normally the primary key).
+# ------------------------------
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(values):
+    raw = json.dumps(values, default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise ValueError("invalid cursor")
+    if not isinstance(values, list):
+        raise ValueError("invalid cursor")
+    return values
+
+
+def page_size(raw, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    if raw in (None, ""):
+        return default
+    size = int(raw)
+    if size < 1:
+        raise ValueError("size must be positive")
+    return min(size, maximum)
+
+
+# Rows strictly after `values` in the given ordering, e.g. for
+# ["-created_at", "-id"]: created_at < v0 OR (created_at = v0 AND id < v1)
+def _after(ordering, values):
+    condition = Q()
+    equal = {}
+    for field, value in zip(ordering, values):
+        name = field.lstrip("-")
+        lookup = "lt" if field.startswith("-") else "gt"
+        condition |= Q(**equal, **{f"{name}__{lookup}": value})
+        equal[name] = value
+    return condition
+
+
+# The cursor values as the ordering fields' Python types: a cursor is
+# client input, a well-formed one holding the wrong types must not reach
+# the query
+def _cursor_values(model, ordering, values):
+    if len(values) != len(ordering):
+        raise ValueError("invalid cursor")
+    converted = []
+    for field, value in zip(ordering, values):
+        try:
+            value = model._meta.get_field(field.lstrip("-")).to_python(value)
+        except (ValidationError, TypeError, ValueError):
+            raise ValueError("invalid cursor")
+        if value is None:
+            raise ValueError("invalid cursor")
+        converted.append(value)
+    return converted
+
+
+# The query behind a page: ordered, after the cursor, one extra row to
+# tell whether there is a next page
+def page_queryset(queryset, ordering, cursor=None, size=DEFAULT_PAGE_SIZE):
+    queryset = queryset.order_by(*ordering)
+    if cursor:
+        values = _cursor_values(queryset.model, ordering, decode_cursor(cursor))
+        queryset = queryset.filter(_after(ordering, values))
+    return queryset[: size + 1]
+
+
+def _with_cursor(rows, ordering, size):
+    if len(rows) <= size:
+        return rows, None
+
+    rows = rows[:size]
+    last = rows[-1]
+    return rows, encode_cursor(
+        [getattr(last, field.lstrip("-")) for field in ordering]
+    )
+
+
+# Returns (rows, next_cursor); next_cursor is None on the last page
+def keyset_page(queryset, ordering, cursor=None, size=DEFAULT_PAGE_SIZE):
+    rows = list(page_queryset(queryset, ordering, cursor, size))
+    return _with_cursor(rows, ordering, size)
+
+
+async def akeyset_page(queryset, ordering, cursor=None, size=DEFAULT_PAGE_SIZE):
+    rows = [row async for row in page_queryset(queryset, ordering, cursor, size)]
+    return _with_cursor(rows, ordering, size)
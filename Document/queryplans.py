@@ -0,0 +1,98 @@
+import re
+
+from django.db import connection
+
+from .models import BlogVote, Comment
+from .pagination import encode_cursor, page_queryset
+from . import ranking
+
+# ------------------------------
+# Query plans of the hot read paths
+#
+# Builds the queries the feed, comment threads, trending boards and vote
+# lookups actually run, asks the database for their EXPLAIN plan and flags
+# the ones that read a whole table or sort outside an index:
+#
+#   SQLite:     "SCAN <table>" without an index, "USE TEMP B-TREE FOR ORDER BY"
+#   PostgreSQL: "Seq Scan on <table>", "Sort"
+#
+# Used by `manage.py explain_queries` and by the tests, so a missing or
+# unusable index shows up before it shows up in production latency.
+# ------------------------------
+
+SORT = "sort outside an index"
+# Sorts that are bounded by design and not worth an index: a tag's blogs
+# are reached through BlogTag, and replies are prefetched for one page of
+# threads at a time (parent_id IN (...))
+SORT_ALLOWED = {"feed of tag", "comment replies"}
+
+_SQLITE_PROBLEMS = [
+    (re.compile(r"\bSCAN (\w+)\b(?! USING)"), "full scan of {0}"),
+    (re.compile(r"USE TEMP B-TREE FOR (?:RIGHT PART OF )?ORDER BY"), SORT),
+]
+_POSTGRES_PROBLEMS = [
+    (re.compile(r'Seq Scan on "?(\w+)'), "full scan of {0}"),
+    (re.compile(r"^\s*(?:->\s*)?Sort\b"), SORT),
+]
+
+
+def _hot_queries():
+    # imported here: views imports this app's modules at load time
+    from .views import (
+        BLOG_FEED_ORDERING,
+        BLOG_LIST_COLUMNS,
+        COMMENT_THREAD_ORDERING,
+        comment_replies,
+        comment_threads,
+        feed_queryset,
+    )
+
+    after = encode_cursor(["2024-01-01T00:00:00+00:00", 1000])
+    feed = feed_queryset()
+    yield "feed", page_queryset(feed, BLOG_FEED_ORDERING)
+    yield "feed, next page", page_queryset(feed, BLOG_FEED_ORDERING, after)
+    yield "feed of owner", page_queryset(feed_queryset(owner_id=1), BLOG_FEED_ORDERING)
+    yield "feed of owner, next page", page_queryset(
+        feed_queryset(owner_id=1), BLOG_FEED_ORDERING, after
+    )
+    yield "feed of tag", page_queryset(feed_queryset(tag="django"), BLOG_FEED_ORDERING)
+
+    threads_after = encode_cursor(["2024-01-01T00:00:00+00:00", 1000])
+    yield "comment threads", page_queryset(comment_threads(1), COMMENT_THREAD_ORDERING)
+    yield "comment threads, next page", page_queryset(
+        comment_threads(1), COMMENT_THREAD_ORDERING, threads_after
+    )
+    yield "comment replies", comment_replies().filter(parent_id__in=[1, 2, 3])
+    yield "comments of blog", Comment.objects.filter(blog_id=1).only("id")
+
+    for board in ranking.BOARDS:
+        ranks = ranking.ranked_queryset(board, BLOG_LIST_COLUMNS)
+        yield f"trending {board}", page_queryset(ranks, ranking.ORDERING)
+
+    yield "my blog votes", BlogVote.objects.filter(
+        user_id=1, blog_id__in=[1, 2, 3]
+    ).values_list("blog_id", "value")
+
+
+def _problems(name, plan):
+    patterns = (
+        _POSTGRES_PROBLEMS if connection.vendor == "postgresql" else _SQLITE_PROBLEMS
+    )
+    found = []
+    for line in plan.splitlines():
+        for pattern, message in patterns:
+            match = pattern.search(line)
+            if match:
+                found.append(message.format(*match.groups()))
+    if name in SORT_ALLOWED:
+        found = [problem for problem in found if problem != SORT]
+    return found
+
+
+# [(name, plan, problems)] of every hot query
+def explain_hot_queries():
+    results = []
+    for name, queryset in _hot_queries():
+        plan = queryset.explain()
+        results.append((name, plan, _problems(name, plan)))
+    return results
@@ -0,0 +1,138 @@
+import math
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Blog, BlogRank
+from .pagination import keyset_page
+
+# ------------------------------
+# Ranking boards
+#
+# Trending pages are read from BlogRank, one row per (board, blog) with a
+# precomputed score and an index on (board, score desc, blog desc), so a
+# page is a keyset walk over the index whatever the number of blogs.
+#
+#   hot       log10 of the blog score plus a term that grows with creation
+#             time (the reddit formula): newer blogs need fewer votes, and a
+#             row never has to be rescored just because time passed
+#   top_day   blog score, blogs created in the last day
+#   top_week  blog score, blogs created in the last week
+#
+# Votes and comments rescore their blog right after commit (update_blog);
+# `manage.py rebuild_rankings`, run periodically, rebuilds every board and
+# drops blogs that aged out of their window.
+# ------------------------------
+
+HOT = "hot"
+TOP_DAY = "top_day"
+TOP_WEEK = "top_week"
+
+WINDOWS = {
+    HOT: timedelta(days=30),  # older blogs are not worth a hot row
+    TOP_DAY: timedelta(days=1),
+    TOP_WEEK: timedelta(days=7),
+}
+BOARDS = list(WINDOWS)
+ORDERING = ["-score", "-blog_id"]  # walks blogrank_board_score_idx
+
+HOT_EPOCH = 1_700_000_000  # seconds, any fixed point works
+HOT_HALF_LIFE = 45_000  # seconds of recency worth a 10x score
+
+
+def hot_score(score, created_at):
+    order = math.log10(max(abs(score), 1))
+    sign = 1 if score > 0 else -1 if score < 0 else 0
+    seconds = created_at.timestamp() - HOT_EPOCH
+    return round(sign * order + seconds / HOT_HALF_LIFE, 7)
+
+
+# {board: score} for the boards the blog belongs on
+def board_scores(blog, now=None):
+    now = now or timezone.now()
+    if not blog.active:
+        return {}
+    scores = {}
+    for board, window in WINDOWS.items():
+        if blog.created_at < now - window:
+            continue
+        scores[board] = (
+            hot_score(blog.score, blog.created_at) if board == HOT else blog.score
+        )
+    return scores
+
+
+def _rescore(blog_ids):
+    blogs = Blog.objects.filter(id__in=blog_ids).only(
+        "id", "score", "active", "created_at"
+    )
+    now = timezone.now()
+    rows = [
+        BlogRank(board=board, blog_id=blog.id, score=score)
+        for blog in blogs
+        for board, score in board_scores(blog, now).items()
+    ]
+    with transaction.atomic():
+        BlogRank.objects.filter(blog_id__in=blog_ids).delete()
+        BlogRank.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=["board", "blog"],
+            update_fields=["score", "updated_at"],
+        )
+
+
+# Rescore one blog after the current transaction commits
+def update_blog(blog_id):
+    update_blogs([blog_id])
+
+
+def update_blogs(blog_ids):
+    blog_ids = list(blog_ids)
+    if blog_ids:
+        transaction.on_commit(lambda: _rescore(blog_ids))
+
+
+# Recompute every board; returns the number of rows written
+def rebuild(now=None, batch_size=2000):
+    now = now or timezone.now()
+    oldest = now - max(WINDOWS.values())
+    blogs = (
+        Blog.objects.filter(active=True, created_at__gte=oldest)
+        .only("id", "score", "active", "created_at")
+        .iterator(chunk_size=batch_size)
+    )
+
+    rows = []
+    for blog in blogs:
+        for board, score in board_scores(blog, now).items():
+            rows.append(BlogRank(board=board, blog_id=blog.id, score=score))
+
+    with transaction.atomic():
+        BlogRank.objects.all().delete()
+        BlogRank.objects.bulk_create(rows, batch_size=batch_size)
+    return len(rows)
+
+
+# Ranks of one board, before ordering and paging
+def ranked_queryset(board, blog_columns=()):
+    if board not in WINDOWS:
+        raise ValueError(f"board must be one of: {', '.join(BOARDS)}")
+
+    cutoff = timezone.now() - WINDOWS[board]
+    return (
+        BlogRank.objects.filter(board=board)
+        # rows aged out since the last rebuild are skipped
+        .filter(blog__active=True, blog__created_at__gte=cutoff)
+        .select_related("blog")
+        .only("score", "blog", *(f"blog__{column}" for column in blog_columns))
+        .prefetch_related("blog__tags")
+    )
+
+
+# Returns (blogs, next_cursor) for one board, best first
+def ranked_page(board, cursor=None, size=20, blog_columns=()):
+    ranks = ranked_queryset(board, blog_columns)
+    page, next_cursor = keyset_page(ranks, ORDERING, cursor, size)
+    return [rank.blog for rank in page], next_cursor
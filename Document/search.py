@@ -0,0 +1,149 @@
+import re
+
+from django.db import connection
+
+from .models import Blog
+
+# ------------------------------
+# Full-text search over blog title, description and content
+#
+# SQLite:      FTS5 virtual table document_blog_fts (rowid = blog id),
+#              ranked with bm25()
+# PostgreSQL:  document_blog_search (blog_id, tsvector) with a GIN index,
+#              ranked with ts_rank()
+#
+# The index is written by create_blog / edit_blog and cleared by
+# remove_blog. Other databases have no search backend; there is no
+# LIKE '%...%' fallback.
+# ------------------------------
+
+FTS_TABLE = "document_blog_fts"
+PG_TABLE = "document_blog_search"
+PG_CONFIG = "english"
+
+# bm25 weights for (title, description, content)
+SQLITE_WEIGHTS = (10.0, 5.0, 1.0)
+
+MAX_CONTENT_CHARS = 1_000_000
+MAX_SEARCH_OFFSET = 1000
+
+WORD = re.compile(r"\w+", re.UNICODE)
+
+
+class SearchUnavailable(Exception):
+    pass
+
+
+def backend():
+    if connection.vendor in ("sqlite", "postgresql"):
+        return connection.vendor
+    return None
+
+
+def _text(value):
+    if not value:
+        return ""
+    return str(value)[:MAX_CONTENT_CHARS]
+
+
+# Add or refresh one blog in the index
+def index_blog(blog, content=""):
+    index_blogs([(blog, content)])
+
+
+# Add or refresh several (blog, content) pairs with one statement per kind
+def index_blogs(pairs):
+    vendor = backend()
+    if not pairs or vendor is None:
+        return
+    rows = [
+        [blog.id, _text(blog.title), _text(blog.description), _text(content)]
+        for blog, content in pairs
+    ]
+
+    with connection.cursor() as cursor:
+        if vendor == "sqlite":
+            cursor.executemany(
+                f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [row[:1] for row in rows]
+            )
+            cursor.executemany(
+                f"INSERT INTO {FTS_TABLE} (rowid, title, description, content) "
+                "VALUES (%s, %s, %s, %s)",
+                rows,
+            )
+        elif vendor == "postgresql":
+            cursor.executemany(
+                f"INSERT INTO {PG_TABLE} (blog_id, document) VALUES (%s, "
+                f"setweight(to_tsvector('{PG_CONFIG}', %s), 'A') || "
+                f"setweight(to_tsvector('{PG_CONFIG}', %s), 'B') || "
+                f"setweight(to_tsvector('{PG_CONFIG}', %s), 'C')) "
+                "ON CONFLICT (blog_id) DO UPDATE SET document = EXCLUDED.document",
+                rows,
+            )
+
+
+def unindex_blog(blog_id):
+    unindex_blogs([blog_id])
+
+
+def unindex_blogs(blog_ids):
+    vendor = backend()
+    if not blog_ids or vendor is None:
+        return
+    ids = list(blog_ids)
+    marks = ", ".join(["%s"] * len(ids))
+    with connection.cursor() as cursor:
+        if vendor == "sqlite":
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({marks})", ids)
+        elif vendor == "postgresql":
+            cursor.execute(f"DELETE FROM {PG_TABLE} WHERE blog_id IN ({marks})", ids)
+
+
+# "django, rest!" -> '"django" "rest"' : every word must match,
+# FTS5 operators typed by users are treated as plain words
+def _fts5_query(words):
+    return " ".join(f'"{word}"' for word in words)
+
+
+# Ids of matching active blogs, best match first
+def search_ids(query, offset=0, limit=20):
+    vendor = backend()
+    if vendor is None:
+        raise SearchUnavailable(f"no search backend for {connection.vendor}")
+
+    words = WORD.findall(query or "")
+    if not words:
+        return []
+
+    blog_table = connection.ops.quote_name(Blog._meta.db_table)
+    with connection.cursor() as cursor:
+        if vendor == "sqlite":
+            weights = ", ".join(str(w) for w in SQLITE_WEIGHTS)
+            cursor.execute(
+                f"SELECT {FTS_TABLE}.rowid FROM {FTS_TABLE} "
+                f"JOIN {blog_table} b ON b.id = {FTS_TABLE}.rowid "
+                f"WHERE {FTS_TABLE} MATCH %s AND b.active "
+                f"ORDER BY bm25({FTS_TABLE}, {weights}), {FTS_TABLE}.rowid DESC "
+                "LIMIT %s OFFSET %s",
+                [_fts5_query(words), limit, offset],
+            )
+        else:
+            cursor.execute(
+                f"SELECT s.blog_id FROM {PG_TABLE} s "
+                f"JOIN {blog_table} b ON b.id = s.blog_id, "
+                f"plainto_tsquery('{PG_CONFIG}', %s) q "
+                "WHERE s.document @@ q AND b.active "
+                "ORDER BY ts_rank(s.document, q) DESC, s.blog_id DESC "
+                "LIMIT %s OFFSET %s",
+                [" ".join(words), limit, offset],
+            )
+        return [row[0] for row in cursor.fetchall()]
+
+
+# Matching blogs in rank order, loaded with `queryset`
+def search(query, offset=0, limit=20, queryset=None):
+    ids = search_ids(query, offset=offset, limit=limit)
+    if queryset is None:
+        queryset = Blog.objects.all()
+    blogs = queryset.in_bulk(ids)
+    return [blogs[blog_id] for blog_id in ids if blog_id in blogs]
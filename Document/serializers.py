@@ -1,20 +1,59 @@
-from rest_framework.serializers import ModelSerializer
+from rest_framework.serializers import ModelSerializer, SlugRelatedField
+from AuthenticationSystem.models import CustomUser
 from .models import Blog, Comment
 
 
 class BlogFullSerializer(ModelSerializer):
+    tags = SlugRelatedField(many=True, read_only=True, slug_field="name")
+
     class Meta:
         model = Blog
         fields = "__all__"
 
 
 class BlogListSerializer(ModelSerializer):
+    tags = SlugRelatedField(many=True, read_only=True, slug_field="name")
+
     class Meta:
         model = Blog
-        fields = ["title", "description", "tags"]
+        fields = [
+            "id",
+            "title",
+            "description",
+            "tags",
+            "likes",
+            "dislikes",
+            "comment_count",
+            "score",
+            "owner",
+            "created_at",
+        ]
 
 
 class CommentSerializer(ModelSerializer):
     class Meta:
         model = Comment
         fields = "__all__"
+
+
+# Embedded in listings, the owner must come from select_related
+class CompactUserSerializer(ModelSerializer):
+    class Meta:
+        model = CustomUser
+        fields = ["id", "user_name"]
+
+
+class CommentReplySerializer(ModelSerializer):
+    owner = CompactUserSerializer(read_only=True)
+
+    class Meta:
+        model = Comment
+        fields = ["id", "content", "like", "dislike", "owner", "parent", "created_at"]
+
+
+# Top-level comment with its replies, which must be prefetched
+class CommentThreadSerializer(CommentReplySerializer):
+    replies = CommentReplySerializer(many=True, read_only=True)
+
+    class Meta(CommentReplySerializer.Meta):
+        fields = CommentReplySerializer.Meta.fields + ["replies"]
@@ -0,0 +1,131 @@
+import mimetypes
+import re
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.http import content_disposition_header, parse_etags, quote_etag
+
+from .storage import content_storage
+
+# ------------------------------
+# Serving stored blog content files
+#
+# The full file goes out through FileResponse, which hands the open file to
+# the server's wsgi.file_wrapper (sendfile on gunicorn / uWSGI). A single
+# byte range is streamed in CHUNK_SIZE pieces. With DOCUMENT_SENDFILE
+# "MODE" set, only headers are returned and the fronting proxy sends the
+# bytes (nginx X-Accel-Redirect, Apache / lighttpd X-Sendfile).
+# ------------------------------
+
+RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+CHUNK_SIZE = 64 * 1024
+
+
+def sendfile_settings():
+    defaults = {
+        "MODE": None,  # None, "x-accel-redirect" or "x-sendfile"
+        "PREFIX": "/protected/",  # internal nginx location mapped to MEDIA_ROOT
+    }
+    defaults.update(getattr(settings, "DOCUMENT_SENDFILE", {}))
+    return defaults
+
+
+# "bytes=0-99" -> (0, 99); None when the header should be ignored,
+# ValueError when it can't be satisfied
+def parse_range(header, size):
+    match = RANGE.match(header.replace(" ", "")) if header else None
+    if not match:
+        return None  # absent, malformed or several ranges: send everything
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if size == 0:
+        raise ValueError("range of an empty file")
+    if not first:  # suffix range, the last N bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError("empty suffix range")
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError("range not satisfiable")
+    return start, end
+
+
+def _read_range(path, start, end):
+    with open(path, "rb") as stream:
+        stream.seek(start)
+        remaining = end - start + 1
+        while remaining:
+            chunk = stream.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def _common_headers(response, etag, filename, public):
+    response.headers["ETag"] = etag
+    response.headers["Accept-Ranges"] = "bytes"
+    response.headers["Cache-Control"] = (
+        "public, max-age=0, must-revalidate" if public else "private, no-cache"
+    )
+    if filename:
+        response.headers["Content-Disposition"] = content_disposition_header(
+            False, filename
+        )
+    return response
+
+
+# `row` holds the blog columns contect, content_name, content_hash, active.
+# Raises FileNotFoundError when the stored file is gone
+def content_response(request, row):
+    name = row["contect"]
+    filename = row["content_name"]
+    etag = quote_etag(row["content_hash"])
+    public = row["active"]
+    content_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match:
+        etags = parse_etags(if_none_match)
+        if "*" in etags or etag in etags:
+            return _common_headers(
+                HttpResponse(status=304), etag, filename, public
+            )
+
+    mode = sendfile_settings()["MODE"]
+    if mode == "x-accel-redirect":
+        response = HttpResponse(content_type=content_type)
+        response.headers["X-Accel-Redirect"] = sendfile_settings()["PREFIX"] + name
+        return _common_headers(response, etag, filename, public)
+    if mode == "x-sendfile":
+        response = HttpResponse(content_type=content_type)
+        response.headers["X-Sendfile"] = content_storage.path(name)
+        return _common_headers(response, etag, filename, public)
+
+    path = content_storage.path(name)
+    size = content_storage.size(name)
+
+    byte_range = None
+    if_range = request.headers.get("If-Range")
+    if not if_range or if_range == etag:
+        try:
+            byte_range = parse_range(request.headers.get("Range"), size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response.headers["Content-Range"] = f"bytes */{size}"
+            return _common_headers(response, etag, filename, public)
+
+    if byte_range is None:
+        response = FileResponse(open(path, "rb"), content_type=content_type)
+        return _common_headers(response, etag, filename, public)
+
+    start, end = byte_range
+    response = StreamingHttpResponse(
+        _read_range(path, start, end), status=206, content_type=content_type
+    )
+    response.headers["Content-Length"] = end - start + 1
+    response.headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    return _common_headers(response, etag, filename, public)
@@ -0,0 +1,109 @@
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Blog, BlogVote, Comment
+from . import counters
+
+# ------------------------------
+# Denormalized blog statistics
+#
+# Blog.comment_count and Blog.score are kept in step with every vote and
+# comment through the counters module, so feeds can show and sort by them
+# without counting rows. score is a weighted sum of the counters; changing
+# a weight needs `manage.py reconcile_blog_stats` to rewrite old rows.
+# ------------------------------
+
+SCORE_WEIGHTS = {
+    "likes": 1,
+    "dislikes": -1,
+    "comment_count": 2,
+}
+
+
+# {"likes": 1} -> {"likes": 1, "score": 1}
+def with_score(deltas):
+    score = sum(SCORE_WEIGHTS.get(field, 0) * amount for field, amount in deltas.items())
+    return {**deltas, "score": score}
+
+
+def score_expression(likes="likes", dislikes="dislikes", comment_count="comment_count"):
+    return (
+        F(likes) * SCORE_WEIGHTS["likes"]
+        + F(dislikes) * SCORE_WEIGHTS["dislikes"]
+        + F(comment_count) * SCORE_WEIGHTS["comment_count"]
+    )
+
+
+def comments_added(blog_id, count=1):
+    return counters.increment(Blog, blog_id, **with_score({"comment_count": count}))
+
+
+def comments_removed(blog_id, count=1):
+    return comments_added(blog_id, -count)
+
+
+def _count(queryset):
+    return Coalesce(
+        Subquery(
+            queryset.order_by().values("blog").annotate(n=Count("id")).values("n"),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+# Blogs annotated with counters recomputed from the vote ledger and comments
+def _recomputed():
+    votes = BlogVote.objects.filter(blog=OuterRef("pk"))
+    return Blog.all_objects.annotate(
+        real_likes=_count(votes.filter(value=BlogVote.LIKE)),
+        real_dislikes=_count(votes.filter(value=BlogVote.DISLIKE)),
+        real_comments=_count(Comment.objects.filter(blog=OuterRef("pk"))),
+    ).annotate(
+        real_score=score_expression("real_likes", "real_dislikes", "real_comments")
+    )
+
+
+# Rewrite the counters of blogs that drifted, batch_size blogs per
+# transaction. Returns (blogs checked, blogs fixed).
+def reconcile(batch_size=1000, dry_run=False):
+    checked = fixed = 0
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            ids = list(
+                Blog.all_objects.filter(id__gt=last_id)
+                .order_by("id")
+                .values_list("id", flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            last_id = ids[-1]
+            checked += len(ids)
+
+            drifted = list(
+                _recomputed()
+                .select_for_update()
+                .filter(id__in=ids)
+                .filter(
+                    ~Q(likes=F("real_likes"))
+                    | ~Q(dislikes=F("real_dislikes"))
+                    | ~Q(comment_count=F("real_comments"))
+                    | ~Q(score=F("real_score"))
+                )
+                .only("id")
+            )
+            fixed += len(drifted)
+            if dry_run or not drifted:
+                continue
+
+            for blog in drifted:
+                blog.likes = blog.real_likes
+                blog.dislikes = blog.real_dislikes
+                blog.comment_count = blog.real_comments
+                blog.score = blog.real_score
+            Blog.all_objects.bulk_update(
+                drifted, ["likes", "dislikes", "comment_count", "score"]
+            )
+    return checked, fixed
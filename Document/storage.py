@@ -0,0 +1,67 @@
+import os
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+# ------------------------------
+# Content-addressed storage for blog content files
+#
+# A file is stored once under cas/ab/cd/<sha256>, whatever name it was
+# uploaded with, so identical uploads (reposts, unchanged re-edits) share
+# the same bytes on disk. Reference counts live in Document/blobs.py.
+# ------------------------------
+
+PREFIX = "cas"
+
+
+def blob_name(sha256):
+    return f"{PREFIX}/{sha256[:2]}/{sha256[2:4]}/{sha256}"
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    # `content.sha256` is set by Document/uploads.py while the bytes stream in
+
+    def save(self, name, content, max_length=None):
+        name = blob_name(content.sha256)
+        if not self.exists(name):
+            self._write(name, content)
+        return name
+
+    # Write the bytes whether or not the file exists (see blobs.restore)
+    def rewrite(self, content):
+        name = blob_name(content.sha256)
+        self._write(name, content)
+        return name
+
+    def _write(self, name, content):
+        path = self.path(name)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+
+        # write next to the target and rename: two identical uploads racing
+        # each other both end up with one complete file
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".incoming-")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                if hasattr(content, "seek"):
+                    content.seek(0)
+                for chunk in content.chunks():
+                    out.write(chunk)
+            if self.file_permissions_mode is not None:
+                os.chmod(temp_path, self.file_permissions_mode)
+            os.replace(temp_path, path)
+        except BaseException:
+            try:
+                os.remove(temp_path)
+            except FileNotFoundError:
+                pass
+            raise
+
+
+content_storage = ContentAddressedStorage()
+
+
+def get_content_storage():
+    return content_storage
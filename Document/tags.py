@@ -0,0 +1,67 @@
+import re
+
+from .models import BlogTag, Tag
+
+# ------------------------------
+# Blog tags
+#
+# Clients send tags as one string, "lovely - fun" (or "lovely, fun"),
+# or as a list of names. They are stored normalized (lower case, no
+# duplicates) in Tag and linked to blogs through BlogTag.
+# ------------------------------
+
+SEPARATOR = re.compile(r"\s+-\s+|,")
+MAX_TAG_LENGTH = Tag._meta.get_field("name").max_length
+MAX_TAGS_PER_BLOG = 20
+
+
+def parse_tags(raw):
+    if not raw:
+        return []
+    parts = raw if isinstance(raw, (list, tuple)) else SEPARATOR.split(str(raw))
+
+    names = []
+    for part in parts:
+        name = str(part).strip().lower()
+        if not name or name == "none" or name in names:
+            continue
+        if len(name) > MAX_TAG_LENGTH:
+            raise ValueError(f"tag '{name}' is longer than {MAX_TAG_LENGTH} characters")
+        names.append(name)
+
+    if len(names) > MAX_TAGS_PER_BLOG:
+        raise ValueError(f"a blog can have at most {MAX_TAGS_PER_BLOG} tags")
+    return names
+
+
+# Tag rows for the given names, creating the missing ones
+def get_or_create_tags(names):
+    if not names:
+        return []
+    Tag.objects.bulk_create([Tag(name=name) for name in names], ignore_conflicts=True)
+    return list(Tag.objects.filter(name__in=names))
+
+
+# Replace the blog's tags with the given (already parsed) names
+def set_blog_tags(blog, names):
+    tags = get_or_create_tags(names)
+    BlogTag.objects.filter(blog=blog).exclude(tag__in=tags).delete()
+    BlogTag.objects.bulk_create(
+        [BlogTag(blog=blog, tag=tag) for tag in tags], ignore_conflicts=True
+    )
+
+
+# Replace the tags of several blogs at once, {blog id: names}
+def set_tags_of_blogs(names_by_blog):
+    if not names_by_blog:
+        return
+    all_names = {name for names in names_by_blog.values() for name in names}
+    tag_ids = {tag.name: tag.id for tag in get_or_create_tags(list(all_names))}
+    BlogTag.objects.filter(blog_id__in=list(names_by_blog)).delete()
+    BlogTag.objects.bulk_create(
+        [
+            BlogTag(blog_id=blog_id, tag_id=tag_ids[name])
+            for blog_id, names in names_by_blog.items()
+            for name in names
+        ]
+    )
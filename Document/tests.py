@@ -1,3 +1,1168 @@
-from django.test import TestCase
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from datetime import timedelta
+from io import StringIO
+from concurrent.futures import ThreadPoolExecutor
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.db.backends.signals import connection_created
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from AuthenticationSystem.models import CustomUser
+from AuthenticationSystem.views import get_tokens_for_user
+from .models import ArchivedBlog, Blog, BlogVote, Comment, CommentVote, ContentBlob
+from . import blobs, caching, counters, queryplans, ranking, uploads
+from .importer import ArticleImporter
+from .management.commands import cas_report
+from .pagination import encode_cursor
+
+
+TEMP_MEDIA = tempfile.mkdtemp()
+
+
+def tearDownModule():
+    shutil.rmtree(TEMP_MEDIA, ignore_errors=True)
+
+
+def make_user(user_name="writer"):
+    return CustomUser.objects.create_normal(
+        first_name="test",
+        last_name="user",
+        user_name=user_name,
+        password="secret-pass",
+    )
+
+
+def jwt_client(user):
+    client = APIClient()
+    client.credentials(
+        HTTP_AUTHORIZATION=f"Bearer {get_tokens_for_user(user)['access']}"
+    )
+    return client
+
+
+class CounterConcurrencyTests(TransactionTestCase):
+    LIKES = 2000
+    WORKERS = 16
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # as with DB_SQLITE_TUNED: the rollback journal lets 16 threads starve
+        # a writer into "database is locked"; WAL sticks to the database file,
+        # the busy timeout is set on each thread's connection
+        if connection.vendor == "sqlite":
+            with connection.cursor() as cursor:
+                cursor.execute("PRAGMA journal_mode=WAL")
+            connection_created.connect(cls._wait_for_lock)
+
+    @classmethod
+    def tearDownClass(cls):
+        connection_created.disconnect(cls._wait_for_lock)
+        super().tearDownClass()
+
+    @staticmethod
+    def _wait_for_lock(sender, connection, **kwargs):
+        if connection.vendor == "sqlite":
+            with connection.cursor() as cursor:
+                cursor.execute("PRAGMA busy_timeout = 60000")
+
+    def setUp(self):
+        self.user = make_user()
+        self.blog = Blog.objects.create(
+            title="hot", description="viral", contect="hot.txt", owner=self.user
+        )
+
+    def _fire(self, func):
+        def worker(_):
+            try:
+                func()
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=self.WORKERS) as pool:
+            list(pool.map(worker, range(self.LIKES)))
+
+    def test_parallel_likes_are_not_lost(self):
+        self._fire(lambda: counters.increment(Blog, self.blog.id, likes=1))
+
+        self.blog.refresh_from_db()
+        self.assertEqual(self.blog.likes, self.LIKES)
+        self.assertEqual(self.blog.dislikes, 0)
+
+    def test_parallel_buffered_likes_are_not_lost(self):
+        buffer = counters.CounterBuffer(flush_interval=0.05, max_pending=10)
+        self._fire(lambda: buffer.add(Blog, self.blog.id, likes=1, dislikes=-1))
+        buffer.flush()
+
+        self.blog.refresh_from_db()
+        self.assertEqual(self.blog.likes, self.LIKES)
+        self.assertEqual(self.blog.dislikes, -self.LIKES)
+
+    def test_buffer_flushes_on_its_own(self):
+        buffer = counters.CounterBuffer(flush_interval=0.05)
+        with transaction.atomic():
+            buffer.add(Blog, self.blog.id, likes=3)
+        deadline = time.monotonic() + 5
+        while self.blog.likes != 3 and time.monotonic() < deadline:
+            time.sleep(0.02)
+            self.blog.refresh_from_db()
+        self.assertEqual(self.blog.likes, 3)
+
+
+class VoteViewTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.blog = Blog.objects.create(
+            title="t", description="d", contect="t.txt", owner=self.user
+        )
+        self.comment = Comment.objects.create(
+            content="c", blog=self.blog, owner=self.user
+        )
+        self.client = jwt_client(self.user)
+
+    def like_blog(self):
+        return self.client.patch(
+            "/doc/like-blog/", {"blog_id": self.blog.id}, format="json"
+        )
+
+    def test_like_blog_toggles(self):
+        self.assertEqual(self.like_blog().data["vote"], 1)
+        self.blog.refresh_from_db()
+        self.assertEqual(self.blog.likes, 1)
+
+        self.assertEqual(self.like_blog().data["vote"], 0)
+        self.blog.refresh_from_db()
+        self.assertEqual(self.blog.likes, 0)
+
+    def test_dislike_flips_like(self):
+        self.like_blog()
+        response = self.client.patch(
+            "/doc/dislike-blog/", {"blog_id": self.blog.id}, format="json"
+        )
+        self.assertEqual(response.data["vote"], -1)
+        self.blog.refresh_from_db()
+        self.assertEqual((self.blog.likes, self.blog.dislikes), (0, 1))
+
+    def test_my_votes_single_query(self):
+        self.like_blog()
+        others = [
+            Blog.objects.create(title="o", contect="o.txt", owner=self.user).id
+            for _ in range(5)
+        ]
+        ids = ",".join(str(i) for i in [self.blog.id, *others])
+        # the user comes from the JWT claims, one vote lookup for all ids
+        with self.assertNumQueries(1):
+            response = self.client.get(f"/doc/my-votes/?blog_ids={ids}")
+        self.assertEqual(response.data["blogs"], {self.blog.id: 1})
+
+    def test_dislike_comment(self):
+        response = self.client.patch(
+            "/doc/dislike-comment/", {"comment_id": self.comment.id}, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.comment.refresh_from_db()
+        self.assertEqual(self.comment.dislike, 1)
+
+    def test_missing_blog(self):
+        response = self.client.patch(
+            "/doc/like-blog/", {"blog_id": 9999}, format="json"
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_no_new_votes_on_deactivated_blog(self):
+        other = jwt_client(make_user("other"))
+        other.patch("/doc/like-blog/", {"blog_id": self.blog.id}, format="json")
+        Blog.objects.filter(id=self.blog.id).update(active=False)
+
+        for path, data in (
+            ("/doc/dislike-blog/", {"blog_id": self.blog.id}),
+            ("/doc/like-comment/", {"comment_id": self.comment.id}),
+            ("/doc/async/like-comment/", {"comment_id": self.comment.id}),
+        ):
+            response = other.patch(path, data, format="json")
+            self.assertEqual(response.status_code, 404, path)
+        self.assertFalse(CommentVote.objects.exists())
+
+        # the owner still sees it, and the like can be taken back
+        self.assertEqual(self.like_blog().status_code, 200)
+        response = other.patch(
+            "/doc/like-blog/", {"blog_id": self.blog.id}, format="json"
+        )
+        self.assertEqual(response.data["vote"], 0)
+        self.blog.refresh_from_db()
+        self.assertEqual((self.blog.likes, self.blog.dislikes), (1, 0))
+
+
+class BlogFeedTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.other = make_user("other")
+        self.blogs = [
+            Blog.objects.create(
+                title=f"blog {i}", contect="b.txt", owner=self.user if i % 2 else self.other
+            )
+            for i in range(7)
+        ]
+        Blog.objects.filter(id=self.blogs[0].id).update(active=False)
+        self.client = APIClient()
+        cache.clear()
+
+    def test_walks_all_pages_with_cursor(self):
+        seen, cursor = [], None
+        while True:
+            params = {"size": 2}
+            if cursor:
+                params["cursor"] = cursor
+            response = self.client.get("/doc/blogs/", params)
+            self.assertEqual(response.status_code, 200)
+            seen += [blog["id"] for blog in response.data["blogs"]]
+            cursor = response.data["next_cursor"]
+            if not cursor:
+                break
+
+        expected = sorted((b.id for b in self.blogs[1:]), reverse=True)
+        self.assertEqual(seen, expected)
+
+    def test_owner_filter(self):
+        response = self.client.get("/doc/blogs/", {"owner": self.user.id})
+        owners = {blog["owner"] for blog in response.data["blogs"]}
+        self.assertEqual(owners, {self.user.id})
+
+    def test_bad_cursor(self):
+        response = self.client.get("/doc/blogs/", {"cursor": "nope"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_cursor_with_wrong_types(self):
+        for values in (["abc", "x"], [{"a": 1}, 1], [None, 1]):
+            cursor = encode_cursor(values)
+            for path in ("/doc/blogs/", "/doc/async/blogs/"):
+                response = jwt_client(self.user).get(path, {"cursor": cursor})
+                self.assertEqual(response.status_code, 400, (path, values))
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA)
+class TagTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.client = jwt_client(self.user)
+        cache.clear()
+
+    def create(self, title, tags):
+        return self.client.post(
+            "/doc/create-blog/",
+            {"title": title, "description": "d", "content": "c", "tags": tags},
+            format="json",
+        )
+
+    def test_tags_are_normalized(self):
+        response = self.create("one", "none - Lovely - fun - lovely")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["blog"]["tags"], ["lovely", "fun"])
+
+    def test_tag_filter_and_counts(self):
+        self.create("one", "fun - lovely")
+        self.create("two", "fun")
+        self.create("three", "django-rest")
+
+        response = self.client.get("/doc/blogs/", {"tag": "fun"})
+        self.assertEqual(
+            sorted(blog["title"] for blog in response.data["blogs"]), ["one", "two"]
+        )
+
+        response = self.client.get("/doc/tags/")
+        self.assertEqual(
+            response.data["tags"],
+            [
+                {"name": "fun", "count": 2},
+                {"name": "django-rest", "count": 1},
+                {"name": "lovely", "count": 1},
+            ],
+        )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA)
+class SearchTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.client = jwt_client(self.user)
+
+    def create(self, title, content):
+        response = self.client.post(
+            "/doc/create-blog/",
+            {"title": title, "description": "notes", "content": content},
+            format="json",
+        )
+        return response.data["blog"]["id"]
+
+    def found(self, query):
+        response = self.client.get("/doc/blogs/search/", {"q": query})
+        self.assertEqual(response.status_code, 200)
+        return [blog["id"] for blog in response.data["blogs"]]
+
+    def test_index_follows_create_edit_remove(self):
+        first = self.create("Django caching", "redis and memcached")
+        second = self.create("Gardening", "tomatoes need caching of water")
+
+        self.assertEqual(self.found("caching"), [first, second])  # title ranks first
+        self.assertEqual(self.found("tomatoes"), [second])
+
+        self.client.put(
+            "/doc/edit-blog/",
+            {
+                "blog_id": second,
+                "new_title": "Gardening",
+                "new_description": "notes",
+                "new_content": "cucumbers",
+                "new_tags": "garden",
+            },
+            format="json",
+        )
+        self.assertEqual(self.found("tomatoes"), [])
+
+        self.client.delete("/doc/remove-blog/", {"blog_id": first}, format="json")
+        self.assertEqual(self.found("redis"), [])
+
+    def test_query_syntax_is_not_interpreted(self):
+        self.create("plain", "text")
+        self.assertEqual(self.found('" OR NEAR(*'), [])
+
+
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA,
+    DOCUMENT_UPLOADS={"MAX_SIZE": 1000, "CHUNK_SIZE": 64},
+)
+class UploadTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.client = jwt_client(self.user)
+
+    def create(self, **data):
+        data.setdefault("title", "t")
+        data.setdefault("description", "d")
+        return self.client.post("/doc/create-blog/", data)
+
+    def test_multipart_file_is_stored_and_hashed(self):
+        body = b"hello world " * 20
+        response = self.create(content=SimpleUploadedFile("a.txt", body))
+        self.assertEqual(response.status_code, 201)
+
+        blog = Blog.objects.get(id=response.data["blog"]["id"])
+        self.assertEqual(blog.content_hash, hashlib.sha256(body).hexdigest())
+        self.assertEqual(blog.content_size, len(body))
+        with blog.contect.open("rb") as stored:
+            self.assertEqual(stored.read(), body)
+
+    def test_oversized_body_is_rejected(self):
+        response = self.create(content=SimpleUploadedFile("a.bin", b"x" * 2000))
+        self.assertEqual(response.status_code, 413)
+        self.assertFalse(Blog.objects.exists())
+
+    def test_oversized_json_body_is_rejected_unread(self):
+        body = json.dumps({"title": "t", "description": "d", "content": "x" * 2000})
+        for method, path in (("post", "/doc/create-blog/"), ("put", "/doc/edit-blog/")):
+            response = getattr(self.client, method)(
+                path, body, content_type="application/json"
+            )
+            self.assertEqual(response.status_code, 413, path)
+            self.assertFalse(response.wsgi_request._read_started, path)
+        self.assertFalse(Blog.objects.exists())
+
+    def test_resumable_upload(self):
+        body = bytes(range(256)) * 3
+        upload_id = self.client.post(
+            "/doc/uploads/", {"filename": "a.bin", "size": len(body)}, format="json"
+        ).data["upload_id"]
+        url = f"/doc/uploads/{upload_id}/"
+
+        def put(start, end):
+            return self.client.generic(
+                "PUT",
+                url,
+                body[start : end + 1],
+                content_type="application/octet-stream",
+                HTTP_CONTENT_RANGE=f"bytes {start}-{end}/{len(body)}",
+            )
+
+        self.assertEqual(put(0, 299).data["offset"], 300)
+        self.assertEqual(put(0, 299).status_code, 409)  # already written
+        self.assertEqual(self.client.get(url).data["offset"], 300)
+        self.assertTrue(put(300, len(body) - 1).data["complete"])
+
+        response = self.create(upload_id=upload_id)
+        self.assertEqual(response.status_code, 201)
+        blog = Blog.objects.get(id=response.data["blog"]["id"])
+        self.assertEqual(blog.content_hash, hashlib.sha256(body).hexdigest())
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_identical_content_is_stored_once(self):
+        first = self.create(content="same words").data["blog"]["id"]
+        second = self.create(content="same words").data["blog"]["id"]
+        name = Blog.objects.get(id=first).contect.name
+        self.assertEqual(Blog.objects.get(id=second).contect.name, name)
+        self.assertEqual(ContentBlob.objects.get().refcount, 2)
+
+        storage = Blog._meta.get_field("contect").storage
+        for blog_id, still_stored in ((first, True), (second, False)):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.delete(
+                    "/doc/remove-blog/", {"blog_id": blog_id}, format="json"
+                )
+            self.assertEqual(storage.exists(name), still_stored)
+        self.assertFalse(ContentBlob.objects.exists())
+
+    def test_file_deleted_before_acquire_is_restored(self):
+        first = self.create(content="same words").data["blog"]["id"]
+        name = Blog.objects.get(id=first).contect.name
+        storage = Blog._meta.get_field("contect").storage
+
+        content = uploads.content_from_text("same words")
+        blog = Blog(title="t", description="d", owner=self.user)
+        uploads.attach_content(blog, content)  # exists: not written again
+        storage.delete(name)  # a release of the last reference commits
+        with transaction.atomic():
+            blog.save()
+            blobs.acquire(blog.content_hash, blog.content_size)
+            blobs.restore([content])
+        self.assertTrue(storage.exists(name))
+
+        # a deletion scheduled before the new reference keeps the file
+        blobs._delete_if_unused(blog.content_hash)
+        self.assertTrue(storage.exists(name))
+        self.assertEqual(ContentBlob.objects.get().refcount, 2)
+
+    def test_reclaim_skips_recent_files(self):
+        media = tempfile.mkdtemp(dir=TEMP_MEDIA)
+        self.enterContext(override_settings(MEDIA_ROOT=media))
+        storage = Blog._meta.get_field("contect").storage
+        name = storage.rewrite(uploads.content_from_text("nobody's"))
+
+        out = StringIO()
+        call_command("cas_report", reclaim=True, stdout=out)
+        self.assertIn("1 recent files kept", out.getvalue())
+        self.assertTrue(storage.exists(name))
+
+        old = time.time() - 7200
+        os.utime(storage.path(name), (old, old))
+        out = StringIO()
+        call_command("cas_report", reclaim=True, stdout=out)
+        self.assertIn("1 files removed", out.getvalue())
+        self.assertFalse(storage.exists(name))
+
+    def test_reclaim_recounts_blogs_saved_during_the_report(self):
+        media = tempfile.mkdtemp(dir=TEMP_MEDIA)
+        self.enterContext(override_settings(MEDIA_ROOT=media))
+        storage = Blog._meta.get_field("contect").storage
+        tests = self
+
+        class Report(cas_report.Command):
+            def _stored_files(self):
+                # a blog commits after the references were counted
+                blog_id = tests.create(content="new words").data["blog"]["id"]
+                path = storage.path(Blog.objects.get(id=blog_id).contect.name)
+                old = time.time() - 7200
+                os.utime(path, (old, old))
+                return super()._stored_files()
+
+        out = StringIO()
+        call_command(Report(), reclaim=True, stdout=out)
+        self.assertIn("0 files removed", out.getvalue())
+        self.assertEqual(ContentBlob.objects.get().refcount, 1)
+        blog = Blog.objects.get()
+        self.assertTrue(storage.exists(blog.contect.name))
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA)
+class ContentServingTests(TestCase):
+    BODY = b"0123456789" * 100
+
+    def setUp(self):
+        self.user = make_user()
+        self.owner_client = jwt_client(self.user)
+        response = self.owner_client.post(
+            "/doc/create-blog/",
+            {
+                "title": "t",
+                "description": "d",
+                "content": SimpleUploadedFile("notes.txt", self.BODY),
+            },
+        )
+        self.blog_id = response.data["blog"]["id"]
+        self.url = f"/doc/blogs/{self.blog_id}/content/"
+        self.client = APIClient()
+
+    def test_full_file_with_etag(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), self.BODY)
+
+        again = self.client.get(self.url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(again.status_code, 304)
+
+    def test_ranges(self):
+        response = self.client.get(self.url, HTTP_RANGE="bytes=10-19")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Range"], f"bytes 10-19/{len(self.BODY)}")
+        self.assertEqual(b"".join(response.streaming_content), self.BODY[10:20])
+
+        response = self.client.get(self.url, HTTP_RANGE="bytes=-5")
+        self.assertEqual(b"".join(response.streaming_content), self.BODY[-5:])
+
+        response = self.client.get(self.url, HTTP_RANGE="bytes=5000-")
+        self.assertEqual(response.status_code, 416)
+
+    def test_inactive_blog_only_for_owner(self):
+        Blog.objects.filter(id=self.blog_id).update(active=False)
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+        self.assertEqual(self.owner_client.get(self.url).status_code, 200)
+
+    def test_missing_file(self):
+        blog = Blog.objects.get(id=self.blog_id)
+        os.remove(blog.contect.path)
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+        response = self.client.get(self.url, HTTP_RANGE="bytes=-5")
+        self.assertEqual(response.status_code, 404)
+
+    def test_range_of_empty_file(self):
+        response = self.owner_client.post(
+            "/doc/create-blog/",
+            {
+                "title": "empty",
+                "description": "d",
+                "content": SimpleUploadedFile("empty.txt", b""),
+            },
+        )
+        url = f"/doc/blogs/{response.data['blog']['id']}/content/"
+        response = self.client.get(url, HTTP_RANGE="bytes=-5")
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response["Content-Range"], "bytes */0")
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    @override_settings(DOCUMENT_SENDFILE={"MODE": "x-accel-redirect"})
+    def test_x_accel_redirect(self):
+        response = self.client.get(self.url)
+        self.assertTrue(response["X-Accel-Redirect"].startswith("/protected/cas/"))
+        self.assertEqual(response.content, b"")
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA)
+class ResponseCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = make_user()
+        self.owner_client = jwt_client(self.user)
+        self.client = APIClient()
+        self.blog_id = self.create("first")
+
+    def create(self, title):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.owner_client.post(
+                "/doc/create-blog/",
+                {"title": title, "description": "d", "content": "c"},
+                format="json",
+            )
+        return response.data["blog"]["id"]
+
+    def test_detail_is_cached_until_changed(self):
+        url = f"/doc/blogs/{self.blog_id}/"
+        self.assertEqual(self.client.get(url).data["blog"]["title"], "first")
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.owner_client.patch(
+                "/doc/deactive-blog/", {"blog_id": self.blog_id}, format="json"
+            )
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(self.owner_client.get(url).status_code, 200)
+
+    def test_detail_after_like(self):
+        url = f"/doc/blogs/{self.blog_id}/"
+        self.assertEqual(self.client.get(url).data["blog"]["likes"], 0)
+        for path in ("/doc/like-blog/", "/doc/async/dislike-blog/"):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.owner_client.patch(path, {"blog_id": self.blog_id}, format="json")
+        blog = self.owner_client.get(url).data
+        self.assertEqual((blog["blog"]["likes"], blog["blog"]["dislikes"]), (0, 1))
+        self.assertEqual(blog["my_vote"], -1)
+
+    def test_feed_sees_new_blogs(self):
+        self.assertEqual(len(self.client.get("/doc/blogs/").data["blogs"]), 1)
+        with self.assertNumQueries(0):
+            self.client.get("/doc/blogs/")
+
+        self.create("second")
+        titles = [blog["title"] for blog in self.client.get("/doc/blogs/").data["blogs"]]
+        self.assertEqual(titles, ["second", "first"])
+
+    def test_stale_entry_is_served_while_recomputing(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return len(calls)
+
+        self.assertEqual(caching.get_or_compute("k", compute, timeout=60), 1)
+        cache.set("k", (time.time() - 1, 1))  # expired, but still stored
+        cache.add("k:lock", 1)  # another request is recomputing
+
+        self.assertEqual(caching.get_or_compute("k", compute, timeout=60), 1)
+        self.assertEqual(len(calls), 1)
+
+        cache.delete("k:lock")
+        self.assertEqual(caching.get_or_compute("k", compute, timeout=60), 2)
+
+
+class CommentListTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.blog = Blog.objects.create(title="t", contect="b.txt", owner=self.user)
+        self.client = jwt_client(self.user)
+
+    def comment(self, content, parent=None):
+        response = self.client.post(
+            "/doc/sub-comment/",
+            {
+                "content": content,
+                "blog_id": self.blog.id,
+                "parent_id": parent.id if parent else None,
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201)
+        return Comment.objects.get(id=response.data["comment"]["id"])
+
+    def add_threads(self, count):
+        for i in range(count):
+            first = self.comment(f"thread {i}")
+            reply = self.comment("reply", parent=first)
+            self.comment("reply to reply", parent=reply)
+
+    def list(self, **params):
+        return self.client.get(f"/doc/blogs/{self.blog.id}/comments/", params)
+
+    def test_threads_with_replies(self):
+        self.add_threads(3)
+        response = self.list(size=2)
+        self.assertEqual(response.status_code, 200)
+        threads = response.data["comments"]
+        self.assertEqual([c["content"] for c in threads], ["thread 0", "thread 1"])
+        self.assertEqual(
+            [r["content"] for r in threads[0]["replies"]], ["reply", "reply to reply"]
+        )
+        self.assertEqual(threads[0]["owner"], {"id": self.user.id, "user_name": "writer"})
+
+        rest = self.list(size=2, cursor=response.data["next_cursor"]).data
+        self.assertEqual([c["content"] for c in rest["comments"]], ["thread 2"])
+        self.assertIsNone(rest["next_cursor"])
+
+    def test_query_count_does_not_grow_with_page_size(self):
+        self.add_threads(12)
+        # blog, threads, replies, the viewer's votes
+        for size in (1, 5, 12):
+            with self.assertNumQueries(4):
+                self.list(size=size)
+
+    def test_bad_cursor(self):
+        for cursor in ("nope", encode_cursor(["abc", "x"]), encode_cursor([{"a": 1}, 1])):
+            for prefix in ("/doc", "/doc/async"):
+                response = self.client.get(
+                    f"{prefix}/blogs/{self.blog.id}/comments/", {"cursor": cursor}
+                )
+                self.assertEqual(response.status_code, 400, (prefix, cursor))
+
+
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.blog = Blog.objects.create(
+            title="t", description="d", contect="t.txt", owner=self.user
+        )
+        Blog.objects.create(title="u", contect="u.txt", owner=self.user)
+        self.comment = Comment.objects.create(
+            content="c", blog=self.blog, owner=self.user
+        )
+        Comment.objects.create(
+            content="r", blog=self.blog, owner=self.user, parent=self.comment
+        )
+        self.client = jwt_client(self.user)
+        cache.clear()
+
+    def test_reads_match_sync_views(self):
+        for path in (
+            "blogs/?size=1",
+            f"blogs/{self.blog.id}/",
+            f"blogs/{self.blog.id}/comments/",
+            f"my-votes/?blog_ids={self.blog.id}",
+        ):
+            expected = self.client.get(f"/doc/{path}").json()
+            response = self.client.get(f"/doc/async/{path}")
+            self.assertEqual(response.status_code, 200, path)
+            self.assertEqual(response.json(), expected, path)
+
+    def test_like_blog_toggles(self):
+        path = "/doc/async/like-blog/"
+        response = self.client.patch(path, {"blog_id": self.blog.id}, format="json")
+        self.assertEqual(response.json()["vote"], 1)
+        self.blog.refresh_from_db()
+        self.assertEqual(self.blog.likes, 1)
+
+        response = self.client.patch(path, {"blog_id": self.blog.id}, format="json")
+        self.assertEqual(response.json()["vote"], 0)
+
+    def test_inactive_blog_only_for_owner(self):
+        Blog.objects.filter(id=self.blog.id).update(active=False)
+        path = f"/doc/async/blogs/{self.blog.id}/"
+        self.assertEqual(APIClient().get(path).status_code, 404)
+        self.assertEqual(self.client.get(path).status_code, 200)
+
+    def test_authentication(self):
+        anonymous = APIClient()
+        response = anonymous.patch(
+            "/doc/async/like-blog/", {"blog_id": self.blog.id}, format="json"
+        )
+        self.assertEqual(response.status_code, 401)
+
+        anonymous.credentials(HTTP_AUTHORIZATION="Bearer nope")
+        self.assertEqual(anonymous.get("/doc/async/blogs/").status_code, 401)
+
+    def test_wrong_method(self):
+        self.assertEqual(self.client.post("/doc/async/blogs/").status_code, 405)
+
+
+class BlogStatsTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.blog = Blog.objects.create(title="t", contect="t.txt", owner=self.user)
+        self.client = jwt_client(self.user)
+
+    def stats(self):
+        self.blog.refresh_from_db()
+        return self.blog.likes, self.blog.comment_count, self.blog.score
+
+    def test_votes_and_comments_update_score(self):
+        self.client.patch("/doc/like-blog/", {"blog_id": self.blog.id}, format="json")
+        thread = self.client.post(
+            "/doc/sub-comment/", {"content": "c", "blog_id": self.blog.id}, format="json"
+        ).data["comment"]["id"]
+        self.client.post(
+            "/doc/sub-comment/",
+            {"content": "r", "blog_id": self.blog.id, "parent_id": thread},
+            format="json",
+        )
+        self.assertEqual(self.stats(), (1, 2, 5))
+
+        self.client.delete("/doc/remove-comment/", {"comentId": thread}, format="json")
+        self.assertEqual(self.stats(), (1, 0, 1))
+
+    def test_reconcile_repairs_drift(self):
+        self.client.patch("/doc/like-blog/", {"blog_id": self.blog.id}, format="json")
+        Comment.objects.create(content="c", blog=self.blog, owner=self.user)
+        Blog.objects.filter(id=self.blog.id).update(likes=7, score=0)
+
+        with override_settings(DOCUMENT_COUNTERS={"BUFFERED": True}):
+            with self.assertRaises(CommandError):
+                call_command("reconcile_blog_stats", stdout=StringIO())
+        self.assertEqual(self.stats(), (7, 0, 0))  # untouched
+
+        call_command("reconcile_blog_stats", stdout=StringIO())
+        self.assertEqual(self.stats(), (1, 1, 3))
+
+
+class RankingTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.client = jwt_client(self.user)
+        self.blogs = [
+            Blog.objects.create(title=f"blog {i}", contect="b.txt", owner=self.user)
+            for i in range(3)
+        ]
+        Blog.objects.filter(id=self.blogs[0].id).update(score=10)
+        Blog.objects.filter(id=self.blogs[1].id).update(score=3)
+        ranking.rebuild()
+
+    def board(self, board, **params):
+        response = self.client.get("/doc/blogs/trending/", {"board": board, **params})
+        self.assertEqual(response.status_code, 200)
+        return [blog["id"] for blog in response.data["blogs"]], response.data
+
+    def test_boards_are_ordered_by_score(self):
+        ids = [blog.id for blog in self.blogs]
+        self.assertEqual(self.board("hot")[0], ids)
+        self.assertEqual(self.board("top_week")[0], ids)
+
+        first, data = self.board("top_day", size=2)
+        rest, _ = self.board("top_day", size=2, cursor=data["next_cursor"])
+        self.assertEqual(first + rest, ids)
+
+    def test_votes_update_rank_and_old_blogs_leave_top_day(self):
+        last = self.blogs[2]
+        for user_name in ("a", "b", "c", "d", "e", "f"):
+            with self.captureOnCommitCallbacks(execute=True):
+                jwt_client(make_user(user_name)).patch(
+                    "/doc/like-blog/", {"blog_id": last.id}, format="json"
+                )
+        self.assertEqual(self.board("top_day")[0][:2], [self.blogs[0].id, last.id])
+
+        Blog.objects.filter(id=self.blogs[0].id).update(
+            created_at=timezone.now() - timedelta(days=2)
+        )
+        self.assertNotIn(self.blogs[0].id, self.board("top_day")[0])
+        self.assertIn(self.blogs[0].id, self.board("top_week")[0])
+
+    def test_buffered_votes_rank_once_flushed(self):
+        last = self.blogs[2]
+        buffer = counters.CounterBuffer(flush_interval=60)
+        buffer.add(Blog, last.id, likes=20, score=20)
+        self.assertEqual(self.board("hot")[0][-1], last.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            buffer.flush()
+        self.assertEqual(self.board("hot")[0][0], last.id)
+
+    def test_unknown_board(self):
+        response = self.client.get("/doc/blogs/trending/", {"board": "best"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_cursor_with_wrong_types(self):
+        for values in ([{"a": 1}, 1], ["abc", "x"], [1.5, [2]]):
+            response = self.client.get(
+                "/doc/blogs/trending/", {"cursor": encode_cursor(values)}
+            )
+            self.assertEqual(response.status_code, 400, values)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA, DOCUMENT_BULK={"MAX_ITEMS": 5})
+class BulkTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.client = jwt_client(self.user)
+        self.other = Blog.objects.create(
+            title="other", contect="o.txt", owner=make_user("other")
+        )
+
+    def send(self, method, url, items):
+        response = getattr(self.client, method)(url, {"items": items}, format="json")
+        self.assertEqual(response.status_code, 200)
+        return [result["status"] for result in response.data["results"]], response.data
+
+    def test_blogs_create_update_delete(self):
+        statuses, data = self.send(
+            "post",
+            "/doc/bulk/blogs/",
+            [
+                {"title": "a", "description": "d", "content": "same", "tags": "x - y"},
+                {"title": "b", "description": "d", "content": "same"},
+                {"title": "c"},
+            ],
+        )
+        self.assertEqual(statuses, [201, 201, 400])
+        self.assertEqual(data["failed"], 1)
+        first, second = (result["id"] for result in data["results"][:2])
+        self.assertEqual(ContentBlob.objects.get().refcount, 2)
+        found = self.client.get("/doc/blogs/search/", {"q": "same"}).data["blogs"]
+        self.assertEqual(len(found), 2)
+        self.assertEqual(
+            sorted(Blog.objects.get(id=first).tags.values_list("name", flat=True)),
+            ["x", "y"],
+        )
+
+        statuses, _ = self.send(
+            "patch",
+            "/doc/bulk/blogs/",
+            [
+                {"id": first, "title": "A", "tags": "z"},
+                {"id": self.other.id, "title": "mine"},
+                {"id": 999999, "title": "gone"},
+            ],
+        )
+        self.assertEqual(statuses, [200, 403, 404])
+        blog = Blog.objects.get(id=first)
+        self.assertEqual(blog.title, "A")
+        self.assertEqual(blog.content_hash, ContentBlob.objects.get().sha256)
+        self.assertEqual(list(blog.tags.values_list("name", flat=True)), ["z"])
+
+        statuses, _ = self.send(
+            "delete", "/doc/bulk/blogs/", [first, second, self.other.id]
+        )
+        self.assertEqual(statuses, [200, 200, 403])
+        self.assertEqual(list(Blog.objects.values_list("id", flat=True)), [self.other.id])
+        self.assertFalse(ContentBlob.objects.exists())
+
+    def test_comments_keep_counts(self):
+        statuses, data = self.send(
+            "post",
+            "/doc/bulk/comments/",
+            [
+                {"blog_id": self.other.id, "content": "one"},
+                {"blog_id": self.other.id, "content": "two"},
+                {"blog_id": 999999, "content": "lost"},
+            ],
+        )
+        self.assertEqual(statuses, [201, 201, 404])
+        first = data["results"][0]["id"]
+        self.send(
+            "post",
+            "/doc/bulk/comments/",
+            [{"blog_id": self.other.id, "content": "reply", "parent_id": first}],
+        )
+        self.other.refresh_from_db()
+        self.assertEqual(self.other.comment_count, 3)
+
+        statuses, _ = self.send(
+            "patch", "/doc/bulk/comments/", [{"id": first, "content": "edited"}]
+        )
+        self.assertEqual(statuses, [200])
+        self.assertEqual(Comment.objects.get(id=first).content, "edited")
+
+        statuses, _ = self.send("delete", "/doc/bulk/comments/", [first])
+        self.assertEqual(statuses, [200])
+        self.other.refresh_from_db()
+        self.assertEqual(self.other.comment_count, 1)
+
+    def test_item_limit(self):
+        response = self.client.post(
+            "/doc/bulk/blogs/", {"items": [{}] * 6}, format="json"
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.admin = CustomUser.objects.create_admin(
+            first_name="a", last_name="b", user_name="boss", password="secret-pass"
+        )
+        self.user = make_user()
+        blog = Blog.objects.create(title="t", contect="b.txt", owner=self.user)
+        Comment.objects.create(content="c", blog=blog, owner=self.admin)
+
+    def rows(self, data):
+        return [json.loads(line) for line in data.splitlines()]
+
+    def test_admin_streams_ndjson(self):
+        response = jwt_client(self.admin).get("/doc/export/")
+        self.assertEqual(response.status_code, 200)
+        rows = self.rows(b"".join(response.streaming_content))
+        self.assertEqual(
+            [row["type"] for row in rows], ["user", "user", "blog", "comment"]
+        )
+        self.assertEqual(rows[2]["owner"], "writer")
+        self.assertNotIn("password", rows[0])
+
+        response = jwt_client(self.admin).get(
+            "/doc/export/", {"types": "comments", "gzip": "1"}
+        )
+        rows = self.rows(gzip.decompress(b"".join(response.streaming_content)))
+        self.assertEqual(rows[0]["owner"], "boss")
+
+    def test_admins_only(self):
+        response = jwt_client(self.user).get("/doc/export/")
+        self.assertEqual(response.status_code, 403)
+
+    def test_command(self):
+        out = tempfile.NamedTemporaryFile(suffix=".ndjson", delete=False)
+        out.close()
+        call_command("export_ndjson", output=out.name, types="blogs", stderr=StringIO())
+        with open(out.name, "rb") as exported:
+            self.assertEqual(self.rows(exported.read())[0]["title"], "t")
+        os.unlink(out.name)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA)
+class ImportTests(TestCase):
+    def setUp(self):
+        self.user = make_user("sara")
+        self.path = os.path.join(tempfile.mkdtemp(dir=TEMP_MEDIA), "articles.ndjson")
+        rows = [
+            {"title": f"post {i}", "description": "d", "content": f"body {i}",
+             "owner": "sara", "tags": "django", "created_at": "2024-01-01T10:00:00Z"}
+            for i in range(5)
+        ]
+        rows.append({"title": "orphan", "content": "x", "owner": "nobody"})
+        with open(self.path, "w") as out:
+            out.writelines(json.dumps(row) + "\n" for row in rows)
+            out.write("not json\n")
+
+    def run_import(self, **options):
+        out = StringIO()
+        call_command("import_articles", self.path, batch_size=2, stdout=out, **options)
+        return out.getvalue()
+
+    def test_imports_in_batches_and_resumes(self):
+        output = self.run_import()
+        self.assertIn("imported 5 blogs", output)
+        self.assertIn("skipped 1 blogs with unknown owner", output)
+        blog = Blog.objects.get(title="post 0")
+        self.assertEqual(blog.owner_id, self.user.id)
+        self.assertEqual(blog.created_at.year, 2024)
+        self.assertEqual(list(blog.tags.values_list("name", flat=True)), ["django"])
+
+        # the checkpoint is at the end: nothing is imported twice
+        self.assertIn("imported 0 blogs", self.run_import())
+        self.assertEqual(Blog.objects.count(), 5)
+
+        self.run_import(restart=True, create_owners=True)
+        self.assertEqual(Blog.objects.count(), 11)
+        self.assertTrue(CustomUser.objects.filter(user_name="nobody").exists())
+
+    def test_crash_after_a_batch_commits(self):
+        flush = ArticleImporter.flush
+
+        def crash_after_second_batch(importer, *args, **kwargs):
+            written = flush(importer, *args, **kwargs)
+            if importer.imported > 2:
+                raise KeyboardInterrupt  # killed right after the commit
+            return written
+
+        ArticleImporter.flush = crash_after_second_batch
+        try:
+            with self.assertRaises(KeyboardInterrupt):
+                self.run_import()
+        finally:
+            ArticleImporter.flush = flush
+        self.assertEqual(Blog.objects.count(), 4)
+
+        self.assertIn("imported 1 blogs", self.run_import())
+        self.assertEqual(
+            sorted(Blog.objects.values_list("title", flat=True)),
+            [f"post {i}" for i in range(5)],
+        )
+
+    def test_export_round_trip_keeps_deactivated_blogs(self):
+        self.run_import()
+        deactivated_at = (timezone.now() - timedelta(days=3)).replace(microsecond=0)
+        Blog.objects.filter(title="post 0").update(
+            active=False, deactivated_at=deactivated_at
+        )
+        call_command(
+            "export_ndjson", output=self.path, types="blogs", stderr=StringIO()
+        )
+
+        self.assertIn("imported 5 blogs", self.run_import(restart=True))
+        copies = Blog.all_objects.filter(title="post 0")
+        self.assertEqual(
+            sorted(copies.values_list("active", "deactivated_at")),
+            [(False, deactivated_at)] * 2,
+        )
+        self.assertEqual(Blog.objects.filter(title="post 1").count(), 2)
+
+
+class QueryPlanTests(TestCase):
+    def test_hot_queries_use_indexes(self):
+        for name, plan, problems in queryplans.explain_hot_queries():
+            with self.subTest(query=name):
+                self.assertEqual(problems, [], plan)
+
+    def test_detects_full_scan(self):
+        plan = Blog.all_objects.filter(title="t").explain()
+        self.assertIn("full scan of Document_blog", queryplans._problems("x", plan))
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA)
+class ArchiveTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = make_user()
+        self.reader = make_user("reader")
+        self.client = jwt_client(self.user)
+        response = self.client.post(
+            "/doc/create-blog/",
+            {
+                "title": "old news",
+                "description": "d",
+                "tags": "history - news",
+                "content": SimpleUploadedFile("a.txt", b"archived words"),
+            },
+        )
+        self.blog = Blog.objects.get(id=response.data["blog"]["id"])
+        with self.captureOnCommitCallbacks(execute=True):
+            jwt_client(self.reader).patch(
+                "/doc/like-blog/", {"blog_id": self.blog.id}, format="json"
+            )
+            thread = self.comment("first")
+            self.comment("reply", thread)
+
+    def comment(self, content, parent=None):
+        response = self.client.post(
+            "/doc/sub-comment/",
+            {
+                "content": content,
+                "blog_id": self.blog.id,
+                "parent_id": parent.id if parent else None,
+            },
+            format="json",
+        )
+        return Comment.objects.get(id=response.data["comment"]["id"])
+
+    def deactivate(self, days_ago):
+        self.client.patch(
+            "/doc/deactive-blog/", {"blog_id": self.blog.id}, format="json"
+        )
+        Blog.all_objects.filter(id=self.blog.id).update(
+            deactivated_at=timezone.now() - timedelta(days=days_ago)
+        )
+
+    def test_default_manager_hides_deactivated_blogs(self):
+        self.deactivate(0)
+        self.assertFalse(Blog.objects.filter(id=self.blog.id).exists())
+        blog = Blog.all_objects.get(id=self.blog.id)
+        self.assertIsNotNone(blog.deactivated_at)
+
+    def test_archive_and_restore(self):
+        self.deactivate(10)
+        call_command("archive_blogs", days=30, stdout=StringIO())
+        self.assertTrue(Blog.all_objects.filter(id=self.blog.id).exists())
+
+        call_command("archive_blogs", days=5, stdout=StringIO())
+        self.assertFalse(Blog.all_objects.filter(id=self.blog.id).exists())
+        self.assertFalse(Comment.objects.exists())
+        archived = ArchivedBlog.objects.get(id=self.blog.id)
+        self.assertEqual(archived.tags, ["history", "news"])
+        self.assertEqual(archived.comments.count(), 2)
+        # the archived blog still holds its content reference
+        self.assertEqual(ContentBlob.objects.get().refcount, 1)
+        out = StringIO()
+        call_command("cas_report", stdout=out)
+        self.assertIn("drifted refcounts:  0", out.getvalue())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                "/doc/active-blog/", {"blog_id": self.blog.id}, format="json"
+            )
+        self.assertEqual(response.status_code, 200)
+        blog = Blog.objects.get(id=self.blog.id)
+        self.assertEqual(blog.created_at, self.blog.created_at)
+        self.assertEqual((blog.likes, blog.comment_count), (1, 2))
+        self.assertEqual(BlogVote.objects.get().user, self.reader)
+        self.assertEqual(
+            sorted(blog.tags.values_list("name", flat=True)), ["history", "news"]
+        )
+        self.assertEqual(Comment.objects.filter(parent__isnull=False).count(), 1)
+        self.assertFalse(ArchivedBlog.objects.exists())
+
+        response = self.client.get(f"/doc/blogs/{blog.id}/")
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get("/doc/blogs/search/", {"q": "words"})
+        self.assertEqual([row["id"] for row in response.data["blogs"]], [blog.id])
+
+    def test_removing_an_archived_blog_releases_its_content(self):
+        self.deactivate(100)
+        call_command("archive_blogs", stdout=StringIO())
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(
+                "/doc/remove-blog/", {"blog_id": self.blog.id}, format="json"
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(ArchivedBlog.objects.exists())
+        self.assertFalse(ContentBlob.objects.exists())
@@ -0,0 +1,274 @@
+import codecs
+import hashlib
+import os
+import re
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.core.files.uploadhandler import StopUpload, TemporaryFileUploadHandler
+from django.http import QueryDict
+from django.utils.datastructures import MultiValueDict
+
+from .models import ContentUpload
+
+# ------------------------------
+# Blog content uploads
+#
+# Content reaches a blog in one of three ways:
+#   - a multipart file field, streamed to a temporary file chunk by chunk
+#     by HashingUploadHandler (never held in worker memory)
+#   - a plain text field, for short articles sent as JSON
+#   - a finished resumable upload (ContentUpload), whose parts were
+#     appended to a .part file by PUT /doc/uploads/<id>/
+#
+# In every case the SHA-256 is computed while the bytes go by and the size
+# limit is enforced before the body is read when Content-Length says so.
+# ------------------------------
+
+
+def upload_settings():
+    defaults = {
+        "MAX_SIZE": 50 * 1024 * 1024,
+        "CHUNK_SIZE": 64 * 1024,
+        "PARTS_DIR": os.path.join(settings.MEDIA_ROOT, "uploads"),
+    }
+    defaults.update(getattr(settings, "DOCUMENT_UPLOADS", {}))
+    return defaults
+
+
+class UploadError(Exception):
+    def __init__(self, msg, status_code=400):
+        super().__init__(msg)
+        self.status_code = status_code
+
+
+def too_large():
+    return UploadError(
+        f"content is larger than {upload_settings()['MAX_SIZE']} bytes", 413
+    )
+
+
+class HashingUploadHandler(TemporaryFileUploadHandler):
+    def __init__(self, request=None):
+        super().__init__(request)
+        conf = upload_settings()
+        self.chunk_size = conf["CHUNK_SIZE"]
+        self.max_size = conf["MAX_SIZE"]
+        self.rejected = False
+
+    def handle_raw_input(
+        self, input_data, META, content_length, boundary, encoding=None
+    ):
+        # refuse before reading a single byte of an oversized body,
+        # returning empty data ends the parsing here
+        if content_length and content_length > self.max_size:
+            self.rejected = True
+            return QueryDict(encoding=encoding), MultiValueDict()
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.sha256 = hashlib.sha256()
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > self.max_size:
+            self.rejected = True
+            raise StopUpload(connection_reset=True)
+        self.sha256.update(raw_data)
+        self.file.write(raw_data)
+
+    def file_complete(self, file_size):
+        uploaded = super().file_complete(file_size)
+        uploaded.sha256 = self.sha256.hexdigest()
+        return uploaded
+
+
+# Must run before request.data is touched. A declared Content-Length over
+# MAX_SIZE rejects the request whatever its content type: DRF would read a
+# JSON or form body into memory before any size check, only multipart goes
+# through the handler
+def use_streaming_uploads(request):
+    handler = HashingUploadHandler(request._request)
+    request._request.upload_handlers = [handler]
+    try:
+        content_length = int(request.META.get("CONTENT_LENGTH") or 0)
+    except ValueError:
+        content_length = 0
+    handler.rejected = content_length > handler.max_size
+    return handler
+
+
+def _sha256_of(file, chunk_size):
+    digest = hashlib.sha256()
+    file.seek(0)
+    for chunk in file.chunks(chunk_size):
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+# ------------------------------
+# Resumable uploads
+# ------------------------------
+
+
+def part_path(upload):
+    return os.path.join(upload_settings()["PARTS_DIR"], f"{upload.id}.part")
+
+
+CONTENT_RANGE = re.compile(r"^bytes (\d+)-(\d+)/(\d+)$")
+
+
+# "bytes 0-1023/4096" -> (0, 1023, 4096)
+def parse_content_range(header):
+    match = CONTENT_RANGE.match(header or "")
+    if not match:
+        raise UploadError("Content-Range must look like 'bytes start-end/total'")
+    start, end, total = (int(group) for group in match.groups())
+    if end < start:
+        raise UploadError("Content-Range end is before start")
+    return start, end, total
+
+
+# Stream one part of the request body into the upload's .part file.
+# Returns the new offset.
+def write_part(upload, stream, start, end, total):
+    conf = upload_settings()
+    if total != upload.size:
+        raise UploadError(f"upload size is {upload.size} bytes, not {total}")
+    if start != upload.received:
+        raise UploadError(f"expected a part starting at {upload.received}", 409)
+    if end >= upload.size:
+        raise too_large()
+
+    path = part_path(upload)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    remaining = end - start + 1
+    with open(path, "r+b" if os.path.exists(path) else "wb") as part:
+        part.seek(start)
+        while remaining:
+            chunk = stream.read(min(conf["CHUNK_SIZE"], remaining))
+            if not chunk:
+                part.truncate(start)
+                raise UploadError("request body is shorter than Content-Range")
+            part.write(chunk)
+            remaining -= len(chunk)
+        part.truncate()
+
+    updated = ContentUpload.objects.filter(id=upload.id, received=start).update(
+        received=end + 1
+    )
+    if not updated:
+        raise UploadError("another part was written at the same time", 409)
+    return end + 1
+
+
+def start_upload(owner, filename, size):
+    if size < 1:
+        raise UploadError("size must be positive")
+    if size > upload_settings()["MAX_SIZE"]:
+        raise too_large()
+    return ContentUpload.objects.create(
+        owner=owner, filename=os.path.basename(filename or "content")[:255], size=size
+    )
+
+
+def discard_upload(upload):
+    try:
+        os.remove(part_path(upload))
+    except FileNotFoundError:
+        pass
+    upload.delete()
+
+
+# ------------------------------
+# Resolving the content of create_blog / edit_blog
+# ------------------------------
+
+
+# Returns a File with .sha256 set, or None when nothing was sent
+def content_from_request(request, field, upload_field="upload_id"):
+    conf = upload_settings()
+
+    uploaded = request.FILES.get(field)
+    if uploaded is not None:
+        if not hasattr(uploaded, "sha256"):
+            uploaded.sha256 = _sha256_of(uploaded, conf["CHUNK_SIZE"])
+        return uploaded
+
+    upload_id = request.data.get(upload_field)
+    if upload_id:
+        try:
+            upload = ContentUpload.objects.get(id=upload_id, owner=request.user)
+        except (ContentUpload.DoesNotExist, ValidationError, ValueError):
+            raise UploadError("upload not found", 404)
+        if upload.received != upload.size:
+            raise UploadError(
+                f"upload is incomplete ({upload.received}/{upload.size} bytes)", 409
+            )
+        content = File(open(part_path(upload), "rb"), name=upload.filename)
+        content.sha256 = _sha256_of(content, conf["CHUNK_SIZE"])
+        content.finished_upload = upload
+        return content
+
+    text = request.data.get(field)
+    if text:
+        return content_from_text(text, field)
+
+    return None
+
+
+# Content sent as text, stored as content.txt
+def content_from_text(text, field="content"):
+    if not isinstance(text, str):
+        raise UploadError(f"{field} must be text or a file")
+    raw = text.encode("utf-8")
+    if len(raw) > upload_settings()["MAX_SIZE"]:
+        raise too_large()
+    content = ContentFile(raw, name="content.txt")
+    content.sha256 = hashlib.sha256(raw).hexdigest()
+    return content
+
+
+# Store the content file and point the blog at it; the caller saves the
+# blog and takes a reference with blobs.acquire() in the same transaction
+def attach_content(blog, content):
+    name = os.path.basename(content.name or "content")[:255]
+    size = content.size
+    blog.contect.save(name, content, save=False)
+    blog.content_name = name
+    blog.content_hash = content.sha256
+    blog.content_size = size
+
+
+# The finished resumable upload behind `content` is no longer needed
+# once the blog is saved
+def consume_upload(content):
+    upload = getattr(content, "finished_upload", None)
+    if upload is not None:
+        content.close()
+        discard_upload(upload)
+
+
+# Leading text of a stored content file for the search index,
+# empty for binary files
+def text_preview(content, limit):
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    pieces, size = [], 0
+    try:
+        content.seek(0)
+        for chunk in content.chunks(upload_settings()["CHUNK_SIZE"]):
+            pieces.append(decoder.decode(chunk[: limit - size]))
+            size += len(chunk)
+            if size >= limit:
+                break
+    except UnicodeDecodeError:
+        return ""
+    finally:
+        content.seek(0)
+    text = "".join(pieces)
+    return "" if "\x00" in text else text
@@ -1,4 +1,5 @@
 from django.urls import path
+from . import async_views
 from .views import (
     create_blog,
     sub_comment,
@@ -12,6 +13,19 @@ from .views import (
     dislike_blog,
     deactive_blog,
     active_blog,
+    my_votes,
+    blog_list,
+    tag_counts,
+    blog_search,
+    start_upload,
+    upload_part,
+    blog_content,
+    blog_detail,
+    comment_list,
+    blog_trending,
+    bulk_blogs,
+    bulk_comments,
+    export_data,
 )
 
 # ------------------------------
@@ -25,6 +39,7 @@ urlpatterns = [
     # Description:
     #   - Creates a new blog post.
     #   - Required fields: title, description, content
+    #   - content can be text, a multipart file or upload_id of a finished upload
     #   - Optional field: tags
     #   - Requires JWT authentication
     # ------------------------------
@@ -36,6 +51,7 @@ urlpatterns = [
     # Description:
     #   - Adds a comment to a blog post.
     #   - Required fields: content, blog_id
+    #   - Optional field: parent_id, the comment being replied to
     #   - Requires JWT authentication
     # ------------------------------
     path("sub-comment/", sub_comment, name="sub_comment"),
@@ -46,6 +62,7 @@ urlpatterns = [
     # Description:
     #   - Updates an existing blog post.
     #   - Required fields: blog_id, new_title, new_description, new_content, new_tags
+    #   - new_content can be text, a multipart file or upload_id of a finished upload
     #   - User must be the owner of the blog
     #   - Requires JWT authentication
     # ------------------------------
@@ -88,7 +105,8 @@ urlpatterns = [
     # LIKE COMMENT
     # Endpoint: PATCH /doc/like-comment/
     # Description:
-    #   - Increments the like count of a comment.
+    #   - Toggles the user's like on a comment.
+    #   - Sending it again removes the vote; an existing dislike is flipped.
     #   - Required field: comment_id
     #   - Requires JWT authentication
     # ------------------------------
@@ -98,7 +116,8 @@ urlpatterns = [
     # DISLIKE COMMENT
     # Endpoint: PATCH /doc/dislike-comment/
     # Description:
-    #   - Increments the dislike count of a comment.
+    #   - Toggles the user's dislike on a comment.
+    #   - Sending it again removes the vote; an existing like is flipped.
     #   - Required field: comment_id
     #   - Requires JWT authentication
     # ------------------------------
@@ -108,7 +127,8 @@ urlpatterns = [
     # LIKE BLOG
     # Endpoint: PATCH /doc/like-blog/
     # Description:
-    #   - Increments the like count of a blog post.
+    #   - Toggles the user's like on a blog post.
+    #   - Sending it again removes the vote; an existing dislike is flipped.
     #   - Required field: blog_id
     #   - Requires JWT authentication
     # ------------------------------
@@ -118,7 +138,8 @@ urlpatterns = [
     # DISLIKE BLOG
     # Endpoint: PATCH /doc/dislike-blog/
     # Description:
-    #   - Increments the dislike count of a blog post.
+    #   - Toggles the user's dislike on a blog post.
+    #   - Sending it again removes the vote; an existing like is flipped.
     #   - Required field: blog_id
     #   - Requires JWT authentication
     # ------------------------------
@@ -145,4 +166,175 @@ urlpatterns = [
     #   - Requires JWT authentication
     # ------------------------------
     path("active-blog/", active_blog, name="active_blog"),
-]
\ No newline at end of file
+    
+    # ------------------------------
+    # MY VOTES
+    # Endpoint: GET /doc/my-votes/?blog_ids=1,2&comment_ids=5,6
+    # Description:
+    #   - Returns the user's votes (1 = like, -1 = dislike) on the given ids.
+    #   - Ids without a vote are left out.
+    #   - Answered with one query per target type.
+    #   - Requires JWT authentication
+    # ------------------------------
+    path("my-votes/", my_votes, name="my_votes"),
+    
+    # ------------------------------
+    # BLOG FEED
+    # Endpoint: GET /doc/blogs/
+    # Description:
+    #   - Lists active blogs, newest first.
+    #   - Optional query params: owner (user id), tag, size (max 100), cursor
+    #   - Pass the returned next_cursor as cursor to get the next page.
+    #   - Includes the user's votes on the listed blogs when authenticated
+    # ------------------------------
+    path("blogs/", blog_list, name="blog_list"),
+    
+    # ------------------------------
+    # TRENDING BLOGS
+    # Endpoint: GET /doc/blogs/trending/?board=hot
+    # Description:
+    #   - Lists active blogs by rank on a board: hot, top_day or top_week.
+    #   - Optional query params: board (default hot), size (max 100), cursor
+    #   - Rankings are precomputed, run manage.py rebuild_rankings periodically
+    # ------------------------------
+    path("blogs/trending/", blog_trending, name="blog_trending"),
+    
+    # ------------------------------
+    # TAG COUNTS
+    # Endpoint: GET /doc/tags/
+    # Description:
+    #   - Lists tags with the number of active blogs using them, most used first.
+    #   - Optional query param: limit (default 50, max 500)
+    # ------------------------------
+    path("tags/", tag_counts, name="tag_counts"),
+    
+    # ------------------------------
+    # SEARCH BLOGS
+    # Endpoint: GET /doc/blogs/search/?q=django
+    # Description:
+    #   - Full-text search over title, description and content of active blogs.
+    #   - Results are ranked, best match first.
+    #   - Optional query params: page (from 1), size (max 100)
+    # ------------------------------
+    path("blogs/search/", blog_search, name="blog_search"),
+    
+    # ------------------------------
+    # START RESUMABLE UPLOAD
+    # Endpoint: POST /doc/uploads/
+    # Description:
+    #   - Starts a resumable upload of a blog content file.
+    #   - Required fields: filename, size (bytes)
+    #   - Returns upload_id; finish with create-blog / edit-blog using upload_id
+    #   - Requires JWT authentication
+    # ------------------------------
+    path("uploads/", start_upload, name="start_upload"),
+    
+    # ------------------------------
+    # UPLOAD PART
+    # Endpoint: GET / PUT / DELETE /doc/uploads/<upload_id>/
+    # Description:
+    #   - PUT appends the raw request body, header: Content-Range: bytes start-end/size
+    #   - start must equal the current offset; GET returns the offset to resume from
+    #   - DELETE discards the upload
+    #   - Requires JWT authentication
+    # ------------------------------
+    path("uploads/<uuid:upload_id>/", upload_part, name="upload_part"),
+    
+    # ------------------------------
+    # DOWNLOAD BLOG CONTENT
+    # Endpoint: GET /doc/blogs/<blog_id>/content/
+    # Description:
+    #   - Returns the stored content file of a blog.
+    #   - Supports Range / If-Range, ETag / If-None-Match
+    #   - Inactive blogs are only served to their owner
+    # ------------------------------
+    path("blogs/<int:blog_id>/content/", blog_content, name="blog_content"),
+    
+    # ------------------------------
+    # BLOG DETAIL
+    # Endpoint: GET /doc/blogs/<blog_id>/
+    # Description:
+    #   - Returns one blog with its tags and the user's vote on it.
+    #   - Inactive blogs are only shown to their owner
+    # ------------------------------
+    path("blogs/<int:blog_id>/", blog_detail, name="blog_detail"),
+    
+    # ------------------------------
+    # BLOG COMMENTS
+    # Endpoint: GET /doc/blogs/<blog_id>/comments/
+    # Description:
+    #   - Lists the blog's comment threads, oldest first, each with its replies.
+    #   - Optional query params: size (max 100), cursor
+    #   - Includes the user's votes on the listed comments when authenticated
+    # ------------------------------
+    path("blogs/<int:blog_id>/comments/", comment_list, name="comment_list"),
+    
+    # ------------------------------
+    # BULK BLOGS
+    # Endpoint: POST / PATCH / DELETE /doc/bulk/blogs/
+    # Description:
+    #   - Creates, updates or deletes many blogs in one transaction.
+    #   - Body: {"items": [...]}, at most DOCUMENT_BULK["MAX_ITEMS"] items
+    #   - POST items: title, description, content (text), tags
+    #   - PATCH items: id and any of title, description, content, tags
+    #   - DELETE items: blog ids
+    #   - Returns one result (status, id or error) per item
+    #   - Requires JWT authentication
+    # ------------------------------
+    path("bulk/blogs/", bulk_blogs, name="bulk_blogs"),
+    
+    # ------------------------------
+    # BULK COMMENTS
+    # Endpoint: POST / PATCH / DELETE /doc/bulk/comments/
+    # Description:
+    #   - Creates, updates or deletes many comments in one transaction.
+    #   - POST items: blog_id, content, parent_id (optional)
+    #   - PATCH items: id, content
+    #   - DELETE items: comment ids
+    #   - Returns one result (status, id or error) per item
+    #   - Requires JWT authentication
+    # ------------------------------
+    path("bulk/comments/", bulk_comments, name="bulk_comments"),
+    
+    # ------------------------------
+    # EXPORT
+    # Endpoint: GET /doc/export/?types=blogs,comments&gzip=1
+    # Description:
+    #   - Streams users, blogs and comments as newline-delimited JSON.
+    #   - Optional query params: types (users,blogs,comments), gzip
+    #   - Admin users only
+    # ------------------------------
+    path("export/", export_data, name="export_data"),
+    
+    # ------------------------------
+    # ASYNC READ AND VOTE ENDPOINTS
+    # Endpoint: /doc/async/blogs/, /doc/async/blogs/<blog_id>/,
+    #           /doc/async/blogs/<blog_id>/comments/, /doc/async/my-votes/,
+    #           /doc/async/like-blog/, /doc/async/dislike-blog/,
+    #           /doc/async/like-comment/, /doc/async/dislike-comment/
+    # Description:
+    #   - Same requests and responses as the endpoints without async/.
+    #   - Coroutine views for ASGI servers (uvicorn DL.asgi:application)
+    #   - Vote endpoints require JWT authentication
+    # ------------------------------
+    path("async/blogs/", async_views.blog_list, name="async_blog_list"),
+    path(
+        "async/blogs/<int:blog_id>/",
+        async_views.blog_detail,
+        name="async_blog_detail",
+    ),
+    path(
+        "async/blogs/<int:blog_id>/comments/",
+        async_views.comment_list,
+        name="async_comment_list",
+    ),
+    path("async/my-votes/", async_views.my_votes, name="async_my_votes"),
+    path("async/like-blog/", async_views.like_blog, name="async_like_blog"),
+    path("async/dislike-blog/", async_views.dislike_blog, name="async_dislike_blog"),
+    path("async/like-comment/", async_views.like_comment, name="async_like_comment"),
+    path(
+        "async/dislike-comment/",
+        async_views.dislike_comment,
+        name="async_dislike_comment",
+    ),
+]
@@ -2,39 +2,129 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import AllowAny, IsAuthenticated
-from rest_framework_simplejwt.authentication import JWTAuthentication
-from rest_framework.exceptions import AuthenticationFailed
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from django.db.models import Count, Prefetch, Q
+from django.utils import timezone
 
 # --------------------
 
 
-from .models import Blog, Comment
-from .serializers import BlogFullSerializer, BlogListSerializer, CommentSerializer
+from AuthenticationSystem.permissions import IsAdminUserType
+from .models import Blog, Comment, Tag
+from . import (
+    archive,
+    blobs,
+    bulk,
+    caching,
+    export,
+    ranking,
+    search,
+    serving,
+    stats,
+    uploads,
+    votes,
+)
+from .models import ContentUpload
+from .pagination import keyset_page, page_size
+from .tags import parse_tags, set_blog_tags
+from .serializers import (
+    BlogFullSerializer,
+    BlogListSerializer,
+    CommentSerializer,
+    CommentThreadSerializer,
+)
 
 # --------------------
 
+MAX_VOTE_LOOKUP = 200
+
+# Columns read by BlogListSerializer, the feed never loads the rest
+BLOG_LIST_COLUMNS = [
+    "id",
+    "title",
+    "description",
+    "likes",
+    "dislikes",
+    "comment_count",
+    "score",
+    "owner_id",
+    "created_at",
+]
+BLOG_FEED_ORDERING = ["-created_at", "-id"]
+
+# Columns read by CommentThreadSerializer, owner comes from the join
+COMMENT_LIST_COLUMNS = [
+    "id",
+    "content",
+    "like",
+    "dislike",
+    "parent",
+    "created_at",
+    "owner__id",
+    "owner__user_name",
+]
+COMMENT_THREAD_ORDERING = ["created_at", "id"]
+
+
+# Active blogs as listed by the feed, optionally of one owner / tag
+def feed_queryset(owner_id=None, tag=None):
+    blogs = Blog.objects.only(*BLOG_LIST_COLUMNS).prefetch_related("tags")
+    if tag:
+        blogs = blogs.filter(tags__name=tag.strip().lower())
+    if owner_id:
+        blogs = blogs.filter(owner_id=owner_id)
+    return blogs
+
+
+# Top-level comments of a blog, each with its replies
+def comment_threads(blog_id):
+    return (
+        Comment.objects.filter(blog_id=blog_id, parent=None)
+        .select_related("owner")
+        .only(*COMMENT_LIST_COLUMNS)
+        .prefetch_related(Prefetch("replies", queryset=comment_replies()))
+    )
+
+
+def comment_replies():
+    return (
+        Comment.objects.select_related("owner")
+        .only(*COMMENT_LIST_COLUMNS)
+        .order_by(*COMMENT_THREAD_ORDERING)
+    )
+
+
+# "1,2,3" -> [1, 2, 3]
+def parse_ids(raw):
+    if not raw:
+        return []
+    return [int(part) for part in raw.split(",") if part.strip()]
+
 
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
 def create_blog(request):
-    try:
-        user_auth = JWTAuthentication().authenticate(request)
-        if not user_auth:
-            return Response(
-                {"msg": "your JWT isn't fine"}, status=status.HTTP_400_BAD_REQUEST
-            )
-        else:
-            owner, _ = user_auth
-
-    except AuthenticationFailed:
+    upload_handler = uploads.use_streaming_uploads(request)
+    if upload_handler.rejected:
         return Response(
-            {"msg": "your JWT isn't fine"}, status=status.HTTP_400_BAD_REQUEST
+            {"msg": f"{uploads.too_large()}"},
+            status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
         )
 
+    # authenticated once by DEFAULT_AUTHENTICATION_CLASSES
+    owner = request.user
+
     blog_title = request.data.get("title")
     blog_description = request.data.get("description")
     blog_tags = request.data.get("tags")
-    blog_content = request.data.get("content")
+
+    # a body without Content-Length can still stream past the limit
+    if upload_handler.rejected:
+        return Response(
+            {"msg": f"{uploads.too_large()}"},
+            status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        )
 
     if not blog_title:
         return Response(
@@ -45,19 +135,36 @@ def create_blog(request):
             {"msg": "description is required"}, status=status.HTTP_400_BAD_REQUEST
         )
 
+    try:
+        blog_content = uploads.content_from_request(request, "content")
+    except uploads.UploadError as e:
+        return Response({"msg": f"{e}"}, status=e.status_code)
+
     if not blog_content:
         return Response(
             {"msg": "content is required"}, status=status.HTTP_400_BAD_REQUEST
         )
     try:
-        blog = Blog.objects.create(
-            title=blog_title, description=blog_description, tags=blog_tags, owner=owner
-        )
+        tag_names = parse_tags(blog_tags)
+        content_text = uploads.text_preview(blog_content, search.MAX_CONTENT_CHARS)
+        blog = Blog(title=blog_title, description=blog_description, owner=owner)
+        uploads.attach_content(blog, blog_content)
+        with transaction.atomic():
+            blog.save()
+            blobs.acquire(blog.content_hash, blog.content_size)
+            blobs.restore([blog_content])
+            set_blog_tags(blog, tag_names)
+            search.index_blog(blog, content_text)
+            caching.invalidate_blog(blog.id)
+            ranking.update_blog(blog.id)
+        uploads.consume_upload(blog_content)
         return Response(
             {"blog": BlogFullSerializer(blog).data}, status=status.HTTP_201_CREATED
         )
     except ValueError as ve:
         return Response({"msg": f"{ve}"}, status=status.HTTP_400_BAD_REQUEST)
+    finally:
+        blog_content.close()
 
 
 @api_view(["POST"])
@@ -65,6 +172,7 @@ def create_blog(request):
 def sub_comment(request):
     content = request.data.get("content")
     blog_id = request.data.get("blog_id")
+    parent_id = request.data.get("parent_id")
 
     if not content:
         return Response(
@@ -76,14 +184,36 @@ def sub_comment(request):
         )
 
     try:
-        blog = Blog.objects.filter(id=blog_id)
-    except Blog.DoesNotExist:
+        blog = Blog.objects.get(id=blog_id)
+    except (Blog.DoesNotExist, ValueError):
         return Response(
             {"msg": f"there is no blog with {blog_id} id"},
             status=status.HTTP_404_NOT_FOUND,
         )
+
+    parent = None
+    if parent_id:
+        try:
+            parent = Comment.objects.only("id", "parent").get(
+                id=parent_id, blog=blog
+            )
+        except (Comment.DoesNotExist, ValueError):
+            return Response(
+                {"msg": f"there is no comment with {parent_id} id on this blog"},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        # a reply to a reply joins the same thread
+        if parent.parent_id:
+            parent = Comment(id=parent.parent_id)
+
     try:
-        comment = Comment.objects.create(content=content, blog=blog)
+        with transaction.atomic():
+            comment = Comment.objects.create(
+                content=content, blog=blog, parent=parent, owner=request.user
+            )
+            stats.comments_added(blog.id)
+        caching.invalidate_blog(blog.id, feed=False)
+        ranking.update_blog(blog.id)
         return Response(
             {"comment": CommentSerializer(comment).data}, status=status.HTTP_201_CREATED
         )
@@ -98,20 +228,16 @@ def edit_comment(request):
     comment_id = request.data.get("commentId")
     new_content = request.data.get("newContent")
 
-    user, _ = JWTAuthentication(request)
-    if not user:
-        return Response(
-            {"error": "your JWT isn't ok"}, status=status.HTTP_400_BAD_REQUEST
-        )
+    user = request.user
 
     if not all([comment_id, new_content]):
         return Response(
             {"error": "all fields are required"}, status=status.HTTP_400_BAD_REQUEST
         )
 
-    if Comment.objects.filter(id=comment_id).exist():
+    if Comment.objects.filter(id=comment_id).exists():
         comment = Comment.objects.get(id=comment_id)
-        if comment.owner != user:
+        if comment.owner_id != user.id:
             return Response(
                 {"error": "you are not allowed"}, status=status.HTTP_403_FORBIDDEN
             )
@@ -132,11 +258,7 @@ def edit_comment(request):
 @permission_classes([IsAuthenticated])
 def remove_comment(request):
     comment_id = request.data.get("comentId")
-    user, _ = JWTAuthentication(request)
-    if not user:
-        return Response(
-            {"error": "your JWT isn't ok"}, status=status.HTTP_400_BAD_REQUEST
-        )
+    user = request.user
 
     if not comment_id:
         return Response(
@@ -151,13 +273,19 @@ def remove_comment(request):
         )
 
     comment = Comment.objects.get(id=comment_id)
-    if comment.owner != user:
+    if comment.owner_id != user.id:
         return Response(
             {"error": "you aren't allowed"}, status=status.HTTP_403_FORBIDDEN
         )
 
     try:
-        comment.delete()
+        with transaction.atomic():
+            # replies go with a top-level comment
+            removed = 1 + (comment.replies.count() if comment.parent_id is None else 0)
+            comment.delete()
+            stats.comments_removed(comment.blog_id, removed)
+        caching.invalidate_blog(comment.blog_id, feed=False)
+        ranking.update_blog(comment.blog_id)
         return Response(
             {"msg": f"comment by id: {comment_id} deleted"}, status=status.HTTP_200_OK
         )
@@ -168,116 +296,197 @@ def remove_comment(request):
 @api_view(["PUT"])
 @permission_classes([IsAuthenticated])
 def edit_blog(request):
+    upload_handler = uploads.use_streaming_uploads(request)
+    if upload_handler.rejected:
+        return Response(
+            {"error": f"{uploads.too_large()}"},
+            status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        )
+
     blog_id = request.data.get("blog_id")
     new_title = request.data.get("new_title")
     new_description = request.data.get("new_description")
-    new_content = request.data.get("new_content")
     new_tags = request.data.get("new_tags")
 
-    user, _ = JWTAuthentication(request)
-    if not user:
-        return Response(
-            {"error": "your JWT isn't ok "}, status=status.HTTP_400_BAD_REQUEST
-        )
+    user = request.user
 
-    if not all(
-        [
-            blog_id,
-            new_title,
-            new_description,
-            new_content,
-            new_tags,
-        ]
-    ):
+    # a body without Content-Length can still stream past the limit
+    if upload_handler.rejected:
         return Response(
-            {"error": "all fields are required"}, status=status.HTTP_400_BAD_REQUEST
+            {"error": f"{uploads.too_large()}"},
+            status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
         )
 
-    blog = Blog.objects.filter(id=blog_id)
-    if not blog.exists():
-        return Response({"your blog not found"}, status=status.HTTP_404_NOT_FOUND)
+    try:
+        new_content = uploads.content_from_request(request, "new_content")
+    except uploads.UploadError as e:
+        return Response({"error": f"{e}"}, status=e.status_code)
 
     try:
-        blog.content = new_content
-        blog.title = new_title
-        blog.description = new_description
-        blog.tags = new_tags
-        blog.save()
+        if not all(
+            [
+                blog_id,
+                new_title,
+                new_description,
+                new_content,
+                new_tags,
+            ]
+        ):
+            return Response(
+                {"error": "all fields are required"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            blog = Blog.all_objects.get(id=blog_id)
+        except (Blog.DoesNotExist, ValueError):
+            return Response(
+                {"error": "your blog not found"}, status=status.HTTP_404_NOT_FOUND
+            )
+
+        if blog.owner_id != user.id:
+            return Response(
+                {"error": "you aren't allowed"}, status=status.HTTP_403_FORBIDDEN
+            )
+
+        tag_names = parse_tags(new_tags)
+        content_text = uploads.text_preview(new_content, search.MAX_CONTENT_CHARS)
+        old_hash = blog.content_hash
+        uploads.attach_content(blog, new_content)
+        with transaction.atomic():
+            blog.title = new_title
+            blog.description = new_description
+            blog.save()
+            blobs.acquire(blog.content_hash, blog.content_size)
+            blobs.restore([new_content])
+            blobs.release(old_hash)
+            set_blog_tags(blog, tag_names)
+            search.index_blog(blog, content_text)
+            caching.invalidate_blog(blog.id)
+        uploads.consume_upload(new_content)
+        return Response(
+            {"blog": BlogFullSerializer(blog).data}, status=status.HTTP_200_OK
+        )
     except ValueError as e:
         return Response({"error": f"{e}"}, status=status.HTTP_403_FORBIDDEN)
+    finally:
+        if new_content:
+            new_content.close()
 
 
-@api_view(["PATCH"])
-@permission_classes([IsAuthenticated])
-def like_comment(request):
-    comment_id = request.data.get("comment_id")
-    user, _ = JWTAuthentication(request)
-    if not user:
-        return Response(
-            {"error": "your JWT isn't ok"}, status=status.HTTP_400_BAD_REQUEST
-        )
+# Shared body of the like / dislike views
+def vote_response(request, target, key, noun, direction):
+    target_id = request.data.get(key)
 
-    if not comment_id:
+    if not target_id:
         return Response(
-            {"error": "comment_id field is required"},
+            {"error": f"{key} field is required"},
             status=status.HTTP_400_BAD_REQUEST,
         )
 
     try:
-        comment = Comment.objects.get(id=comment_id)
-    except Comment.DoesNotExist:
+        state = votes.toggle(target, request.user, target_id, direction)
+    except ValueError as e:
         return Response(
-            {"error": "your comment not found"}, status=status.HTTP_404_NOT_FOUND
+            {"error": f"{e}"},
+            status=status.HTTP_400_BAD_REQUEST,
         )
 
-    try:
-        comment_likes = comment.likes
-        comment_likes += 1
-        comment.likes = comment_likes
-        comment.save()
+    if state is None:
         return Response(
-            {"msg": "comment liked"},
-            status=status.HTTP_200_OK,
-        )
-    except ValueError as e:
-        return Response(
-            {"error": f"{e}"},
-            status=status.HTTP_403_FORBIDDEN,
+            {"error": f"your {noun} not found"}, status=status.HTTP_404_NOT_FOUND
         )
+    if target is votes.BLOG:
+        ranking.update_blog(target_id)
+        # the cached detail carries likes / dislikes / score
+        caching.invalidate_blog(target_id, feed=False)
+
+    if state == votes.LIKE:
+        msg = f"{noun} liked"
+    elif state == votes.DISLIKE:
+        msg = f"{noun} disliked"
+    else:
+        msg = f"{noun} vote removed"
+
+    return Response({"msg": msg, "vote": state}, status=status.HTTP_200_OK)
+
+
+@api_view(["PATCH"])
+@permission_classes([IsAuthenticated])
+def like_comment(request):
+    return vote_response(request, votes.COMMENT, "comment_id", "comment", votes.LIKE)
 
 
 @api_view(["PATCH"])
 @permission_classes([IsAuthenticated])
 def dislike_comment(request):
-    comment_id = request.data.get("comment_id")
-    user, _ = JWTAuthentication(request)
-    if not user:
+    return vote_response(request, votes.COMMENT, "comment_id", "comment", votes.DISLIKE)
+
+
+@api_view(["PATCH"])
+@permission_classes([IsAuthenticated])
+def like_blog(request):
+    return vote_response(request, votes.BLOG, "blog_id", "blog", votes.LIKE)
+
+
+@api_view(["PATCH"])
+@permission_classes([IsAuthenticated])
+def dislike_blog(request):
+    return vote_response(request, votes.BLOG, "blog_id", "blog", votes.DISLIKE)
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def my_votes(request):
+    try:
+        blog_ids = parse_ids(request.query_params.get("blog_ids"))
+        comment_ids = parse_ids(request.query_params.get("comment_ids"))
+    except ValueError:
         return Response(
-            {"error": "your JWT isn't ok"}, status=status.HTTP_400_BAD_REQUEST
+            {"error": "ids must be comma separated numbers"},
+            status=status.HTTP_400_BAD_REQUEST,
         )
 
-    if not comment_id:
+    if len(blog_ids) + len(comment_ids) > MAX_VOTE_LOOKUP:
         return Response(
-            {"error": "comment_id field is required"},
+            {"error": f"at most {MAX_VOTE_LOOKUP} ids per request"},
             status=status.HTTP_400_BAD_REQUEST,
         )
 
-    try:
-        comment = Comment.objects.get(id=comment_id)
-    except Comment.DoesNotExist:
+    return Response(
+        {
+            "blogs": votes.votes_for(votes.BLOG, request.user, blog_ids),
+            "comments": votes.votes_for(votes.COMMENT, request.user, comment_ids),
+        },
+        status=status.HTTP_200_OK,
+    )
+
+
+@api_view(["DELETE"])
+@permission_classes([IsAuthenticated])
+def remove_blog(request):
+    blog_id = request.data.get("blog_id")
+    user = request.user
+
+    if not Blog.all_objects.filter(id=blog_id).exists():
+        if archive.delete_archived(blog_id, user):
+            return Response(status=status.HTTP_200_OK)
         return Response(
-            {"error": "your comment not found"}, status=status.HTTP_404_NOT_FOUND
+            {"error": "your blog not found"}, status=status.HTTP_404_NOT_FOUND
         )
-
-    try:
-        comment_dislikes = comment.dislikes
-        comment_dislikes += 1
-        comment.dislikes = comment_dislikes
-        comment.save()
+    blog = Blog.all_objects.get(id=blog_id)
+    if blog.owner_id != user.id:
         return Response(
-            {"msg": "comment disliked"},
-            status=status.HTTP_200_OK,
+            {"error": "you aren't allowed"}, status=status.HTTP_403_FORBIDDEN
         )
+
+    try:
+        with transaction.atomic():
+            search.unindex_blog(blog.id)
+            caching.invalidate_blog(blog.id)
+            blog.delete()
+            blobs.release(blog.content_hash)
+        return Response(status=status.HTTP_200_OK)
     except ValueError as e:
         return Response(
             {"error": f"{e}"},
@@ -287,35 +496,36 @@ def dislike_comment(request):
 
 @api_view(["PATCH"])
 @permission_classes([IsAuthenticated])
-def like_blog(request):
+def deactive_blog(request):
+    user = request.user
     blog_id = request.data.get("blog_id")
-    user, _ = JWTAuthentication(request)
-    if not user:
-        return Response(
-            {"error": "your JWT isn't ok"}, status=status.HTTP_400_BAD_REQUEST
-        )
 
     if not blog_id:
         return Response(
-            {"error": "blog_id field is required"},
-            status=status.HTTP_400_BAD_REQUEST,
+            {"error": "blog_id field is required"}, status=status.HTTP_400_BAD_REQUEST
         )
 
-    try:
-        blog = Blog.objects.get(id=blog_id)
-    except Blog.DoesNotExist:
+    if not Blog.all_objects.filter(id=blog_id).exists():
         return Response(
             {"error": "your blog not found"}, status=status.HTTP_404_NOT_FOUND
         )
 
+    blog = Blog.all_objects.get(id=blog_id)
+
+    if blog.owner_id != user.id:
+        return Response(
+            {"error": "you aren't allowed"}, status=status.HTTP_403_FORBIDDEN
+        )
+
     try:
-        blog_likes = blog.likes
-        blog_likes += 1
-        blog.likes = blog_likes
-        blog.save()
+        if blog.active:
+            blog.active = False
+            blog.deactivated_at = timezone.now()
+            blog.save(update_fields=["active", "deactivated_at"])
+        caching.invalidate_blog(blog.id)
+        ranking.update_blog(blog.id)
         return Response(
-            {"msg": "blog liked"},
-            status=status.HTTP_200_OK,
+            {"msg": f"blog by id: {blog_id} deactived"}, status=status.HTTP_200_OK
         )
     except ValueError as e:
         return Response(
@@ -326,35 +536,40 @@ def like_blog(request):
 
 @api_view(["PATCH"])
 @permission_classes([IsAuthenticated])
-def dislike_blog(request):
+def active_blog(request):
+    user = request.user
     blog_id = request.data.get("blog_id")
-    user, _ = JWTAuthentication(request)
-    if not user:
-        return Response(
-            {"error": "your JWT isn't ok"}, status=status.HTTP_400_BAD_REQUEST
-        )
 
     if not blog_id:
         return Response(
-            {"error": "blog_id field is required"},
-            status=status.HTTP_400_BAD_REQUEST,
+            {"error": "blog_id field is required"}, status=status.HTTP_400_BAD_REQUEST
         )
 
-    try:
-        blog = Blog.objects.get(id=blog_id)
-    except Comment.DoesNotExist:
+    if not Blog.all_objects.filter(id=blog_id).exists():
+        # archived by archive_blogs: activating moves it back
+        if archive.restore_blog(blog_id, user):
+            return Response(
+                {"msg": f"blog by id: {blog_id} actived"}, status=status.HTTP_200_OK
+            )
         return Response(
             {"error": "your blog not found"}, status=status.HTTP_404_NOT_FOUND
         )
 
+    blog = Blog.all_objects.get(id=blog_id)
+
+    if blog.owner_id != user.id:
+        return Response(
+            {"error": "you aren't allowed"}, status=status.HTTP_403_FORBIDDEN
+        )
+
     try:
-        blog_dislikes = blog.dislikes
-        blog_dislikes += 1
-        blog.dislikes = blog_dislikes
-        blog.save()
+        blog.active = True
+        blog.deactivated_at = None
+        blog.save(update_fields=["active", "deactivated_at"])
+        caching.invalidate_blog(blog.id)
+        ranking.update_blog(blog.id)
         return Response(
-            {"msg": "blog disliked"},
-            status=status.HTTP_200_OK,
+            {"msg": f"blog by id: {blog_id} actived"}, status=status.HTTP_200_OK
         )
     except ValueError as e:
         return Response(
@@ -363,113 +578,398 @@ def dislike_blog(request):
         )
 
 
-@api_view(["DELETE"])
-@permission_classes([IsAuthenticated])
-def remove_blog(request):
-    blog_id = request.data.get("blog_id")
-    user, _ = JWTAuthentication(request)
-    if not user:
-        return Response(
-            {"error": "your JWT isn't fine"}, status=status.HTTP_400_BAD_REQUEST
-        )
+@api_view(["GET"])
+@permission_classes([AllowAny])
+def blog_list(request):
+    owner_id = request.query_params.get("owner")
+    tag = request.query_params.get("tag")
+    cursor = request.query_params.get("cursor")
 
-    if not Blog.objects.filter(id=blog_id).exists():
+    try:
+        size = page_size(request.query_params.get("size"))
+    except ValueError:
         return Response(
-            {"error": "your blog not found"}, status=status.HTTP_404_NOT_FOUND
+            {"error": "size must be a positive number"},
+            status=status.HTTP_400_BAD_REQUEST,
         )
-    blog = Blog.objects.get(id=blog_id)
-    if user != blog.owner:
+
+    if owner_id and not owner_id.isdigit():
         return Response(
-            {"error": "you aren't allowed"}, status=status.HTTP_403_FORBIDDEN
+            {"error": "owner must be a user id"},
+            status=status.HTTP_400_BAD_REQUEST,
         )
+    blogs = feed_queryset(owner_id, tag)
+
+    def load_page():
+        page, next_cursor = keyset_page(blogs, BLOG_FEED_ORDERING, cursor, size)
+        return {
+            "blogs": BlogListSerializer(page, many=True).data,
+            "next_cursor": next_cursor,
+        }
 
     try:
-        blog.delete()
-        return Response(status=status.HTTP_200_OK)
+        # the page is shared by everyone, the viewer's votes are added after
+        data = caching.feed_page(
+            load_page, owner=owner_id, tag=tag, cursor=cursor, size=size
+        )
     except ValueError as e:
+        return Response({"error": f"{e}"}, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response(
+        {
+            "blogs": data["blogs"],
+            "next_cursor": data["next_cursor"],
+            "my_votes": votes.votes_for(
+                votes.BLOG, request.user, [blog["id"] for blog in data["blogs"]]
+            ),
+        },
+        status=status.HTTP_200_OK,
+    )
+
+
+@api_view(["GET"])
+@permission_classes([AllowAny])
+def blog_detail(request, blog_id):
+    def load_blog():
+        blog = Blog.objects.filter(id=blog_id).prefetch_related("tags")
+        blog = blog.first()
+        return BlogFullSerializer(blog).data if blog else None
+
+    data = caching.blog_detail(blog_id, load_blog)
+
+    if data is None:
+        # inactive blogs are only shown to their owner, and never cached
+        blog = (
+            Blog.all_objects.filter(id=blog_id, active=False, owner_id=request.user.id)
+            .prefetch_related("tags")
+            .first()
+        )
+        if blog is None:
+            return Response(
+                {"error": "your blog not found"}, status=status.HTTP_404_NOT_FOUND
+            )
+        data = BlogFullSerializer(blog).data
+
+    return Response(
+        {
+            "blog": data,
+            "my_vote": votes.votes_for(votes.BLOG, request.user, [blog_id]).get(
+                blog_id, votes.NO_VOTE
+            ),
+        },
+        status=status.HTTP_200_OK,
+    )
+
+
+@api_view(["GET"])
+@permission_classes([AllowAny])
+def comment_list(request, blog_id):
+    cursor = request.query_params.get("cursor")
+
+    try:
+        size = page_size(request.query_params.get("size"))
+    except ValueError:
         return Response(
-            {"error": f"{e}"},
-            status=status.HTTP_403_FORBIDDEN,
+            {"error": "size must be a positive number"},
+            status=status.HTTP_400_BAD_REQUEST,
         )
 
+    blog = Blog.all_objects.filter(id=blog_id).values("active", "owner_id").first()
+    if blog is None or (not blog["active"] and blog["owner_id"] != request.user.id):
+        return Response(
+            {"error": "your blog not found"}, status=status.HTTP_404_NOT_FOUND
+        )
 
-@api_view(["PATCH"])
-@permission_classes([IsAuthenticated])
-def deactive_blog(request):
-    user, _ = JWTAuthentication(request)
-    blog_id = request.data.get("blog_id")
+    # one query for the page of threads and one for all of their replies,
+    # whatever the page size
+    threads = comment_threads(blog_id)
 
-    if not blog_id:
-        return Response(
-            {"error": "blog_id field is required"}, status=status.HTTP_400_BAD_REQUEST
+    try:
+        page, next_cursor = keyset_page(
+            threads, COMMENT_THREAD_ORDERING, cursor, size
         )
+    except ValueError as e:
+        return Response({"error": f"{e}"}, status=status.HTTP_400_BAD_REQUEST)
+
+    comment_ids = [comment.id for comment in page]
+    comment_ids += [reply.id for comment in page for reply in comment.replies.all()]
+
+    return Response(
+        {
+            "comments": CommentThreadSerializer(page, many=True).data,
+            "next_cursor": next_cursor,
+            "my_votes": votes.votes_for(votes.COMMENT, request.user, comment_ids),
+        },
+        status=status.HTTP_200_OK,
+    )
 
-    if not user:
+
+@api_view(["GET"])
+@permission_classes([AllowAny])
+def blog_trending(request):
+    board = request.query_params.get("board", ranking.HOT)
+    cursor = request.query_params.get("cursor")
+
+    try:
+        size = page_size(request.query_params.get("size"))
+    except ValueError:
         return Response(
-            {"error": "your JWT isn't fine"}, status=status.HTTP_400_BAD_REQUEST
+            {"error": "size must be a positive number"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    try:
+        page, next_cursor = ranking.ranked_page(
+            board, cursor, size, blog_columns=BLOG_LIST_COLUMNS
         )
+    except ValueError as e:
+        return Response({"error": f"{e}"}, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response(
+        {
+            "board": board,
+            "blogs": BlogListSerializer(page, many=True).data,
+            "next_cursor": next_cursor,
+            "my_votes": votes.votes_for(
+                votes.BLOG, request.user, [blog.id for blog in page]
+            ),
+        },
+        status=status.HTTP_200_OK,
+    )
+
+
+# Shared body of the bulk views
+def bulk_response(request, handlers):
+    data = request.data
+    try:
+        items = bulk.check_items(data.get("items") if hasattr(data, "get") else None)
+    except ValueError as e:
+        return Response({"error": f"{e}"}, status=status.HTTP_400_BAD_REQUEST)
 
-    if not Blog.objects.filter(id=blog_id).exists():
+    results = handlers[request.method](request.user, items)
+    failed = sum(1 for result in results if result["status"] >= 400)
+    return Response(
+        {"results": results, "ok": len(results) - failed, "failed": failed},
+        status=status.HTTP_200_OK,
+    )
+
+
+@api_view(["POST", "PATCH", "DELETE"])
+@permission_classes([IsAuthenticated])
+def bulk_blogs(request):
+    return bulk_response(
+        request,
+        {
+            "POST": bulk.create_blogs,
+            "PATCH": bulk.update_blogs,
+            "DELETE": bulk.delete_blogs,
+        },
+    )
+
+
+@api_view(["POST", "PATCH", "DELETE"])
+@permission_classes([IsAuthenticated])
+def bulk_comments(request):
+    return bulk_response(
+        request,
+        {
+            "POST": bulk.create_comments,
+            "PATCH": bulk.update_comments,
+            "DELETE": bulk.delete_comments,
+        },
+    )
+
+
+@api_view(["GET"])
+@permission_classes([AllowAny])
+def tag_counts(request):
+    try:
+        limit = page_size(request.query_params.get("limit"), default=50, maximum=500)
+    except ValueError:
         return Response(
-            {"error": "your blog not found"}, status=status.HTTP_404_NOT_FOUND
+            {"error": "limit must be a positive number"},
+            status=status.HTTP_400_BAD_REQUEST,
         )
 
-    blog = Blog.objects.get(id=blog_id)
+    # counted from the blog_tag index, joined to blog by primary key
+    counts = (
+        Tag.objects.annotate(
+            count=Count("blogtag", filter=Q(blogtag__blog__active=True))
+        )
+        .filter(count__gt=0)
+        .order_by("-count", "name")
+        .values("name", "count")[:limit]
+    )
+    return Response({"tags": list(counts)}, status=status.HTTP_200_OK)
 
-    if user != blog.owner:
+
+@api_view(["GET"])
+@permission_classes([AllowAny])
+def blog_search(request):
+    query = request.query_params.get("q", "").strip()
+    if not query:
         return Response(
-            {"error": "you aren't allowed"}, status=status.HTTP_403_FORBIDDEN
+            {"error": "q is required"}, status=status.HTTP_400_BAD_REQUEST
         )
 
     try:
-        blog.active = False
-        blog.save()
+        size = page_size(request.query_params.get("size"))
+        page = int(request.query_params.get("page") or 1)
+        if page < 1:
+            raise ValueError
+    except ValueError:
         return Response(
-            {"msg": f"blog by id: {blog_id} deactived"}, status=status.HTTP_200_OK
+            {"error": "page and size must be positive numbers"},
+            status=status.HTTP_400_BAD_REQUEST,
         )
-    except ValueError as e:
+
+    offset = (page - 1) * size
+    if offset > search.MAX_SEARCH_OFFSET:
         return Response(
-            {"error": f"{e}"},
-            status=status.HTTP_403_FORBIDDEN,
+            {"error": "too deep, refine your search"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    try:
+        blogs = search.search(
+            query,
+            offset=offset,
+            limit=size + 1,
+            queryset=Blog.objects.only(*BLOG_LIST_COLUMNS).prefetch_related("tags"),
         )
+    except search.SearchUnavailable as e:
+        return Response({"error": f"{e}"}, status=status.HTTP_501_NOT_IMPLEMENTED)
 
+    return Response(
+        {
+            "blogs": BlogListSerializer(blogs[:size], many=True).data,
+            "page": page,
+            "has_next": len(blogs) > size,
+        },
+        status=status.HTTP_200_OK,
+    )
 
-@api_view(["PATCH"])
+
+@api_view(["POST"])
 @permission_classes([IsAuthenticated])
-def active_blog(request):
-    user, _ = JWTAuthentication(request)
-    blog_id = request.data.get("blog_id")
+def start_upload(request):
+    filename = request.data.get("filename")
+    size = request.data.get("size")
 
-    if not blog_id:
+    if not all([filename, size]):
         return Response(
-            {"error": "blog_id field is required"}, status=status.HTTP_400_BAD_REQUEST
+            {"error": "filename and size are required"},
+            status=status.HTTP_400_BAD_REQUEST,
         )
 
-    if not user:
+    try:
+        upload = uploads.start_upload(request.user, filename, int(size))
+    except ValueError:
         return Response(
-            {"error": "your JWT isn't fine"}, status=status.HTTP_400_BAD_REQUEST
+            {"error": "size must be a number of bytes"},
+            status=status.HTTP_400_BAD_REQUEST,
         )
+    except uploads.UploadError as e:
+        return Response({"error": f"{e}"}, status=e.status_code)
 
-    if not Blog.objects.filter(id=blog_id).exists():
+    return Response(
+        {
+            "upload_id": upload.id,
+            "offset": 0,
+            "chunk_size": uploads.upload_settings()["CHUNK_SIZE"],
+        },
+        status=status.HTTP_201_CREATED,
+    )
+
+
+@api_view(["GET", "PUT", "DELETE"])
+@permission_classes([IsAuthenticated])
+def upload_part(request, upload_id):
+    try:
+        upload = ContentUpload.objects.get(id=upload_id, owner=request.user)
+    except ContentUpload.DoesNotExist:
         return Response(
-            {"error": "your blog not found"}, status=status.HTTP_404_NOT_FOUND
+            {"error": "upload not found"}, status=status.HTTP_404_NOT_FOUND
         )
 
-    blog = Blog.objects.get(id=blog_id)
+    if request.method == "DELETE":
+        uploads.discard_upload(upload)
+        return Response({"msg": "upload discarded"}, status=status.HTTP_200_OK)
 
-    if user != blog.owner:
+    if request.method == "PUT":
+        try:
+            start, end, total = uploads.parse_content_range(
+                request.headers.get("Content-Range")
+            )
+            # read the raw body, DRF parsers would buffer it
+            upload.received = uploads.write_part(
+                upload, request._request, start, end, total
+            )
+        except uploads.UploadError as e:
+            upload.refresh_from_db()
+            return Response(
+                {"error": f"{e}", "offset": upload.received}, status=e.status_code
+            )
+
+    return Response(
+        {
+            "upload_id": upload.id,
+            "offset": upload.received,
+            "size": upload.size,
+            "complete": upload.received == upload.size,
+        },
+        status=status.HTTP_200_OK,
+    )
+
+
+@api_view(["GET"])
+@permission_classes([AllowAny])
+def blog_content(request, blog_id):
+    # one query; access is decided from these columns, the file is streamed after
+    row = (
+        Blog.all_objects.filter(id=blog_id)
+        .values(
+            "contect", "content_name", "content_hash", "active", "owner_id"
+        )
+        .first()
+    )
+
+    if row is None or not row["contect"]:
         return Response(
-            {"error": "you aren't allowed"}, status=status.HTTP_403_FORBIDDEN
+            {"error": "your blog not found"}, status=status.HTTP_404_NOT_FOUND
         )
 
-    try:
-        blog.active = True
-        blog.save()
+    if not row["active"] and row["owner_id"] != request.user.id:
         return Response(
-            {"msg": f"blog by id: {blog_id} actived"}, status=status.HTTP_200_OK
+            {"error": "your blog not found"}, status=status.HTTP_404_NOT_FOUND
         )
-    except ValueError as e:
+
+    try:
+        return serving.content_response(request, row)
+    except FileNotFoundError:
         return Response(
-            {"error": f"{e}"},
-            status=status.HTTP_403_FORBIDDEN,
+            {"error": "blog content not found"}, status=status.HTTP_404_NOT_FOUND
         )
+
+
+@api_view(["GET"])
+@permission_classes([IsAdminUserType])
+def export_data(request):
+    try:
+        types = export.parse_types(request.query_params.get("types"))
+    except ValueError as e:
+        return Response({"error": f"{e}"}, status=status.HTTP_400_BAD_REQUEST)
+
+    # rows are read and encoded while the response is being sent
+    chunks = export.batched(export.export_lines(types))
+    filename = "export.ndjson"
+    content_type = "application/x-ndjson"
+    if request.query_params.get("gzip") in ("1", "true"):
+        chunks = export.gzip_chunks(chunks)
+        filename += ".gz"
+        content_type = "application/gzip"
+
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    response.headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    response.headers["Cache-Control"] = "no-store"
+    return response
@@ -0,0 +1,131 @@
+from django.db import IntegrityError, transaction
+
+from .models import Blog, BlogVote, Comment, CommentVote
+from . import counters, stats
+
+# ------------------------------
+# Vote ledger
+#
+# One row per (user, target) holds the user's current vote, so a user can
+# only like or dislike something once. Voting the same way again removes the
+# vote, voting the other way flips it. The like / dislike columns on the
+# target are kept in step through the counters module.
+# ------------------------------
+
+LIKE = 1
+DISLIKE = -1
+NO_VOTE = 0
+
+
+class _Target:
+    def __init__(
+        self,
+        vote_model,
+        target_model,
+        target_field,
+        counter_fields,
+        blog_path,
+        derived=None,
+    ):
+        self.vote_model = vote_model
+        self.target_model = target_model
+        self.target_field = target_field
+        self.counter_fields = counter_fields  # {LIKE: "...", DISLIKE: "..."}
+        self.blog_path = blog_path  # from the target to its blog, "" for blogs
+        self.derived = derived  # adds deltas of columns computed from the counters
+
+    # Whether the user may cast a vote on the target: it exists and its blog
+    # is active, or the user owns the blog
+    def visible_to(self, user, target_id):
+        active, owner = f"{self.blog_path}active", f"{self.blog_path}owner_id"
+        row = (
+            self.target_model._base_manager.filter(pk=target_id)
+            .values(active, owner)
+            .first()
+        )
+        return row is not None and (row[active] or row[owner] == user.id)
+
+
+BLOG = _Target(
+    BlogVote,
+    Blog,
+    "blog",
+    {LIKE: "likes", DISLIKE: "dislikes"},
+    "",
+    derived=stats.with_score,
+)
+COMMENT = _Target(
+    CommentVote, Comment, "comment", {LIKE: "like", DISLIKE: "dislike"}, "blog__"
+)
+
+
+# Toggle the user's vote on a target.
+# Returns the user's vote after the change (LIKE, DISLIKE or NO_VOTE),
+# or None when the target doesn't exist or the user can't see it. A vote
+# already cast can still be taken back from a deactivated blog.
+def toggle(target, user, target_id, direction):
+    if direction not in (LIKE, DISLIKE):
+        raise ValueError("direction must be 1 (like) or -1 (dislike)")
+
+    lookup = {"user": user, f"{target.target_field}_id": target_id}
+    fields = target.counter_fields
+
+    with transaction.atomic():
+        vote = target.vote_model.objects.select_for_update().filter(**lookup).first()
+
+        if (vote is None or vote.value != direction) and not target.visible_to(
+            user, target_id
+        ):
+            return None
+
+        if vote is None:
+            try:
+                with transaction.atomic():
+                    target.vote_model.objects.create(value=direction, **lookup)
+            except IntegrityError:
+                # a concurrent request by the same user already recorded this vote
+                vote = target.vote_model.objects.filter(**lookup).first()
+                return vote.value if vote else None
+            deltas = {fields[direction]: 1}
+            state = direction
+        elif vote.value == direction:
+            vote.delete()
+            deltas = {fields[direction]: -1}
+            state = NO_VOTE
+        else:
+            vote.value = direction
+            vote.save(update_fields=["value"])
+            deltas = {fields[direction]: 1, fields[-direction]: -1}
+            state = direction
+
+        if target.derived:
+            deltas = target.derived(deltas)
+        if not counters.increment(target.target_model, target_id, **deltas):
+            transaction.set_rollback(True)
+            return None
+
+    return state
+
+
+# Map of target id -> vote value for the targets this user voted on,
+# answered with a single query whatever the number of ids.
+def votes_for(target, user, target_ids):
+    if not user or not user.is_authenticated or not target_ids:
+        return {}
+
+    key = f"{target.target_field}_id"
+    rows = target.vote_model.objects.filter(
+        user=user, **{f"{key}__in": list(target_ids)}
+    ).values_list(key, "value")
+    return dict(rows)
+
+
+async def avotes_for(target, user, target_ids):
+    if not user or not user.is_authenticated or not target_ids:
+        return {}
+
+    key = f"{target.target_field}_id"
+    rows = target.vote_model.objects.filter(
+        user=user, **{f"{key}__in": list(target_ids)}
+    ).values_list(key, "value")
+    return {target_id: value async for target_id, value in rows}